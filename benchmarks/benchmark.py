@@ -0,0 +1,373 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENT_GENERATOR_DIR = os.path.join(REPO_ROOT, 'event_generator')
+# The event_generator modules import each other as top-level modules, and
+# Spark's Python workers need the same path to unpickle the UDFs
+sys.path.insert(0, EVENT_GENERATOR_DIR)
+sys.path.insert(0, REPO_ROOT)
+os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [EVENT_GENERATOR_DIR, REPO_ROOT, os.environ.get('PYTHONPATH')]))
+
+# Number of events generated per event type at each scale
+SCALES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000
+}
+
+# Benchmark groups, run in this order (read benchmarks query the output of the write benchmarks)
+GROUPS = ['pandas', 'spark', 'write', 'read']
+
+EVENT_TYPES = ['product_view', 'order', 'account']
+
+# The original row-at-a-time pandas generators are skipped above this many events
+LOOP_MAX_EVENTS = 100_000
+
+# Fixed time range, so results are comparable between runs
+START_DATE = datetime(2024, 1, 1)
+END_DATE = datetime(2024, 1, 31)
+
+# Typical read_events queries over the written dataset
+READ_QUERIES = {
+    'full_scan': {},
+    'one_category': {'category': 'order'},
+    'one_category_one_day': {'category': 'product', 'start': datetime(2024, 1, 15), 'end': datetime(2024, 1, 16)},
+    'entity_last_7_days': {'entity_ids': 'user_1', 'start': END_DATE - timedelta(days=7)},
+    'projection': {'category': 'account', 'columns': ['event_name', 'event_timestamp']}
+}
+READ_REPEATS = 5
+
+# Fresh-process runs of every benchmark; each metric reports the median over them
+DEFAULT_REPEATS = 3
+
+# Relative change beyond which a metric counts as a regression
+DEFAULT_THRESHOLD = 0.1
+
+# Direction of every compared metric
+HIGHER_IS_BETTER = {'events_per_second'}
+LOWER_IS_BETTER = {'seconds', 'write_seconds', 'latency_seconds', 'peak_rss_mb', 'jvm_peak_rss_mb', 'bytes_per_event'}
+
+def _peak_rss_mb():
+    """Peak resident set size of the current process in MB (ru_maxrss is KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _jvm_peak_rss_mb(spark):
+    """Peak resident set size of the Spark driver JVM in MB, when /proc is available."""
+    pid = spark._jvm.java.lang.ProcessHandle.current().pid()
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+def bench_pandas(event_type, variant, num_events):
+    """Time one pandas generator, the original loop or the vectorized version."""
+    from event_types.product_events import generate_product_view_events, generate_product_view_events_vectorized
+    from event_types.order_events import generate_order_events, generate_order_events_vectorized
+    from event_types.account_events import generate_account_events, generate_account_events_vectorized
+
+    generators = {
+        'loop': {
+            'product_view': generate_product_view_events,
+            'order': generate_order_events,
+            'account': generate_account_events
+        },
+        'vectorized': {
+            'product_view': generate_product_view_events_vectorized,
+            'order': generate_order_events_vectorized,
+            'account': generate_account_events_vectorized
+        }
+    }
+    start = time.perf_counter()
+    generators[variant][event_type](num_events, START_DATE, END_DATE)
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'events_per_second': num_events / seconds}
+
+def bench_spark(event_type, mode, num_events):
+    """Time one Spark generator function by fully evaluating it into the no-op sink."""
+    import config
+    from generator import SPARK_GENERATORS, initialize_spark
+
+    spark = initialize_spark()
+    kwargs = {"typed": config.EVENT_VALUE_FORMAT == "typed", "id_format": config.ID_FORMAT} if mode == "native" else {}
+    start = time.perf_counter()
+    events_df = SPARK_GENERATORS[mode][event_type](spark, num_events, START_DATE, END_DATE, **kwargs)
+    events_df.write.format("noop").mode("overwrite").save()
+    seconds = time.perf_counter() - start
+    result = {'seconds': seconds, 'events_per_second': num_events / seconds, 'jvm_peak_rss_mb': _jvm_peak_rss_mb(spark)}
+    spark.stop()
+    return result
+
+def bench_write(event_type, num_events, output_path):
+    """Stream one event type to Parquet, separating generation from write time."""
+    import config
+    from stream_writer import BATCH_GENERATORS, write_event_batches
+
+    batches = BATCH_GENERATORS[event_type](
+        num_events, START_DATE, END_DATE, seed=0, typed=config.EVENT_VALUE_FORMAT == 'typed'
+    )
+    generation_seconds = 0.0
+
+    def timed(stream):
+        nonlocal generation_seconds
+        stream = iter(stream)
+        while True:
+            start = time.perf_counter()
+            batch = next(stream, None)
+            generation_seconds += time.perf_counter() - start
+            if batch is None:
+                return
+            yield batch
+
+    start = time.perf_counter()
+    write_event_batches(timed(batches), output_path, basename_template=f"{event_type}-{{i}}.parquet",
+                        replace_partitions=False)
+    seconds = time.perf_counter() - start
+
+    written = sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(output_path) for name in names if name.startswith(f"{event_type}-")
+    )
+    return {'seconds': seconds, 'write_seconds': seconds - generation_seconds, 'bytes_per_event': written / num_events}
+
+def bench_read(query, output_path):
+    """Median latency of one typical read_events query."""
+    from utils.hash_utils import generate_entity_id
+    from event_store import read_events
+
+    filters = dict(READ_QUERIES[query])
+    if 'entity_ids' in filters:
+        filters['entity_ids'] = generate_entity_id(filters['entity_ids'])
+    latencies = []
+    for _ in range(READ_REPEATS):
+        start = time.perf_counter()
+        rows = read_events(output_path, **filters).num_rows
+        latencies.append(time.perf_counter() - start)
+    return {'latency_seconds': statistics.median(latencies), 'rows': rows}
+
+def _build_value_pools(pool_dir):
+    """Generate every Faker value pool into pool_dir, so no timed run pays for Faker."""
+    from utils.value_pools import FAKER_PROVIDERS, value_pools
+
+    value_pools(list(FAKER_PROVIDERS), cache_dir=pool_dir)
+
+def _measure(func, args, pool_dir):
+    """Run one benchmark in the current (fresh) process and add its peak RSS.
+
+    The generators load their value pools from pool_dir rather than the
+    working directory. Errors are returned as text, since engine exceptions
+    do not always pickle.
+    """
+    import config
+
+    config.VALUE_POOL_DIR = pool_dir
+    try:
+        result = func(*args)
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {str(e).strip().splitlines()[0] if str(e).strip() else ''}"}
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+def _run_isolated(func, args, pool_dir):
+    """Run a benchmark in its own spawned process, so peak RSS is its own."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(_measure, func, args, pool_dir).result()
+
+def _median_result(runs):
+    """Combine repeated runs of a benchmark into the median of every metric, or the first error."""
+    for run in runs:
+        if 'error' in run:
+            return run
+    result = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run.get(key) is not None]
+        result[key] = statistics.median(values) if values else None
+    return result
+
+def _cases(groups, num_events, output_path):
+    """Yield (name, function, args) for every benchmark to run."""
+    if 'pandas' in groups:
+        for event_type in EVENT_TYPES:
+            for variant in ['loop', 'vectorized']:
+                if variant == 'loop' and num_events > LOOP_MAX_EVENTS:
+                    continue
+                yield f"pandas/{variant}/{event_type}", bench_pandas, (event_type, variant, num_events)
+    if 'spark' in groups:
+        for mode in ['udf', 'native']:
+            for event_type in EVENT_TYPES:
+                yield f"spark/{mode}/{event_type}", bench_spark, (event_type, mode, num_events)
+    if 'write' in groups:
+        for event_type in EVENT_TYPES:
+            yield f"write/parquet/{event_type}", bench_write, (event_type, num_events, output_path)
+    if 'read' in groups:
+        for query in READ_QUERIES:
+            yield f"read/arrow/{query}", bench_read, (query, output_path)
+
+def run_benchmarks(scale='10k', groups=GROUPS, output_dir=None, repeats=DEFAULT_REPEATS):
+    """Run the benchmark suite at one scale.
+
+    Every benchmark runs repeats times, each in a fresh process, and reports
+    the median of each metric. The Faker value pools are built into a
+    temporary directory before anything is timed. A failing benchmark is
+    recorded with its error instead of aborting the run.
+
+    Args:
+        scale: Key of SCALES
+        groups: Benchmark groups to run
+        output_dir: Directory for the written Parquet data (a temporary one when None)
+        repeats: Runs of every benchmark
+
+    Returns:
+        Dict with the run metadata and one result entry per benchmark
+    """
+    num_events = SCALES[scale]
+    temporary = output_dir is None
+    output_dir = output_dir or tempfile.mkdtemp(prefix='event-store-bench-')
+    output_path = os.path.join(output_dir, 'events')
+    if 'write' in groups:
+        shutil.rmtree(output_path, ignore_errors=True)
+    pool_dir = tempfile.mkdtemp(prefix='event-store-pools-')
+
+    results = []
+    try:
+        _build_value_pools(pool_dir)
+        for name, func, args in _cases(groups, num_events, output_path):
+            print(f"Running {name} ({num_events} events, {repeats} runs)...")
+            runs = []
+            for _ in range(repeats):
+                try:
+                    runs.append(_run_isolated(func, args, pool_dir))
+                except Exception as e:
+                    runs.append({'error': f"{type(e).__name__}: {e}"})
+                if 'error' in runs[-1]:
+                    break
+            results.append({'name': name, 'events': num_events, 'repeats': len(runs), **_median_result(runs)})
+    finally:
+        shutil.rmtree(pool_dir, ignore_errors=True)
+        if temporary:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        'scale': scale,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results
+    }
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Flag metrics that got worse than the baseline by more than threshold.
+
+    Args:
+        current: Results dict of run_benchmarks
+        baseline: Stored results dict to compare against
+        threshold: Relative change tolerated before flagging, e.g. 0.1 for 10%
+
+    A benchmark that failed, or no longer reports a metric the baseline
+    has, is a regression too, with current set to its error (or None) and
+    change to None. Benchmarks left out of the current run are skipped.
+
+    Returns:
+        List of regression dicts (name, metric, baseline, current, change)
+    """
+    if current['scale'] != baseline['scale']:
+        raise ValueError(f"Cannot compare scale '{current['scale']}' with baseline scale '{baseline['scale']}'")
+
+    baseline_results = {result['name']: result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        previous = baseline_results.get(result['name'])
+        if previous is None:
+            continue
+        for metric in sorted(HIGHER_IS_BETTER | LOWER_IS_BETTER):
+            if previous.get(metric) is None:
+                continue
+            if result.get(metric) is None:
+                regressions.append({
+                    'name': result['name'],
+                    'metric': metric,
+                    'baseline': previous[metric],
+                    'current': result.get('error'),
+                    'change': None
+                })
+                continue
+            if not previous[metric]:
+                continue
+            change = (result[metric] - previous[metric]) / previous[metric]
+            if (metric in HIGHER_IS_BETTER and change < -threshold) or (metric in LOWER_IS_BETTER and change > threshold):
+                regressions.append({
+                    'name': result['name'],
+                    'metric': metric,
+                    'baseline': previous[metric],
+                    'current': result[metric],
+                    'change': change
+                })
+    return regressions
+
+def format_results(results):
+    """Render benchmark results as a text table."""
+    lines = [f"{'benchmark':<36} {'events/s':>12} {'seconds':>9} {'peak MB':>9} {'bytes/event':>12} {'latency ms':>11}"]
+    for result in results['results']:
+        if 'error' in result:
+            lines.append(f"{result['name']:<36} ERROR {result['error']}")
+            continue
+        cells = [
+            f"{result['events_per_second']:>12,.0f}" if 'events_per_second' in result else f"{'':>12}",
+            f"{result['seconds']:>9.2f}" if 'seconds' in result else f"{'':>9}",
+            f"{result['peak_rss_mb']:>9.0f}",
+            f"{result['bytes_per_event']:>12.1f}" if 'bytes_per_event' in result else f"{'':>12}",
+            f"{result['latency_seconds'] * 1000:>11.1f}" if 'latency_seconds' in result else f"{'':>11}"
+        ]
+        lines.append(f"{result['name']:<36} " + " ".join(cells))
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark event generation, Parquet writes and reads")
+    parser.add_argument("--scale", choices=SCALES, default="10k", help="Events per event type")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=GROUPS, help="Benchmark groups to run")
+    parser.add_argument("--output-dir", help="Keep the written Parquet data in this directory")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS,
+                        help="Runs of every benchmark, reported as the median")
+    parser.add_argument("--results", help="Save the results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against the results JSON stored in this file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative change flagged as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scale, groups=args.only, output_dir=args.output_dir, repeats=args.repeats)
+    print(format_results(results))
+    if args.results:
+        with open(args.results, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.results}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_results(results, json.load(f), args.threshold)
+        for regression in regressions:
+            if regression['change'] is None:
+                print(f"REGRESSION {regression['name']} {regression['metric']}: "
+                      f"{regression['baseline']:.4g} -> {regression['current'] or 'missing'}")
+                continue
+            print(f"REGRESSION {regression['name']} {regression['metric']}: "
+                  f"{regression['baseline']:.4g} -> {regression['current']:.4g} ({regression['change']:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
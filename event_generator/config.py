@@ -1,3 +1,4 @@
+import os
 from datetime import datetime, timedelta
 
 # Event generation configuration
@@ -13,10 +14,77 @@ EVENT_CONFIG = {
     }
 }
 
-# Time range for event generation
-START_DATE = datetime.now() - timedelta(days=30)
-END_DATE = datetime.now()
+# Time range for event generation. None is resolved when a run starts (see
+# date_range): END_DATE to the current time, START_DATE to DAYS before END_DATE
+START_DATE = None
+END_DATE = None
+DAYS = 30
+
+# Spark generation mode: 'native' builds every column from JVM expressions,
+# 'udf' uses the original row-at-a-time Python UDFs
+GENERATION_MODE = 'native'
+
+# Spark write plan: 'single' unions every event type into one job and commit,
+# 'batched' writes one job per million events of each type (lower memory per job)
+WRITE_PLAN = 'single'
+
+# Seed of the Spark generators (None draws new values every run). With
+# START_DATE and END_DATE pinned, a seed regenerates the same events, so the
+# same event IDs, which event_store.dedup then skips
+SEED = 0
+
+# Append the Spark engine's events to OUTPUT_DIR/events through
+# event_store.dedup, skipping events already stored, instead of replacing them
+APPEND = False
+
+# Parquet writer profile of the Spark and streaming writers: None keeps the
+# writer defaults, 'archive' or 'interactive' (see parquet_profiles.py)
+WRITER_PROFILE = None
+
+# Format of the event_value column: 'typed' stores a struct of the payload fields
+# registered in utils/schema_registry.py, 'string' the serialized dict/JSON text
+EVENT_VALUE_FORMAT = 'typed'
+
+# Storage format of entity/product/order IDs: 'hex' strings, 16-byte 'binary'
+# values or int32 'surrogate' keys into the ID dictionary stored in OUTPUT_DIR
+ID_FORMAT = 'hex'
+ID_DICTIONARY_FILE = 'id_dictionary.parquet'
+
+# Faker value pools: VALUE_POOL_SIZE distinct values per provider are generated
+# once with FAKER_LOCALE/FAKER_SEED and sampled per event. VALUE_POOL_DIR persists
+# them between runs, so only the first run pays for Faker (None for OUTPUT_DIR/value_pools,
+# False keeps them in memory)
+FAKER_LOCALE = 'en_US'
+FAKER_SEED = 0
+VALUE_POOL_SIZE = 1000
+VALUE_POOL_DIR = None
+
+# Instrumentation: METRICS_OUTPUT is None (off), a '.prom' Prometheus text file
+# or a JSON lines file of per-stage/per-batch records; METRICS_PROFILE_DIR also
+# writes cProfile stats per stage and Spark Python worker profiles
+METRICS_OUTPUT = None
+METRICS_PROFILE_DIR = None
 
 # Output configuration
 OUTPUT_DIR = './output'
-PARTITION_BY = ['event_category']  # Partition the Parquet files by event category
\ No newline at end of file
+PARTITION_BY = ['event_category']  # Partition the Parquet files by event category
+
+def date_range():
+    """Start and end of event timestamps for a run starting now.
+
+    Resolved at call time rather than at import, so a long-lived process
+    or a module imported ahead of time does not generate a stale range.
+    """
+    end_date = END_DATE or datetime.now()
+    start_date = START_DATE or end_date - timedelta(days=DAYS)
+    return start_date, end_date
+
+def value_pool_dir():
+    """Directory value pools persist in, or None to keep them in memory.
+
+    Resolved at call time like date_range, so it follows an OUTPUT_DIR set
+    after import (e.g. by the --output-dir option of event_store.cli).
+    """
+    if VALUE_POOL_DIR is False:
+        return None
+    return VALUE_POOL_DIR or os.path.join(OUTPUT_DIR, 'value_pools')
\ No newline at end of file
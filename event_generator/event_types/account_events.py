@@ -1,10 +1,11 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import random
 from datetime import datetime, timedelta
-from faker import Faker
-from utils.hash_utils import generate_entity_id
-
-fake = Faker()
+from utils.hash_utils import generate_entity_id, entity_id_pool, IdDictionary, SURROGATE_FRESH_ID_POOL_SIZE
+from utils import vector_utils as vu
+from utils.value_pools import value_pool, value_pools
 
 def generate_account_events(num_events, start_date, end_date):
     """Generate sample account events.
@@ -36,6 +37,9 @@ def generate_account_events(num_events, start_date, end_date):
         'login_failed', 
         'logout'
     ]
+
+    # Faker values are sampled from pools generated once, not drawn per event
+    pools = {name: pool.to_pylist() for name, pool in value_pools(['email', 'name', 'word', 'ipv4', 'location']).items()}
     
     for _ in range(num_events):
         # Generate a random timestamp within the range
@@ -51,16 +55,16 @@ def generate_account_events(num_events, start_date, end_date):
         # Generate event data based on the event name
         if event_name == 'account_created':
             event_value = {
-                'email': fake.email(),
-                'name': fake.name(),
+                'email': random.choice(pools['email']),
+                'name': random.choice(pools['name']),
                 'registration_source': random.choice(['web', 'mobile_app', 'social_media']),
                 'marketing_opt_in': random.choice([True, False])
             }
         elif event_name == 'account_updated':
             event_value = {
                 'field_updated': random.choice(['name', 'email', 'address', 'phone']),
-                'previous_value': fake.word(),
-                'new_value': fake.word()
+                'previous_value': random.choice(pools['word']),
+                'new_value': random.choice(pools['word'])
             }
         elif event_name == 'password_changed':
             event_value = {
@@ -71,8 +75,8 @@ def generate_account_events(num_events, start_date, end_date):
             event_value = {
                 'device_type': random.choice(['desktop', 'mobile', 'tablet']),
                 'browser': random.choice(['chrome', 'firefox', 'safari', 'edge']),
-                'ip_address': fake.ipv4(),
-                'location': fake.city() + ', ' + fake.country()
+                'ip_address': random.choice(pools['ipv4']),
+                'location': random.choice(pools['location'])
             }
             if event_name == 'login_failed':
                 event_value['reason'] = random.choice(['incorrect_password', 'account_locked', 'suspicious_location'])
@@ -96,4 +100,133 @@ def generate_account_events(num_events, start_date, end_date):
     df = pd.DataFrame(events)
     df['event_value'] = df['event_value'].apply(lambda x: str(x))
     
-    return df
\ No newline at end of file
+    return df
+
+ACCOUNT_EVENT_NAMES = [
+    'account_created',
+    'account_updated',
+    'password_changed',
+    'login_success',
+    'login_failed',
+    'logout'
+]
+
+def _account_pools(rng, id_format='hex', id_dictionary=None):
+    """Precompute the Faker value pools sampled by the vectorized generator."""
+    if id_format == 'surrogate' and id_dictionary is None:
+        id_dictionary = IdDictionary()
+    return {
+        'id_format': id_format,
+        'id_dictionary': id_dictionary,
+        'account_ids': entity_id_pool('account', SURROGATE_FRESH_ID_POOL_SIZE, id_format, id_dictionary)
+        if id_format == 'surrogate' else None,
+        'emails': value_pool('email'),
+        'names': value_pool('name'),
+        'words': value_pool('word'),
+        'ip_addresses': value_pool('ipv4'),
+        'locations': value_pool('location')
+    }
+
+def _account_table(rng, pools, num_events, start_date, end_date, typed=False):
+    """Build one Arrow table of account events from precomputed pools."""
+    name_index = rng.integers(0, len(ACCOUNT_EVENT_NAMES), size=num_events)
+
+    def pick(values, size):
+        return vu.choice(rng, values, size)
+
+    branches = []
+    for i, event_name in enumerate(ACCOUNT_EVENT_NAMES):
+        rows = np.flatnonzero(name_index == i)
+        size = len(rows)
+
+        if event_name == 'account_created':
+            fields = [
+                ('email', pick(pools['emails'], size)),
+                ('name', pick(pools['names'], size)),
+                ('registration_source', pick(['web', 'mobile_app', 'social_media'], size)),
+                ('marketing_opt_in', pick([True, False], size))
+            ]
+        elif event_name == 'account_updated':
+            fields = [
+                ('field_updated', pick(['name', 'email', 'address', 'phone'], size)),
+                ('previous_value', pick(pools['words'], size)),
+                ('new_value', pick(pools['words'], size))
+            ]
+        elif event_name == 'password_changed':
+            fields = [
+                ('source', pick(['user_initiated', 'reset_flow'], size)),
+                ('password_strength', pick(['weak', 'medium', 'strong'], size))
+            ]
+        elif event_name in ['login_success', 'login_failed']:
+            fields = [
+                ('device_type', pick(['desktop', 'mobile', 'tablet'], size)),
+                ('browser', pick(['chrome', 'firefox', 'safari', 'edge'], size)),
+                ('ip_address', pick(pools['ip_addresses'], size)),
+                ('location', pick(pools['locations'], size))
+            ]
+            if event_name == 'login_failed':
+                fields.append(('reason', pick(['incorrect_password', 'account_locked', 'suspicious_location'], size)))
+        else:  # logout
+            fields = [
+                ('session_duration_minutes', pa.array(rng.integers(1, 121, size=size))),
+                ('logout_type', pick(['user_initiated', 'session_timeout', 'forced_by_system'], size))
+            ]
+
+        branches.append((rows, vu.encode_event_value(fields, typed, pools['id_format'])))
+
+    return vu.event_table([
+        pa.array(ACCOUNT_EVENT_NAMES).take(name_index),
+        vu.random_timestamps(rng, num_events, start_date, end_date),
+        pa.repeat('account', num_events),
+        vu.scatter(branches, num_events),
+        vu.random_ids(rng, num_events, pools['id_format'], pools['account_ids']),
+    ])
+
+def generate_account_events_vectorized(num_events, start_date, end_date, seed=None, as_arrow=False,
+                                       typed=False, id_format='hex', id_dictionary=None):
+    """Generate sample account events column by column.
+
+    Produces the same schema as generate_account_events. Rows are grouped by
+    event name, each payload shape is built for its whole group at once and
+    the groups are scattered back into row order. Faker values are sampled
+    from pre-generated pools.
+
+    Args:
+        num_events: Number of events to generate
+        start_date: Start date for event timestamps
+        end_date: End date for event timestamps
+        seed: Optional seed for the numpy random generator
+        as_arrow: Return a pyarrow Table instead of a pandas DataFrame
+        typed: Store event_value as a typed struct (see utils.schema_registry)
+            instead of its str(dict) representation
+        id_format: ID storage format, one of utils.hash_utils.ID_FORMATS
+        id_dictionary: IdDictionary backing surrogate IDs (in-memory if None)
+
+    Returns:
+        DataFrame (or Arrow Table) containing account events
+    """
+    rng = np.random.default_rng(seed)
+    table = _account_table(rng, _account_pools(rng, id_format, id_dictionary), num_events, start_date, end_date, typed)
+    return table if as_arrow else table.to_pandas()
+
+def generate_account_event_batches(num_events, start_date, end_date, batch_size=vu.DEFAULT_BATCH_SIZE, seed=None,
+                                   typed=False, id_format='hex', id_dictionary=None):
+    """Stream account events as fixed-size Arrow RecordBatches.
+
+    Args:
+        num_events: Number of events to generate
+        start_date: Start date for event timestamps
+        end_date: End date for event timestamps
+        batch_size: Number of events per RecordBatch (the last one may be smaller)
+        seed: Optional seed for the numpy random generator
+        typed: Store event_value as a typed struct instead of a string
+        id_format: ID storage format, one of utils.hash_utils.ID_FORMATS
+        id_dictionary: IdDictionary backing surrogate IDs (in-memory if None)
+
+    Yields:
+        RecordBatches containing account events
+    """
+    rng = np.random.default_rng(seed)
+    pools = _account_pools(rng, id_format, id_dictionary)
+    for size in vu.batch_sizes(num_events, batch_size):
+        yield from _account_table(rng, pools, size, start_date, end_date, typed).to_batches()
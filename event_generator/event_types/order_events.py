@@ -1,10 +1,11 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import random
 from datetime import datetime, timedelta
-from faker import Faker
-from utils.hash_utils import generate_entity_id
-
-fake = Faker()
+from utils.hash_utils import generate_entity_id, entity_id_pool, IdDictionary, SURROGATE_FRESH_ID_POOL_SIZE
+from utils import vector_utils as vu
+from utils.value_pools import value_pool
 
 def generate_order_events(num_events, start_date, end_date):
     """Generate sample order events.
@@ -30,6 +31,8 @@ def generate_order_events(num_events, start_date, end_date):
     
     user_ids = [generate_entity_id(f"user_{i}") for i in range(1, 501)]
     product_ids = [generate_entity_id(f"product_{i}") for i in range(1, 101)]
+    # Sampled from a pool generated once instead of calling Faker per event
+    addresses = value_pool('address').to_pylist()
     
     for _ in range(num_events):
         # Generate a random timestamp within the range
@@ -64,7 +67,7 @@ def generate_order_events(num_events, start_date, end_date):
                 'items': items,
                 'total_amount': round(total_amount, 2),
                 'payment_method': random.choice(['credit_card', 'debit_card', 'paypal', 'bank_transfer']),
-                'shipping_address': fake.address().replace('\n', ', ')
+                'shipping_address': random.choice(addresses)
             },
             'entity_id': random.choice(user_ids)
         }
@@ -74,4 +77,107 @@ def generate_order_events(num_events, start_date, end_date):
     df = pd.DataFrame(events)
     df['event_value'] = df['event_value'].apply(lambda x: str(x))
     
-    return df
\ No newline at end of file
+    return df
+
+def _order_pools(rng, id_format='hex', id_dictionary=None):
+    """Precompute the value pools sampled by the vectorized generator."""
+    if id_format == 'surrogate' and id_dictionary is None:
+        id_dictionary = IdDictionary()
+    return {
+        'id_format': id_format,
+        'id_dictionary': id_dictionary,
+        'order_ids': entity_id_pool('order', SURROGATE_FRESH_ID_POOL_SIZE, id_format, id_dictionary)
+        if id_format == 'surrogate' else None,
+        'user_ids': entity_id_pool('user', 500, id_format, id_dictionary),
+        'product_ids': entity_id_pool('product', 100, id_format, id_dictionary),
+        'addresses': value_pool('address'),
+        'event_names': pa.array(['order_placed', 'order_confirmed', 'order_shipped', 'order_delivered']),
+        'payment_methods': pa.array(['credit_card', 'debit_card', 'paypal', 'bank_transfer'])
+    }
+
+def _order_table(rng, pools, num_events, start_date, end_date, typed=False):
+    """Build one Arrow table of order events from precomputed pools."""
+    # Draw every item of every order as one flat set of arrays
+    num_items = rng.integers(1, 6, size=num_events)
+    offsets = np.concatenate([[0], np.cumsum(num_items)])
+    total_items = int(offsets[-1])
+
+    prices = np.round(rng.uniform(10, 200, total_items), 2)
+    quantities = rng.integers(1, 4, size=total_items)
+    item_totals = prices * quantities
+    order_index = np.repeat(np.arange(num_events), num_items)
+    total_amounts = np.round(np.bincount(order_index, weights=item_totals, minlength=num_events), 2)
+
+    items = pa.ListArray.from_arrays(
+        pa.array(offsets, type=pa.int32()),
+        pa.StructArray.from_arrays([
+            vu.choice(rng, pools['product_ids'], total_items),
+            pa.array(prices),
+            pa.array(quantities),
+            pa.array(item_totals)
+        ], names=['product_id', 'price', 'quantity', 'item_total'])
+    )
+
+    event_value = vu.encode_event_value([
+        ('order_id', vu.random_ids(rng, num_events, pools['id_format'], pools['order_ids'])),
+        ('items', items),
+        ('total_amount', pa.array(total_amounts)),
+        ('payment_method', vu.choice(rng, pools['payment_methods'], num_events)),
+        ('shipping_address', vu.choice(rng, pools['addresses'], num_events)),
+    ], typed, pools['id_format'])
+
+    return vu.event_table([
+        vu.choice(rng, pools['event_names'], num_events),
+        vu.random_timestamps(rng, num_events, start_date, end_date),
+        pa.repeat('order', num_events),
+        event_value,
+        vu.choice(rng, pools['user_ids'], num_events),
+    ])
+
+def generate_order_events_vectorized(num_events, start_date, end_date, seed=None, as_arrow=False,
+                                     typed=False, id_format='hex', id_dictionary=None):
+    """Generate sample order events column by column.
+
+    Produces the same schema as generate_order_events. Order items are drawn as
+    flat arrays for all orders at once and split back into per-order lists
+    using offsets, so the per-item loop disappears from the hot path.
+
+    Args:
+        num_events: Number of events to generate
+        start_date: Start date for event timestamps
+        end_date: End date for event timestamps
+        seed: Optional seed for the numpy random generator
+        as_arrow: Return a pyarrow Table instead of a pandas DataFrame
+        typed: Store event_value as a typed struct (see utils.schema_registry)
+            instead of its str(dict) representation
+        id_format: ID storage format, one of utils.hash_utils.ID_FORMATS
+        id_dictionary: IdDictionary backing surrogate IDs (in-memory if None)
+
+    Returns:
+        DataFrame (or Arrow Table) containing order events
+    """
+    rng = np.random.default_rng(seed)
+    table = _order_table(rng, _order_pools(rng, id_format, id_dictionary), num_events, start_date, end_date, typed)
+    return table if as_arrow else table.to_pandas()
+
+def generate_order_event_batches(num_events, start_date, end_date, batch_size=vu.DEFAULT_BATCH_SIZE, seed=None,
+                                 typed=False, id_format='hex', id_dictionary=None):
+    """Stream order events as fixed-size Arrow RecordBatches.
+
+    Args:
+        num_events: Number of events to generate
+        start_date: Start date for event timestamps
+        end_date: End date for event timestamps
+        batch_size: Number of events per RecordBatch (the last one may be smaller)
+        seed: Optional seed for the numpy random generator
+        typed: Store event_value as a typed struct instead of a string
+        id_format: ID storage format, one of utils.hash_utils.ID_FORMATS
+        id_dictionary: IdDictionary backing surrogate IDs (in-memory if None)
+
+    Yields:
+        RecordBatches containing order events
+    """
+    rng = np.random.default_rng(seed)
+    pools = _order_pools(rng, id_format, id_dictionary)
+    for size in vu.batch_sizes(num_events, batch_size):
+        yield from _order_table(rng, pools, size, start_date, end_date, typed).to_batches()
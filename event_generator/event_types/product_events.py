@@ -1,10 +1,10 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import random
 from datetime import datetime, timedelta
-from faker import Faker
-from utils.hash_utils import generate_entity_id
-
-fake = Faker()
+from utils.hash_utils import generate_entity_id, entity_id_pool, IdDictionary
+from utils import vector_utils as vu
 
 def generate_product_view_events(num_events, start_date, end_date):
     """Generate sample product view events.
@@ -55,4 +55,84 @@ def generate_product_view_events(num_events, start_date, end_date):
     df = pd.DataFrame(events)
     df['event_value'] = df['event_value'].apply(lambda x: str(x))
     
-    return df
\ No newline at end of file
+    return df
+
+def _product_view_pools(rng, id_format='hex', id_dictionary=None):
+    """Precompute the value pools sampled by the vectorized generator."""
+    if id_format == 'surrogate' and id_dictionary is None:
+        id_dictionary = IdDictionary()
+    return {
+        'id_format': id_format,
+        'id_dictionary': id_dictionary,
+        'product_ids': entity_id_pool('product', 100, id_format, id_dictionary),
+        'user_ids': entity_id_pool('user', 500, id_format, id_dictionary),
+        'categories': pa.array(['electronics', 'clothing', 'home', 'books', 'toys']),
+        'source_pages': pa.array(['home', 'search', 'category', 'recommendation'])
+    }
+
+def _product_view_table(rng, pools, num_events, start_date, end_date, typed=False):
+    """Build one Arrow table of product view events from precomputed pools."""
+    event_value = vu.encode_event_value([
+        ('product_id', vu.choice(rng, pools['product_ids'], num_events)),
+        ('category', vu.choice(rng, pools['categories'], num_events)),
+        ('view_duration_seconds', pa.array(np.round(rng.uniform(5, 300, num_events), 2))),
+        ('source_page', vu.choice(rng, pools['source_pages'], num_events)),
+    ], typed, pools['id_format'])
+
+    return vu.event_table([
+        pa.repeat('product_view', num_events),
+        vu.random_timestamps(rng, num_events, start_date, end_date),
+        pa.repeat('product', num_events),
+        event_value,
+        vu.choice(rng, pools['user_ids'], num_events),
+    ])
+
+def generate_product_view_events_vectorized(num_events, start_date, end_date, seed=None, as_arrow=False,
+                                            typed=False, id_format='hex', id_dictionary=None):
+    """Generate sample product view events column by column.
+
+    Produces the same schema as generate_product_view_events, but builds whole
+    columns with numpy/Arrow instead of one Python dict per event.
+
+    Args:
+        num_events: Number of events to generate
+        start_date: Start date for event timestamps
+        end_date: End date for event timestamps
+        seed: Optional seed for the numpy random generator
+        as_arrow: Return a pyarrow Table instead of a pandas DataFrame
+        typed: Store event_value as a typed struct (see utils.schema_registry)
+            instead of its str(dict) representation
+        id_format: ID storage format, one of utils.hash_utils.ID_FORMATS
+        id_dictionary: IdDictionary backing surrogate IDs (in-memory if None)
+
+    Returns:
+        DataFrame (or Arrow Table) containing product view events
+    """
+    rng = np.random.default_rng(seed)
+    table = _product_view_table(rng, _product_view_pools(rng, id_format, id_dictionary), num_events, start_date, end_date, typed)
+    return table if as_arrow else table.to_pandas()
+
+def generate_product_view_event_batches(num_events, start_date, end_date, batch_size=vu.DEFAULT_BATCH_SIZE, seed=None,
+                                        typed=False, id_format='hex', id_dictionary=None):
+    """Stream product view events as fixed-size Arrow RecordBatches.
+
+    Only one batch is alive at a time, so memory stays bounded by batch_size
+    rather than num_events.
+
+    Args:
+        num_events: Number of events to generate
+        start_date: Start date for event timestamps
+        end_date: End date for event timestamps
+        batch_size: Number of events per RecordBatch (the last one may be smaller)
+        seed: Optional seed for the numpy random generator
+        typed: Store event_value as a typed struct instead of a string
+        id_format: ID storage format, one of utils.hash_utils.ID_FORMATS
+        id_dictionary: IdDictionary backing surrogate IDs (in-memory if None)
+
+    Yields:
+        RecordBatches containing product view events
+    """
+    rng = np.random.default_rng(seed)
+    pools = _product_view_pools(rng, id_format, id_dictionary)
+    for size in vu.batch_sizes(num_events, batch_size):
+        yield from _product_view_table(rng, pools, size, start_date, end_date, typed).to_batches()
@@ -1,7 +1,16 @@
 import os
+import math
 import random
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import udf, lit, rand, expr
+import shutil
+from functools import reduce
+import pandas as pd
+from pyspark.sql import SparkSession, DataFrame
+from pyspark.sql.functions import (
+    udf, pandas_udf, lit, rand, col, when, array, element_at, floor, round as spark_round,
+    struct, to_json, from_json, concat, concat_ws, format_string, sequence, transform, aggregate,
+    unhex, regexp_replace, md5, timestamp_seconds
+)
+from pyspark.sql.pandas.types import from_arrow_type
 from pyspark.sql.types import StructType, StructField, StringType, TimestampType
 from datetime import datetime, timedelta
 import uuid
@@ -9,6 +18,17 @@ import hashlib
 import json
 
 import config
+from parquet_profiles import SPARK_SQL_CONF, spark_write_options
+from utils.hash_utils import content_event_ids
+from utils.schema_registry import event_value_type
+from utils.order_items import order_items_frame
+from utils.metrics import Metrics, directory_stats, spark_stage_metrics
+
+# Events per Spark job in the batched write plan
+BATCH_SIZE = 1000000
+
+# Target events per write task in the single-job write plan
+ROWS_PER_TASK = 1000000
 
 def ensure_output_dir(directory):
     """Ensure the output directory exists."""
@@ -21,197 +41,620 @@ def generate_entity_id(seed=None):
     else:
         return str(uuid.uuid4())
 
+# ID pools are hashed once per run instead of once per row
+PRODUCT_IDS = [generate_entity_id(f"product_{i}") for i in range(1, 101)]
+USER_IDS = [generate_entity_id(f"user_{i}") for i in range(1, 501)]
+
 def initialize_spark():
     """Initialize and configure Spark session for better performance."""
-    return SparkSession.builder \
+    builder = SparkSession.builder \
         .appName("EventDataGenerator") \
         .master("local[*]") \
         .config("spark.sql.shuffle.partitions", 100) \
         .config("spark.default.parallelism", 100) \
         .config("spark.executor.memory", "4g") \
-        .config("spark.driver.memory", "4g") \
-        .getOrCreate()
+        .config("spark.driver.memory", "4g")
+    if config.METRICS_PROFILE_DIR:
+        # Profile the Python workers evaluating UDFs
+        builder = builder.config("spark.python.profile", "true")
+    return builder.getOrCreate()
+
+def seeded_rand(rng):
+    """rand() column with its own seed drawn from rng, so a seeded run draws the same values again."""
+    return rand(rng.getrandbits(63))
+
+def row_random(seed, name, row_id):
+    """Random generator of one row in a Python UDF, seeded from the run's seed and the spark.range id of the row.
+
+    Values then depend on the row and not on the order the rows are
+    evaluated in; without a seed the shared unseeded random module is used.
+    """
+    return random.Random(f"{seed}:{name}:{row_id}") if seed is not None else random
+
+def random_uuid(rng):
+    """UUID string drawn from a random generator."""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
 
-def generate_product_view_events_spark(spark, num_events, start_date, end_date):
+def generate_product_view_events_spark(spark, num_events, start_date, end_date, num_partitions=None, seed=None):
     """Generate product view events directly in Spark."""
+    rng = random.Random(seed)
+
     # Register UDFs
     @udf(returnType=StringType())
-    def random_product_id():
-        return generate_entity_id(f"product_{random.randint(1, 100)}")
+    def random_product_id(row_id):
+        return generate_entity_id(f"product_{row_random(seed, 'product_id', row_id).randint(1, 100)}")
     
     @udf(returnType=StringType())
-    def random_category():
-        return random.choice(['electronics', 'clothing', 'home', 'books', 'toys'])
+    def random_category(row_id):
+        return row_random(seed, 'category', row_id).choice(['electronics', 'clothing', 'home', 'books', 'toys'])
     
     @udf(returnType=StringType())
-    def random_source():
-        return random.choice(['home', 'search', 'category', 'recommendation'])
+    def random_source(row_id):
+        return row_random(seed, 'source', row_id).choice(['home', 'search', 'category', 'recommendation'])
     
     @udf(returnType=StringType())
-    def random_user_id():
-        return generate_entity_id(f"user_{random.randint(1, 500)}")
+    def random_user_id(row_id):
+        return generate_entity_id(f"user_{row_random(seed, 'user_id', row_id).randint(1, 500)}")
     
     @udf(returnType=StringType())
-    def create_event_value(product_id, category, source):
+    def create_event_value(row_id, product_id, category, source):
         value = {
             'product_id': product_id,
             'category': category,
-            'view_duration_seconds': round(random.uniform(5, 300), 2),
+            'view_duration_seconds': round(row_random(seed, 'event_value', row_id).uniform(5, 300), 2),
             'source_page': source
         }
         return json.dumps(value)
     
     # Create a base DataFrame with the desired number of rows
-    base_df = spark.range(0, num_events)
-    
-    # Calculate time range in seconds
-    time_range_seconds = int((end_date - start_date).total_seconds())
-    start_timestamp = start_date.timestamp()
+    base_df = spark.range(0, num_events, numPartitions=num_partitions)
     
     # Create and transform the DataFrame
     return base_df.select(
+        "id",
         lit("product_view").alias("event_name"),
-        (expr(f"timestamp_seconds({start_timestamp} + rand() * {time_range_seconds})"))
-            .alias("event_timestamp"),
+        random_timestamp(start_date, end_date, rng).alias("event_timestamp"),
         lit("product").alias("event_category"),
-        random_product_id().alias("product_id"),
-        random_category().alias("category"),
-        random_source().alias("source"),
-        random_user_id().alias("entity_id")
+        random_product_id("id").alias("product_id"),
+        random_category("id").alias("category"),
+        random_source("id").alias("source"),
+        random_user_id("id").alias("entity_id")
     ).withColumn(
         "event_value", 
-        create_event_value("product_id", "category", "source")
-    ).drop("product_id", "category", "source")
+        create_event_value("id", "product_id", "category", "source")
+    ).drop("id", "product_id", "category", "source")
 
-def generate_order_events_spark(spark, num_events, start_date, end_date):
+def generate_order_events_spark(spark, num_events, start_date, end_date, num_partitions=None, seed=None):
     """Generate order events directly in Spark."""
+    rng = random.Random(seed)
+
     # Register UDFs
     @udf(returnType=StringType())
-    def random_order_event_name():
-        return random.choice(['order_placed', 'order_confirmed', 'order_shipped', 'order_delivered'])
+    def random_order_event_name(row_id):
+        return row_random(seed, 'event_name', row_id).choice(['order_placed', 'order_confirmed', 'order_shipped', 'order_delivered'])
     
     @udf(returnType=StringType())
-    def random_user_id():
-        return generate_entity_id(f"user_{random.randint(1, 500)}")
+    def random_user_id(row_id):
+        return generate_entity_id(f"user_{row_random(seed, 'user_id', row_id).randint(1, 500)}")
     
     @udf(returnType=StringType())
-    def create_order_value():
-        num_items = random.randint(1, 5)
+    def create_order_value(row_id):
+        row_rng = row_random(seed, 'event_value', row_id)
+        num_items = row_rng.randint(1, 5)
         items = []
         total_amount = 0
         
         for _ in range(num_items):
-            price = round(random.uniform(10, 200), 2)
-            quantity = random.randint(1, 3)
+            price = round(row_rng.uniform(10, 200), 2)
+            quantity = row_rng.randint(1, 3)
             item_total = price * quantity
             total_amount += item_total
             
             items.append({
-                'product_id': generate_entity_id(f"product_{random.randint(1, 100)}"),
+                'product_id': generate_entity_id(f"product_{row_rng.randint(1, 100)}"),
                 'price': price,
                 'quantity': quantity,
                 'item_total': item_total
             })
         
         value = {
-            'order_id': generate_entity_id(),
+            'order_id': random_uuid(row_rng),
             'items': items,
             'total_amount': round(total_amount, 2),
-            'payment_method': random.choice(['credit_card', 'debit_card', 'paypal', 'bank_transfer']),
-            'shipping_address': f"{random.randint(100, 999)} Main St, City, State {random.randint(10000, 99999)}"
+            'payment_method': row_rng.choice(['credit_card', 'debit_card', 'paypal', 'bank_transfer']),
+            'shipping_address': f"{row_rng.randint(100, 999)} Main St, City, State {row_rng.randint(10000, 99999)}"
         }
         return json.dumps(value)
     
     # Create a base DataFrame with the desired number of rows
-    base_df = spark.range(0, num_events)
-    
-    # Calculate time range in seconds
-    time_range_seconds = int((end_date - start_date).total_seconds())
-    start_timestamp = start_date.timestamp()
+    base_df = spark.range(0, num_events, numPartitions=num_partitions)
     
     # Create and transform the DataFrame
     return base_df.select(
-        random_order_event_name().alias("event_name"),
-        (expr(f"timestamp_seconds({start_timestamp} + rand() * {time_range_seconds})"))
-            .alias("event_timestamp"),
+        random_order_event_name("id").alias("event_name"),
+        random_timestamp(start_date, end_date, rng).alias("event_timestamp"),
         lit("order").alias("event_category"),
-        create_order_value().alias("event_value"),
-        random_user_id().alias("entity_id")
+        create_order_value("id").alias("event_value"),
+        random_user_id("id").alias("entity_id")
     )
 
-def generate_account_events_spark(spark, num_events, start_date, end_date):
+def generate_account_events_spark(spark, num_events, start_date, end_date, num_partitions=None, seed=None):
     """Generate account events directly in Spark."""
+    rng = random.Random(seed)
+
     # Register UDFs
     @udf(returnType=StringType())
-    def random_account_event_name():
-        return random.choice([
+    def random_account_event_name(row_id):
+        return row_random(seed, 'event_name', row_id).choice([
             'account_created', 'account_updated', 'password_changed',
             'login_success', 'login_failed', 'logout'
         ])
     
     @udf(returnType=StringType())
-    def random_user_id():
-        return generate_entity_id()
+    def random_user_id(row_id):
+        return random_uuid(row_random(seed, 'user_id', row_id))
     
     @udf(returnType=StringType())
-    def create_account_value(event_name):
+    def create_account_value(row_id, event_name):
+        row_rng = row_random(seed, 'event_value', row_id)
         if event_name == 'account_created':
             value = {
-                'email': f"user{random.randint(1, 10000)}@example.com",
-                'name': f"User {random.randint(1, 10000)}",
-                'registration_source': random.choice(['web', 'mobile_app', 'social_media']),
-                'marketing_opt_in': random.choice([True, False])
+                'email': f"user{row_rng.randint(1, 10000)}@example.com",
+                'name': f"User {row_rng.randint(1, 10000)}",
+                'registration_source': row_rng.choice(['web', 'mobile_app', 'social_media']),
+                'marketing_opt_in': row_rng.choice([True, False])
             }
         elif event_name == 'account_updated':
             value = {
-                'field_updated': random.choice(['name', 'email', 'address', 'phone']),
-                'previous_value': f"old_value_{random.randint(1, 1000)}",
-                'new_value': f"new_value_{random.randint(1, 1000)}"
+                'field_updated': row_rng.choice(['name', 'email', 'address', 'phone']),
+                'previous_value': f"old_value_{row_rng.randint(1, 1000)}",
+                'new_value': f"new_value_{row_rng.randint(1, 1000)}"
             }
         elif event_name == 'password_changed':
             value = {
-                'source': random.choice(['user_initiated', 'reset_flow']),
-                'password_strength': random.choice(['weak', 'medium', 'strong'])
+                'source': row_rng.choice(['user_initiated', 'reset_flow']),
+                'password_strength': row_rng.choice(['weak', 'medium', 'strong'])
             }
         elif event_name in ['login_success', 'login_failed']:
             value = {
-                'device_type': random.choice(['desktop', 'mobile', 'tablet']),
-                'browser': random.choice(['chrome', 'firefox', 'safari', 'edge']),
-                'ip_address': f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}",
-                'location': f"{random.choice(['New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix'])}, USA"
+                'device_type': row_rng.choice(['desktop', 'mobile', 'tablet']),
+                'browser': row_rng.choice(['chrome', 'firefox', 'safari', 'edge']),
+                'ip_address': f"{row_rng.randint(1, 255)}.{row_rng.randint(1, 255)}.{row_rng.randint(1, 255)}.{row_rng.randint(1, 255)}",
+                'location': f"{row_rng.choice(['New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix'])}, USA"
             }
             if event_name == 'login_failed':
-                value['reason'] = random.choice(['incorrect_password', 'account_locked', 'suspicious_location'])
+                value['reason'] = row_rng.choice(['incorrect_password', 'account_locked', 'suspicious_location'])
         else:  # logout
             value = {
-                'session_duration_minutes': random.randint(1, 120),
-                'logout_type': random.choice(['user_initiated', 'session_timeout', 'forced_by_system'])
+                'session_duration_minutes': row_rng.randint(1, 120),
+                'logout_type': row_rng.choice(['user_initiated', 'session_timeout', 'forced_by_system'])
             }
         return json.dumps(value)
     
     # Create a base DataFrame with the desired number of rows
-    base_df = spark.range(0, num_events)
-    
-    # Calculate time range in seconds
-    time_range_seconds = int((end_date - start_date).total_seconds())
-    start_timestamp = start_date.timestamp()
+    base_df = spark.range(0, num_events, numPartitions=num_partitions)
     
     # Create event names first
-    with_events = base_df.withColumn("event_name", random_account_event_name())
+    with_events = base_df.withColumn("event_name", random_account_event_name("id"))
     
     # Create and transform the DataFrame
     return with_events.select(
         "event_name",
-        (expr(f"timestamp_seconds({start_timestamp} + rand() * {time_range_seconds})"))
-            .alias("event_timestamp"),
+        random_timestamp(start_date, end_date, rng).alias("event_timestamp"),
         lit("account").alias("event_category"),
-        create_account_value("event_name").alias("event_value"),
-        random_user_id().alias("entity_id")
+        create_account_value("id", "event_name").alias("event_value"),
+        random_user_id("id").alias("entity_id")
     )
 
-def generate_all_events():
-    """Generate all event types and save to Parquet files."""
-    print("Starting event generation...")
+def random_element(values, rng):
+    """Pick a random element of a literal array using rand()/floor indexing."""
+    return element_at(array(*[lit(v) for v in values]), (floor(seeded_rand(rng) * len(values)) + 1).cast("int"))
+
+def random_int(low, high, rng):
+    """Random integer in [low, high], inclusive like random.randint."""
+    return floor(seeded_rand(rng) * (high - low + 1) + low).cast("int")
+
+def random_timestamp(start_date, end_date, rng):
+    """Random timestamp column between start_date and end_date."""
+    time_range_seconds = int((end_date - start_date).total_seconds())
+    return timestamp_seconds(lit(start_date.timestamp()) + seeded_rand(rng) * time_range_seconds)
+
+def id_pool(ids, id_format):
+    """Literal values of a precomputed hex ID pool in the given storage format."""
+    if id_format == 'hex':
+        return ids
+    if id_format == 'binary':
+        return [bytearray.fromhex(value) for value in ids]
+    raise ValueError(f"Spark generation supports the 'hex' and 'binary' ID formats, not '{id_format}'")
+
+def new_id(id_format, rng):
+    """Random UUID-shaped ID column, as a string or as its 16 raw bytes.
+
+    Drawn from two seeded rand() columns rather than uuid(), which cannot
+    be seeded.
+    """
+    digest = md5(concat_ws(":", seeded_rand(rng).cast("string"), seeded_rand(rng).cast("string")))
+    if id_format == 'binary':
+        return unhex(digest)
+    return regexp_replace(digest, "^(.{8})(.{4})(.{4})(.{4})(.{12})$", "$1-$2-$3-$4-$5")
+
+def with_event_ids(events_df):
+    """Add the event_id column to a DataFrame of events.
+
+    IDs are computed with utils.hash_utils.content_event_ids in Arrow
+    batches (mapInArrow), the definition every writer uses, so they follow
+    the content of the events, not their position or partitioning.
+    """
+    def add_ids(batches):
+        for batch in batches:
+            yield batch.append_column("event_id", content_event_ids(batch))
+
+    return events_df.mapInArrow(add_ids, StructType(events_df.schema.fields + [StructField("event_id", StringType())]))
+
+def payload_id_format(typed, id_format):
+    """ID format of payload fields: JSON payloads keep IDs as readable hex."""
+    return id_format if typed else 'hex'
+
+def spark_event_value_type(id_format='hex'):
+    """Spark type of the typed event_value column (binary IDs are variable-length in Spark)."""
+    return from_arrow_type(event_value_type(id_format, fixed_size=False))
+
+def payload(typed, id_format, **fields):
+    """Encode payload columns as a JSON string, or as the registered typed struct.
+
+    JSON payloads are text, so their ID fields should be passed as hex
+    strings (see payload_id_format). In typed mode every registered payload field is present, with the ones not
+    passed in set to null, so all branches and categories share one struct type.
+    """
+    if not typed:
+        return to_json(struct(*[column.alias(name) for name, column in fields.items()]))
+    return struct(*[
+        (fields[field.name] if field.name in fields else lit(None)).cast(field.dataType).alias(field.name)
+        for field in spark_event_value_type(id_format)
+    ])
+
+def generate_product_view_events_native(spark, num_events, start_date, end_date, typed=False, id_format='hex',
+                                        num_partitions=None, seed=None):
+    """Generate product view events using native Spark expressions only."""
+    rng = random.Random(seed)
+    event_value = payload(
+        typed, id_format,
+        product_id=random_element(id_pool(PRODUCT_IDS, payload_id_format(typed, id_format)), rng),
+        category=random_element(['electronics', 'clothing', 'home', 'books', 'toys'], rng),
+        view_duration_seconds=spark_round(seeded_rand(rng) * 295 + 5, 2),
+        source_page=random_element(['home', 'search', 'category', 'recommendation'], rng)
+    )
+
+    return spark.range(0, num_events, numPartitions=num_partitions).select(
+        lit("product_view").alias("event_name"),
+        random_timestamp(start_date, end_date, rng).alias("event_timestamp"),
+        lit("product").alias("event_category"),
+        event_value.alias("event_value"),
+        random_element(id_pool(USER_IDS, id_format), rng).alias("entity_id")
+    )
+
+def order_value_fallback(seed=None):
+    """pandas_udf building order payloads in Arrow batches for runtimes without rand() in lambdas.
+
+    Each payload is drawn from row_random of its spark.range id.
+    """
+    @pandas_udf(StringType())
+    def order_values(ids: pd.Series) -> pd.Series:
+        def order_value(row_id):
+            rng = row_random(seed, 'event_value', row_id)
+            items = []
+            total_amount = 0
+            for _ in range(rng.randint(1, 5)):
+                price = round(rng.uniform(10, 200), 2)
+                quantity = rng.randint(1, 3)
+                total_amount += price * quantity
+                items.append({
+                    'product_id': rng.choice(PRODUCT_IDS),
+                    'price': price,
+                    'quantity': quantity,
+                    'item_total': price * quantity
+                })
+            return json.dumps({
+                'order_id': random_uuid(rng),
+                'items': items,
+                'total_amount': round(total_amount, 2),
+                'payment_method': rng.choice(['credit_card', 'debit_card', 'paypal', 'bank_transfer']),
+                'shipping_address': f"{rng.randint(100, 999)} Main St, City, State {rng.randint(10000, 99999)}"
+            })
+        return ids.apply(order_value)
+    return order_values
+
+def generate_order_events_native(spark, num_events, start_date, end_date, typed=False, id_format='hex',
+                                 native_items=True, num_partitions=None, seed=None):
+    """Generate order events using native Spark expressions only.
+
+    Items are drawn with transform() over a random-length sequence and the
+    total is folded with aggregate(). Set native_items=False to build the
+    payload with a pandas_udf instead.
+    """
+    rng = random.Random(seed)
+    base_df = spark.range(0, num_events, numPartitions=num_partitions)
+
+    if native_items:
+        # Draw price and quantity first so item_total is computed from the same values
+        items = transform(
+            sequence(lit(1), random_int(1, 5, rng)),
+            lambda _: struct(
+                random_element(id_pool(PRODUCT_IDS, payload_id_format(typed, id_format)), rng).alias("product_id"),
+                spark_round(seeded_rand(rng) * 190 + 10, 2).alias("price"),
+                random_int(1, 3, rng).alias("quantity")
+            )
+        )
+        items = transform(items, lambda item: struct(
+            item["product_id"].alias("product_id"),
+            item["price"].alias("price"),
+            item["quantity"].alias("quantity"),
+            (item["price"] * item["quantity"]).alias("item_total")
+        ))
+        base_df = base_df.withColumn("items", items)
+
+        event_value = payload(
+            typed, id_format,
+            order_id=new_id(payload_id_format(typed, id_format), rng),
+            items=col("items"),
+            total_amount=spark_round(aggregate(col("items"), lit(0.0), lambda acc, item: acc + item["item_total"]), 2),
+            payment_method=random_element(['credit_card', 'debit_card', 'paypal', 'bank_transfer'], rng),
+            shipping_address=format_string("%d Main St, City, State %d", random_int(100, 999, rng), random_int(10000, 99999, rng))
+        )
+    else:
+        if id_format != 'hex':
+            raise ValueError("The pandas_udf order payload fallback only produces hex IDs")
+        event_value = order_value_fallback(seed)(col("id"))
+        if typed:
+            event_value = from_json(event_value, spark_event_value_type())
+
+    return base_df.select(
+        random_element(['order_placed', 'order_confirmed', 'order_shipped', 'order_delivered'], rng).alias("event_name"),
+        random_timestamp(start_date, end_date, rng).alias("event_timestamp"),
+        lit("order").alias("event_category"),
+        event_value.alias("event_value"),
+        random_element(id_pool(USER_IDS, id_format), rng).alias("entity_id")
+    )
+
+def generate_account_events_native(spark, num_events, start_date, end_date, typed=False, id_format='hex',
+                                   num_partitions=None, seed=None):
+    """Generate account events using native Spark expressions only.
+
+    The payload for each event name is a separate branch of a when() chain.
+    """
+    rng = random.Random(seed)
+    def login_fields():
+        # Built per branch: sharing rand() columns between branches would give
+        # the n-th login_success and n-th login_failed row identical values
+        return dict(
+            device_type=random_element(['desktop', 'mobile', 'tablet'], rng),
+            browser=random_element(['chrome', 'firefox', 'safari', 'edge'], rng),
+            ip_address=concat_ws(".", *[random_int(1, 255, rng) for _ in range(4)]),
+            location=concat(random_element(['New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix'], rng), lit(", USA"))
+        )
+
+    event_name = col("event_name")
+    event_value = when(event_name == "account_created", payload(
+        typed, id_format,
+        email=concat(lit("user"), random_int(1, 10000, rng), lit("@example.com")),
+        name=concat(lit("User "), random_int(1, 10000, rng)),
+        registration_source=random_element(['web', 'mobile_app', 'social_media'], rng),
+        marketing_opt_in=seeded_rand(rng) < 0.5
+    )).when(event_name == "account_updated", payload(
+        typed, id_format,
+        field_updated=random_element(['name', 'email', 'address', 'phone'], rng),
+        previous_value=concat(lit("old_value_"), random_int(1, 1000, rng)),
+        new_value=concat(lit("new_value_"), random_int(1, 1000, rng))
+    )).when(event_name == "password_changed", payload(
+        typed, id_format,
+        source=random_element(['user_initiated', 'reset_flow'], rng),
+        password_strength=random_element(['weak', 'medium', 'strong'], rng)
+    )).when(event_name == "login_success", payload(
+        typed, id_format,
+        **login_fields()
+    )).when(event_name == "login_failed", payload(
+        typed, id_format,
+        **login_fields(),
+        reason=random_element(['incorrect_password', 'account_locked', 'suspicious_location'], rng)
+    )).otherwise(payload(  # logout
+        typed, id_format,
+        session_duration_minutes=random_int(1, 120, rng),
+        logout_type=random_element(['user_initiated', 'session_timeout', 'forced_by_system'], rng)
+    ))
+
+    with_events = spark.range(0, num_events, numPartitions=num_partitions).withColumn("event_name", random_element([
+        'account_created', 'account_updated', 'password_changed',
+        'login_success', 'login_failed', 'logout'
+    ], rng))
+
+    return with_events.select(
+        "event_name",
+        random_timestamp(start_date, end_date, rng).alias("event_timestamp"),
+        lit("account").alias("event_category"),
+        event_value.alias("event_value"),
+        new_id(id_format, rng).alias("entity_id")
+    )
+
+# Spark generator functions per generation mode: "udf" is the original
+# row-at-a-time Python UDF path, "native" runs entirely in the JVM. All take
+# num_partitions, the spark.range partitions (so tasks) the rows are split into,
+# and seed: a seeded call draws the same events for the same partitioning
+# (Spark's rand(seed) follows the partition of each row)
+SPARK_GENERATORS = {
+    "udf": {
+        "product_view": generate_product_view_events_spark,
+        "order": generate_order_events_spark,
+        "account": generate_account_events_spark
+    },
+    "native": {
+        "product_view": generate_product_view_events_native,
+        "order": generate_order_events_native,
+        "account": generate_account_events_native
+    }
+}
+
+def _call_seed(seed, *parts):
+    """Seed of one generator call, derived from the run's seed and the call's place in the run (None stays unseeded)."""
+    return None if seed is None else ":".join(str(part) for part in (seed,) + parts)
+
+def _append_staged(spark, events_df, output_path, write_options):
+    """Append a DataFrame of events to output_path through event_store.dedup, skipping events already stored.
+
+    Spark writes the events to a staging directory next to output_path;
+    its files are then appended in bounded chunks by append_batches, which
+    checks their IDs against each partition's Bloom filter and ID index.
+
+    Returns:
+        The append report (rows, written, duplicates, checked)
+    """
+    # Imported here: only appends need event_store, the plain write plans run stand-alone
+    from event_store.dedup import append_batches
+    from event_store.reader import events_dataset
+
+    staging_path = f"{output_path}.staging"
+    # pyarrow reads Spark's default INT96 timestamps as nanoseconds, which Spark could not read back once appended
+    spark.conf.set("spark.sql.parquet.outputTimestampType", "TIMESTAMP_MICROS")
+    events_df.write.options(**write_options).partitionBy(config.PARTITION_BY).mode("overwrite").parquet(staging_path)
+    try:
+        return append_batches(events_dataset(staging_path).to_batches(), output_path, config.PARTITION_BY)
+    finally:
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+def _write_batched(spark, generators, generator_kwargs, date_range, output_path, write_options, metrics, mode, seed):
+    """Append each event type in jobs of at most BATCH_SIZE events, one Parquet write per batch.
+
+    Keeps every job small at the cost of one plan, task launch and commit
+    per batch. Every batch is appended through event_store.dedup
+    (_append_staged), seeded from the run's seed, event type and batch
+    number, so re-running a batch, or the whole loop after a failure (with
+    config.APPEND), writes only the events not already stored. Without
+    config.APPEND the events of earlier runs are cleared first.
+    """
+    if not config.APPEND:
+        shutil.rmtree(output_path, ignore_errors=True)
+    for event_type, config_key in [("product view", "product_view"), ("order", "order"), ("account", "account")]:
+        generator_func = generators[config_key]
+        remaining = config.EVENT_CONFIG[config_key]['num_events']
+        batch_num = 1
+
+        while remaining > 0:
+            current_batch_size = min(BATCH_SIZE, remaining)
+            print(f"Generating {event_type} events batch {batch_num}: {current_batch_size} events")
+
+            events_df = with_event_ids(generator_func(spark, current_batch_size, *date_range,
+                                                      seed=_call_seed(seed, config_key, batch_num), **generator_kwargs))
+
+            print(f"Appending batch {batch_num}...")
+            with metrics.stage("write", mode=mode, event_type=event_type, batch=batch_num) as stage:
+                if metrics.enabled:
+                    job_group = f"{event_type} batch {batch_num}"
+                    spark.sparkContext.setJobGroup(job_group, f"Write {job_group}")
+                    files_before, bytes_before = directory_stats(output_path)
+
+                report = _append_staged(spark, events_df, output_path, write_options)
+                print(f"Appended {report['written']} events, skipped {report['duplicates']} already stored")
+
+                if metrics.enabled:
+                    files_after, bytes_after = directory_stats(output_path)
+                    stage.add(
+                        rows=report['written'],
+                        files_written=files_after - files_before,
+                        bytes_written=bytes_after - bytes_before,
+                        **spark_stage_metrics(spark, job_group)
+                    )
+
+            remaining -= current_batch_size
+            batch_num += 1
+
+def _write_single(spark, generators, generator_kwargs, date_range, output_path, write_options, metrics, mode, seed):
+    """Write every event type with one plan, one Spark job and one commit.
+
+    The event types are unioned in EVENT_CONFIG proportions. Each generator
+    splits its rows into its share of the tasks (spark.range partitions),
+    so tasks hold about ROWS_PER_TASK events, and the cluster's default
+    parallelism is still used for small volumes, without a shuffle. With
+    config.APPEND the events are appended through event_store.dedup
+    (_append_staged) instead of replacing the dataset.
+    """
+    volumes = {key: settings['num_events'] for key, settings in config.EVENT_CONFIG.items() if settings['num_events']}
+    total_events = sum(volumes.values())
+    total_tasks = max(spark.sparkContext.defaultParallelism, math.ceil(total_events / ROWS_PER_TASK))
+
+    frames = []
+    for config_key, num_events in volumes.items():
+        tasks = max(1, round(total_tasks * num_events / total_events))
+        print(f"Planning {num_events} {config_key} events in {tasks} tasks")
+        frames.append(with_event_ids(generators[config_key](spark, num_events, *date_range, num_partitions=tasks,
+                                                            seed=_call_seed(seed, config_key), **generator_kwargs)))
+    events_df = reduce(DataFrame.unionByName, frames)
+
+    print(f"Saving {total_events} events in a single job...")
+    with metrics.stage("write", mode=mode, event_type="all") as stage:
+        if metrics.enabled:
+            job_group = "all events"
+            spark.sparkContext.setJobGroup(job_group, "Write all events")
+
+        if config.APPEND:
+            report = _append_staged(spark, events_df, output_path, write_options)
+            print(f"Appended {report['written']} events, skipped {report['duplicates']} already stored")
+        else:
+            events_df.write.options(**write_options).partitionBy(config.PARTITION_BY).mode("overwrite").parquet(output_path)
+
+        if metrics.enabled:
+            files_written, bytes_written = directory_stats(output_path)
+            stage.add(rows=total_events, files_written=files_written, bytes_written=bytes_written,
+                      **spark_stage_metrics(spark, job_group))
+
+def _write_order_items(spark, output_path, items_path, write_options, metrics):
+    """Derive the order_items table from the order events just written.
+
+    The written events are read back rather than reused, as re-evaluating
+    the generation plan would draw different random values. Items are
+    range-partitioned and sorted by product_id, so each file covers a
+    narrow, disjoint range of products.
+    """
+    items = (
+        order_items_frame(spark.read.parquet(output_path))
+        .repartitionByRange("product_id")
+        .sortWithinPartitions("product_id", "event_timestamp")
+    )
+    print("Saving order items...")
+    with metrics.stage("write", event_type="order_items"):
+        items.write.options(**write_options).mode("overwrite").parquet(items_path)
+
+# Spark write plans: "single" writes all event types in one job and commit,
+# "batched" runs one job per BATCH_SIZE events of each type (lower peak memory per job)
+WRITE_PLANS = {
+    "single": _write_single,
+    "batched": _write_batched
+}
+
+def generate_all_events(mode=None, plan=None, profile=None, seed=None):
+    """Generate all event types and save to Parquet files.
+
+    The items of order events are then written to the order_items table
+    in OUTPUT_DIR/order_items, one typed row per item.
+
+    Args:
+        mode: Spark generation mode, "native" or "udf" (defaults to config.GENERATION_MODE)
+        plan: Write plan, "single" or "batched" (defaults to config.WRITE_PLAN)
+        profile: Parquet writer profile (defaults to config.WRITER_PROFILE, see parquet_profiles.py)
+        seed: Seed of the generators (defaults to config.SEED)
+    """
+    mode = mode or config.GENERATION_MODE
+    plan = plan or config.WRITE_PLAN
+    profile = profile or config.WRITER_PROFILE
+    seed = config.SEED if seed is None else seed
+    write_options = spark_write_options(profile)
+    if plan not in WRITE_PLANS:
+        raise ValueError(f"Unknown write plan '{plan}', expected one of {list(WRITE_PLANS)}")
+    generators = SPARK_GENERATORS[mode]
+    # The UDF path only produces JSON strings
+    generator_kwargs = {
+        "typed": config.EVENT_VALUE_FORMAT == "typed",
+        "id_format": config.ID_FORMAT
+    } if mode == "native" else {}
+    print(f"Starting event generation ({mode} mode, {plan} plan)...")
     start_time = datetime.now()
     
     # Ensure output directory exists
@@ -219,46 +662,26 @@ def generate_all_events():
     
     # Initialize Spark
     spark = initialize_spark()
+    if write_options:
+        for key, value in SPARK_SQL_CONF.items():
+            spark.conf.set(key, value)
+    metrics = Metrics(config.METRICS_OUTPUT, config.METRICS_PROFILE_DIR)
     
-    # Process in batches
-    batch_size = 1000000  # 1 million events per batch
     output_path = os.path.join(config.OUTPUT_DIR, "events")
+    WRITE_PLANS[plan](spark, generators, generator_kwargs, config.date_range(), output_path, write_options, metrics, mode,
+                      seed)
+    _write_order_items(spark, output_path, os.path.join(config.OUTPUT_DIR, "order_items"), write_options, metrics)
     
-    # Generate events in batches
-    total_product_events = config.EVENT_CONFIG['product_view']['num_events']
-    total_order_events = config.EVENT_CONFIG['order']['num_events']
-    total_account_events = config.EVENT_CONFIG['account']['num_events']
-    
-    # Generate all events in batches
-    for event_type, total_events, generator_func in [
-        ("product view", total_product_events, generate_product_view_events_spark),
-        ("order", total_order_events, generate_order_events_spark),
-        ("account", total_account_events, generate_account_events_spark)
-    ]:
-        remaining = total_events
-        batch_num = 1
-        
-        while remaining > 0:
-            current_batch_size = min(batch_size, remaining)
-            print(f"Generating {event_type} events batch {batch_num}: {current_batch_size} events")
-            
-            events_df = generator_func(spark, current_batch_size, config.START_DATE, config.END_DATE)
-            
-            # Write mode: overwrite for first batch of first event type, append for all others
-            write_mode = "overwrite" if event_type == "product view" and batch_num == 1 else "append"
-            
-            print(f"Saving batch {batch_num} with mode {write_mode}...")
-            events_df.write.partitionBy(config.PARTITION_BY).mode(write_mode).parquet(output_path)
-            
-            remaining -= current_batch_size
-            batch_num += 1
-    
+    if config.METRICS_PROFILE_DIR:
+        spark.sparkContext.dump_profiles(config.METRICS_PROFILE_DIR)
+    metrics.close()
+
     # Stop Spark session
     spark.stop()
     
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
-    total_events = total_product_events + total_order_events + total_account_events
+    total_events = sum(settings['num_events'] for settings in config.EVENT_CONFIG.values())
     print(f"Event generation completed in {duration:.2f} seconds.")
     print(f"Total {total_events} events saved to {output_path}")
 
@@ -0,0 +1,401 @@
+import os
+import re
+import sys
+import abc
+import json
+import math
+import time
+import asyncio
+import argparse
+from collections import deque
+from datetime import datetime, timedelta
+import numpy as np
+
+import config
+from stream_writer import BATCH_GENERATORS
+
+# Events generated per refill of an event type's buffer, and the most sent in one tick
+CHUNK_EVENTS = 10000
+
+# Interval between pacing decisions; each tick's due events are sent as one write
+TICK_SECONDS = 0.05
+
+# Ticks of events that may wait for a slow sink before backpressure applies
+DEFAULT_QUEUE_TICKS = 20
+
+# What to do when the queue is full: wait for the sink, or drop the tick's events
+OVERFLOW_POLICIES = ['block', 'drop']
+
+# 'real' stamps events with the wall clock; 'compressed' replays from
+# the start of config.date_range() with compression seconds of event time per real second
+TIME_MODES = ['real', 'compressed']
+
+# Completed files of a SpoolSink, numbered in the order they were written
+_SPOOL_FILE = re.compile(r"part-(\d+)\.json")
+
+def constant_profile(rate):
+    """Target rate profile sending rate events per second."""
+    return lambda elapsed: rate
+
+def burst_profile(rate, burst_rate, burst_seconds, period_seconds):
+    """Send at rate, rising to burst_rate for burst_seconds at the start of every period."""
+    return lambda elapsed: burst_rate if elapsed % period_seconds < burst_seconds else rate
+
+def ramp_profile(start_rate, end_rate, ramp_seconds):
+    """Rise linearly from start_rate to end_rate over ramp_seconds, then hold."""
+    return lambda elapsed: start_rate + (end_rate - start_rate) * min(elapsed / ramp_seconds, 1.0)
+
+def sine_profile(rate, amplitude, period_seconds):
+    """Oscillate around rate by amplitude events per second (a daily cycle, compressed)."""
+    return lambda elapsed: max(rate + amplitude * math.sin(2 * math.pi * elapsed / period_seconds), 0.0)
+
+def _json_default(value):
+    """Encode the values json cannot: binary IDs as hex, timestamps as ISO-8601."""
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+class EventSource:
+    """Endless mix of events from the vectorized batch generators.
+
+    Event types are interleaved at random in EVENT_CONFIG proportions.
+    Payloads are typed, so they serialize as nested JSON objects holding
+    only the fields of their own event name.
+    """
+
+    def __init__(self, seed=None):
+        seeds = np.random.SeedSequence(seed).spawn(len(BATCH_GENERATORS) + 1)
+        self._rng = np.random.default_rng(seeds[0])
+        weights = np.array([config.EVENT_CONFIG[event_type]['num_events'] for event_type in BATCH_GENERATORS], float)
+        self._weights = weights / weights.sum()
+        self._streams = [
+            generator_func(sys.maxsize, *config.date_range(), batch_size=CHUNK_EVENTS,
+                           seed=event_seed, typed=True, id_format=config.ID_FORMAT)
+            for generator_func, event_seed in zip(BATCH_GENERATORS.values(), seeds[1:])
+        ]
+        self._buffers = [deque() for _ in self._streams]
+        # Fill every buffer up front so building the value pools does not stall the first ticks
+        for index in range(len(self._streams)):
+            self._pop(index, 0)
+
+    def _pop(self, index, count):
+        buffer = self._buffers[index]
+        while len(buffer) <= count:
+            for row in next(self._streams[index]).to_pylist():
+                row['event_value'] = {key: value for key, value in row['event_value'].items() if value is not None}
+                buffer.append(row)
+        return [buffer.popleft() for _ in range(count)]
+
+    def take(self, count, first_timestamp, last_timestamp):
+        """Serialize the next count events as NDJSON, stamped evenly from first to last timestamp.
+
+        Returns:
+            The events as one bytes payload, one JSON object per line
+        """
+        picks = self._rng.choice(len(self._streams), size=count, p=self._weights)
+        rows = [None] * count
+        for index in range(len(self._streams)):
+            positions = np.flatnonzero(picks == index)
+            for position, row in zip(positions, self._pop(index, len(positions))):
+                rows[position] = row
+
+        step = (last_timestamp - first_timestamp) / count
+        lines = []
+        for i, row in enumerate(rows):
+            row['event_timestamp'] = first_timestamp + step * (i + 1)
+            lines.append(json.dumps(row, default=_json_default, separators=(',', ':')))
+        return ('\n'.join(lines) + '\n').encode()
+
+class Sink(abc.ABC):
+    """Destination of the NDJSON event stream. write() awaits until the sink accepts the data."""
+
+    async def open(self):
+        pass
+
+    @abc.abstractmethod
+    async def write(self, data):
+        pass
+
+    async def close(self):
+        pass
+
+class FileSink(Sink):
+    """Append NDJSON to a file, or to stdout when path is '-'."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    async def open(self):
+        self._file = sys.stdout.buffer if self.path == '-' else open(self.path, 'ab')
+
+    async def write(self, data):
+        # File writes block, so they run off the event loop
+        await asyncio.to_thread(self._file.write, data)
+
+    async def close(self):
+        await asyncio.to_thread(self._file.flush)
+        if self._file is not sys.stdout.buffer:
+            self._file.close()
+
+class SocketSink(Sink):
+    """Send NDJSON over a local TCP (host, port) or Unix socket (path) connection."""
+
+    def __init__(self, host=None, port=None, path=None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self._writer = None
+
+    async def open(self):
+        if self.path:
+            _, self._writer = await asyncio.open_unix_connection(self.path)
+        else:
+            _, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def write(self, data):
+        self._writer.write(data)
+        # Waits while the socket buffer is above its high-water mark
+        await self._writer.drain()
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+class SpoolSink(Sink):
+    """Roll NDJSON into files that Spark Structured Streaming can read as they appear.
+
+    Files are written under a hidden name and renamed into place once
+    complete, so a streaming reader such as
+    spark.readStream.schema(schema).json(directory) never picks up a partial file.
+    """
+
+    def __init__(self, directory, max_events=100000, max_seconds=10.0):
+        self.directory = directory
+        self.max_events = max_events
+        self.max_seconds = max_seconds
+        self._sequence = 0
+        self._file = None
+        self._events = 0
+        self._opened_at = 0.0
+
+    def _staging_path(self):
+        return os.path.join(self.directory, f".part-{self._sequence:08d}.json.tmp")
+
+    def _roll(self):
+        if self._file is not None:
+            self._file.close()
+            os.replace(self._staging_path(), os.path.join(self.directory, f"part-{self._sequence:08d}.json"))
+            self._sequence += 1
+        self._file = open(self._staging_path(), 'wb')
+        self._events = 0
+        self._opened_at = time.monotonic()
+
+    async def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # Numbering continues after the highest existing file, so none is overwritten
+        # even when earlier files were removed by a consumer
+        matches = (_SPOOL_FILE.fullmatch(name) for name in os.listdir(self.directory))
+        self._sequence = max((int(match.group(1)) + 1 for match in matches if match), default=0)
+        self._roll()
+
+    def _write(self, data):
+        self._file.write(data)
+        self._events += data.count(b'\n')
+        if self._events >= self.max_events or time.monotonic() - self._opened_at >= self.max_seconds:
+            self._roll()
+
+    async def write(self, data):
+        await asyncio.to_thread(self._write, data)
+
+    async def close(self):
+        self._file.close()
+        if self._events:
+            os.replace(self._staging_path(), os.path.join(self.directory, f"part-{self._sequence:08d}.json"))
+        else:
+            os.remove(self._staging_path())
+
+def open_sink(spec):
+    """Build a sink from a spec: '-', a file path, tcp://host:port, unix:///path or spool:///directory."""
+    if spec.startswith('tcp://'):
+        host, port = spec[len('tcp://'):].rsplit(':', 1)
+        return SocketSink(host=host, port=int(port))
+    if spec.startswith('unix://'):
+        return SocketSink(path=spec[len('unix://'):])
+    if spec.startswith('spool://'):
+        return SpoolSink(spec[len('spool://'):])
+    return FileSink(spec)
+
+class StreamStats:
+    """Counters of a streaming run, shared by the producer, the sink writer and the reporter."""
+
+    def __init__(self):
+        self.due = 0.0
+        self.produced = 0
+        self.sent = 0
+        self.dropped = 0
+        self.blocked_seconds = 0.0
+
+    def summary(self, seconds):
+        return {
+            'seconds': seconds,
+            'target_events': int(self.due),
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'target_rate': self.due / seconds if seconds else 0.0,
+            'achieved_rate': self.sent / seconds if seconds else 0.0,
+            'blocked_seconds': self.blocked_seconds
+        }
+
+async def _produce(source, queue, stats, profile, duration, max_events, time_mode, compression, overflow):
+    loop = asyncio.get_running_loop()
+    started = last_tick = loop.time()
+    wall_start = datetime.now()
+    replay_start = config.date_range()[0]
+    event_time = wall_start if time_mode == 'real' else replay_start
+
+    while True:
+        await asyncio.sleep(TICK_SECONDS)
+        now = loop.time()
+        elapsed = now - started
+        if duration is not None and elapsed >= duration:
+            break
+        stats.due += profile(elapsed) * (now - last_tick)
+        last_tick = now
+
+        # At most one chunk per tick, so a producer that falls behind keeps ticking and reporting
+        count = min(int(stats.due) - stats.produced - stats.dropped, CHUNK_EVENTS)
+        if max_events is not None:
+            count = min(count, max_events - stats.produced - stats.dropped)
+        if count <= 0:
+            if max_events is not None and stats.produced + stats.dropped >= max_events:
+                break
+            continue
+
+        if time_mode == 'real':
+            next_event_time = wall_start + timedelta(seconds=elapsed)
+        else:
+            next_event_time = replay_start + timedelta(seconds=elapsed * compression)
+        if overflow == 'drop' and queue.full():
+            stats.dropped += count
+        else:
+            data = await asyncio.to_thread(source.take, count, event_time, next_event_time)
+            blocked_at = loop.time()
+            await queue.put((count, data))
+            stats.blocked_seconds += loop.time() - blocked_at
+            stats.produced += count
+        event_time = next_event_time
+
+    await queue.put(None)
+
+async def _consume(queue, sink, stats):
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        count, data = item
+        await sink.write(data)
+        stats.sent += count
+
+async def _report(stats, queue, started, interval, stream):
+    loop = asyncio.get_running_loop()
+    last_due, last_sent = 0.0, 0
+    while True:
+        await asyncio.sleep(interval)
+        print(
+            f"[{loop.time() - started:7.1f}s] target {(stats.due - last_due) / interval:10.0f} ev/s"
+            f"  achieved {(stats.sent - last_sent) / interval:10.0f} ev/s"
+            f"  sent {stats.sent}  dropped {stats.dropped}  queued {queue.qsize()}",
+            file=stream, flush=True
+        )
+        last_due, last_sent = stats.due, stats.sent
+
+async def stream_events(sink, profile, duration=None, max_events=None, time_mode='real', compression=60.0,
+                        seed=None, queue_ticks=DEFAULT_QUEUE_TICKS, overflow='block', report_interval=5.0,
+                        report_stream=sys.stderr):
+    """Stream NDJSON events to a sink at the rate given by a profile.
+
+    Every tick the producer computes how many events the profile has made
+    due, serializes them and queues them for the sink writer. A slow sink
+    fills the bounded queue; then the producer either waits (overflow
+    'block', and catches up when the sink recovers) or drops the tick's
+    events (overflow 'drop'). Target and achieved rates are reported every
+    report_interval seconds.
+
+    Args:
+        sink: Sink to write to (see open_sink)
+        profile: Callable mapping elapsed seconds to a target rate in events/s
+        duration: Seconds to run for (None runs until max_events or forever)
+        max_events: Stop after this many events were due
+        time_mode: 'real' or 'compressed' event timestamps (see TIME_MODES)
+        compression: Seconds of event time per real second in compressed mode
+        seed: Optional seed for the event generators
+        queue_ticks: Ticks of events buffered before backpressure applies
+        overflow: 'block' or 'drop' (see OVERFLOW_POLICIES)
+        report_interval: Seconds between rate reports (None disables them)
+        report_stream: Text stream the reports are printed to
+
+    Returns:
+        Summary dict with target and achieved rates and event counts
+    """
+    if time_mode not in TIME_MODES:
+        raise ValueError(f"Unknown time mode '{time_mode}', expected one of {TIME_MODES}")
+    if overflow not in OVERFLOW_POLICIES:
+        raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {OVERFLOW_POLICIES}")
+
+    loop = asyncio.get_running_loop()
+    source = EventSource(seed)
+    queue = asyncio.Queue(maxsize=queue_ticks)
+    stats = StreamStats()
+    await sink.open()
+    started = loop.time()
+
+    reporter = asyncio.create_task(_report(stats, queue, started, report_interval, report_stream)) \
+        if report_interval else None
+    try:
+        await asyncio.gather(
+            _produce(source, queue, stats, profile, duration, max_events, time_mode, compression, overflow),
+            _consume(queue, sink, stats)
+        )
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+        await sink.close()
+    return stats.summary(loop.time() - started)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream events at a controlled rate to a live sink.")
+    parser.add_argument("--sink", default="-", help="'-', a file path, tcp://host:port, unix:///path or spool:///dir")
+    parser.add_argument("--rate", type=float, default=1000, help="Base target rate in events per second")
+    parser.add_argument("--profile", choices=["constant", "burst", "ramp", "sine"], default="constant",
+                        help="Shape of the target rate over time")
+    parser.add_argument("--burst-rate", type=float, default=None, help="Rate during bursts (default 10x rate)")
+    parser.add_argument("--burst-seconds", type=float, default=5, help="Length of each burst")
+    parser.add_argument("--period", type=float, default=60, help="Burst or sine period in seconds")
+    parser.add_argument("--ramp-seconds", type=float, default=60, help="Time to ramp from 0 to rate")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds to run for")
+    parser.add_argument("--max-events", type=int, default=None, help="Stop after this many events")
+    parser.add_argument("--time-mode", choices=TIME_MODES, default="real", help="Event timestamp ordering")
+    parser.add_argument("--compression", type=float, default=60.0, help="Event seconds per real second")
+    parser.add_argument("--overflow", choices=OVERFLOW_POLICIES, default="block", help="Policy when the sink lags")
+    parser.add_argument("--queue-ticks", type=int, default=DEFAULT_QUEUE_TICKS,
+                        help="Ticks of events buffered for a slow sink before the overflow policy applies")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the event generators")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="Seconds between rate reports")
+    args = parser.parse_args()
+
+    profiles = {
+        "constant": lambda: constant_profile(args.rate),
+        "burst": lambda: burst_profile(args.rate, args.burst_rate or args.rate * 10, args.burst_seconds, args.period),
+        "ramp": lambda: ramp_profile(0.0, args.rate, args.ramp_seconds),
+        "sine": lambda: sine_profile(args.rate, args.rate / 2, args.period)
+    }
+    summary = asyncio.run(stream_events(
+        open_sink(args.sink), profiles[args.profile](), duration=args.duration, max_events=args.max_events,
+        time_mode=args.time_mode, compression=args.compression, seed=args.seed, queue_ticks=args.queue_ticks, overflow=args.overflow,
+        report_interval=args.report_interval
+    ))
+    print(f"Sent {summary['sent']} events in {summary['seconds']:.1f}s: achieved {summary['achieved_rate']:.0f} ev/s "
+          f"vs target {summary['target_rate']:.0f} ev/s, dropped {summary['dropped']}", file=sys.stderr)
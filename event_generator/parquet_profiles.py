@@ -0,0 +1,262 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+import config
+
+# Low-cardinality columns written with dictionary encoding, as column paths.
+# Payload paths only exist with typed event_value and are skipped otherwise
+DICTIONARY_COLUMNS = [
+    'event_name',
+    'event_category',
+    'event_value.category',
+    'event_value.source_page',
+    'event_value.payment_method',
+    'event_value.registration_source',
+    'event_value.field_updated',
+    'event_value.source',
+    'event_value.password_strength',
+    'event_value.device_type',
+    'event_value.browser',
+    'event_value.reason',
+    'event_value.logout_type'
+]
+
+# Nearly monotonic columns written with delta encoding instead of a dictionary
+DELTA_COLUMNS = ['event_timestamp']
+
+# False positive rate of the Parquet Bloom filters, per row group
+BLOOM_FILTER_FPP = 0.01
+
+# Named writer profiles shared by the Spark and pyarrow writers. Row groups are
+# sized in rows for pyarrow and in bytes for Spark (parquet-mr's unit); Spark
+# always writes page indexes, so page_index only changes the pyarrow writer
+WRITER_PROFILES = {
+    # Cold storage: smallest files, large row groups for full scans
+    'archive': {
+        'compression': 'zstd',
+        'compression_level': 19,
+        'row_group_rows': 4 * 1024 * 1024,
+        'row_group_bytes': 512 * 1024 * 1024,
+        'page_bytes': 1024 * 1024,
+        'page_index': False,
+        'bloom_filter_columns': []
+    },
+    # Selective queries: small row groups and pages that statistics, page
+    # indexes and Bloom filters can skip, with a cheap codec
+    'interactive': {
+        'compression': 'snappy',
+        'compression_level': None,
+        'row_group_rows': 128 * 1024,
+        'row_group_bytes': 16 * 1024 * 1024,
+        'page_bytes': 64 * 1024,
+        'page_index': True,
+        'bloom_filter_columns': ['entity_id', 'event_id']
+    }
+}
+
+# Spark session settings the profiles need: INT96 timestamps cannot be delta encoded
+SPARK_SQL_CONF = {'spark.sql.parquet.outputTimestampType': 'TIMESTAMP_MICROS'}
+
+def writer_profile(name):
+    """Settings of a profile in WRITER_PROFILES, or None for the writer defaults."""
+    if name is None:
+        return None
+    if name not in WRITER_PROFILES:
+        raise ValueError(f"Unknown writer profile '{name}', expected one of {list(WRITER_PROFILES)}")
+    return WRITER_PROFILES[name]
+
+def _column_paths(schema):
+    """Dotted paths and types of the leaf columns of a schema, through structs."""
+    paths = {}
+
+    def visit(field, prefix):
+        if pa.types.is_struct(field.type):
+            for child in field.type:
+                visit(child, f"{prefix}{field.name}.")
+        else:
+            paths[prefix + field.name] = field.type
+
+    for field in schema:
+        visit(field, '')
+    return paths
+
+def parquet_file_options(name, schema):
+    """pyarrow.dataset Parquet write options of a profile for data of the given schema.
+
+    Args:
+        name: Key of WRITER_PROFILES, or None for the pyarrow defaults
+        schema: Schema of the data written, without the partition columns
+
+    Returns:
+        A FileWriteOptions for write_dataset's file_options, or None
+    """
+    profile = writer_profile(name)
+    if profile is None:
+        return None
+    paths = _column_paths(schema)
+    delta_columns = [path for path in DELTA_COLUMNS if path in paths
+                     and (pa.types.is_timestamp(paths[path]) or pa.types.is_integer(paths[path]))]
+    return ds.ParquetFileFormat().make_write_options(
+        compression=profile['compression'],
+        compression_level=profile['compression_level'],
+        use_dictionary=[path for path in DICTIONARY_COLUMNS if path in paths],
+        column_encoding={path: 'DELTA_BINARY_PACKED' for path in delta_columns},
+        data_page_size=profile['page_bytes'],
+        data_page_version='2.0',
+        write_page_index=profile['page_index'],
+        bloom_filter_options={path: {'ndv': profile['row_group_rows'], 'fpp': BLOOM_FILTER_FPP}
+                              for path in profile['bloom_filter_columns'] if path in paths}
+    )
+
+def spark_write_options(name):
+    """DataFrameWriter options of a profile for Spark's Parquet writer.
+
+    Dictionary encoding is off except for DICTIONARY_COLUMNS, and the v2
+    writer then delta encodes integer and timestamp columns. Options are
+    passed through to parquet-mr, so they need the session settings in
+    SPARK_SQL_CONF too.
+
+    Args:
+        name: Key of WRITER_PROFILES, or None for the Spark defaults
+
+    Returns:
+        Dict of option names to string values
+    """
+    profile = writer_profile(name)
+    if profile is None:
+        return {}
+    options = {
+        'compression': profile['compression'],
+        'parquet.block.size': str(profile['row_group_bytes']),
+        'parquet.page.size': str(profile['page_bytes']),
+        'parquet.writer.version': 'v2',
+        'parquet.enable.dictionary': 'false'
+    }
+    if profile['compression_level'] is not None:
+        options[f"parquet.compression.codec.{profile['compression']}.level"] = str(profile['compression_level'])
+    for path in DICTIONARY_COLUMNS:
+        options[f'parquet.enable.dictionary#{path}'] = 'true'
+    for path in profile['bloom_filter_columns']:
+        options[f'parquet.bloom.filter.enabled#{path}'] = 'true'
+        options[f'parquet.bloom.filter.expected.ndv#{path}'] = str(profile['row_group_rows'])
+        options[f'parquet.bloom.filter.fpp#{path}'] = str(BLOOM_FILTER_FPP)
+    return options
+
+def sample_events(path, sample_rows, seed=0):
+    """Read about sample_rows events spread evenly over the files of a dataset."""
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    fragments = list(dataset.get_fragments())
+    per_file = -(-sample_rows // max(len(fragments), 1))
+    tables = [ds.FileSystemDataset([fragment], dataset.schema, dataset.format, dataset.filesystem).head(per_file)
+              for fragment in fragments]
+    sample = pa.concat_tables(tables)
+    if sample.num_rows > sample_rows:
+        rows = np.random.default_rng(seed).choice(sample.num_rows, sample_rows, replace=False)
+        sample = sample.take(pa.array(np.sort(rows)))
+    return sample
+
+def _directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def _timed(function, repeats):
+    """Best wall time of repeated calls, in seconds."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def profile_report(path, sample_rows=1000000, profiles=None, lookups=20, repeats=3, sort=False, seed=0):
+    """Write a sample of the events with each profile and measure size and scan speed.
+
+    The sample is written partitioned like the generator's output, then
+    read back in full and with point lookups on entity_id (which row group
+    statistics and, for readers that use them, Bloom filters can skip).
+
+    Args:
+        path: Events dataset directory
+        sample_rows: Number of events sampled
+        profiles: Profile names (defaults to all; None in the list means the pyarrow defaults)
+        lookups: Number of entity IDs looked up, one query each
+        repeats: Runs per timing, the best is kept
+        sort: Sort the sample by event_timestamp first, as sorted or compacted files are
+        seed: Seed of the row and entity sampling
+
+    Returns:
+        List of dicts with the profile, bytes, write, scan and lookup seconds per profile
+    """
+    sample = sample_events(path, sample_rows, seed)
+    if sort:
+        sample = sample.sort_by('event_timestamp')
+    partition_by = [name for name in config.PARTITION_BY if name in sample.column_names]
+    entity_ids = pc.unique(sample['entity_id'])
+    picks = np.random.default_rng(seed).choice(len(entity_ids), min(lookups, len(entity_ids)), replace=False)
+    lookup_ids = [entity_ids[int(i)].as_py() for i in picks]
+    data_schema = pa.schema([field for field in sample.schema if field.name not in partition_by])
+
+    results = []
+    root = tempfile.mkdtemp(prefix='parquet-profiles-')
+    try:
+        for name in (profiles if profiles is not None else [None] + list(WRITER_PROFILES)):
+            profile = writer_profile(name)
+            output = os.path.join(root, name or 'default')
+            rows_per_group = profile['row_group_rows'] if profile else 1024 * 1024
+
+            def write():
+                ds.write_dataset(
+                    sample, output, format='parquet', partitioning=partition_by, partitioning_flavor='hive',
+                    existing_data_behavior='delete_matching', file_options=parquet_file_options(name, data_schema),
+                    min_rows_per_group=rows_per_group, max_rows_per_group=rows_per_group
+                )
+
+            write_seconds = _timed(write, 1)
+            dataset = ds.dataset(output, format='parquet', partitioning='hive')
+
+            def lookup():
+                for entity_id in lookup_ids:
+                    dataset.to_table(filter=ds.field('entity_id') == entity_id)
+
+            results.append({
+                'profile': name or 'default',
+                'bytes': _directory_size(output),
+                'write_seconds': write_seconds,
+                'scan_seconds': _timed(dataset.to_table, repeats),
+                'lookup_seconds': _timed(lookup, repeats) / max(len(lookup_ids), 1)
+            })
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parquet writer profiles")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Print the profiles and their Spark write options")
+    report_parser = commands.add_parser("report", help="Compare size and scan speed of the profiles on a sample")
+    report_parser.add_argument("--path", default=os.path.join(config.OUTPUT_DIR, "events"), help="Events dataset directory")
+    report_parser.add_argument("--sample-rows", type=int, default=1000000, help="Number of events sampled")
+    report_parser.add_argument("--lookups", type=int, default=20, help="Entity IDs looked up")
+    report_parser.add_argument("--repeats", type=int, default=3, help="Runs per timing")
+    report_parser.add_argument("--sort", action="store_true", help="Sort the sample by event_timestamp")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name, profile in WRITER_PROFILES.items():
+            print(f"{name}: {profile}")
+            for option, value in spark_write_options(name).items():
+                print(f"  {option}={value}")
+    else:
+        results = profile_report(args.path, args.sample_rows, lookups=args.lookups, repeats=args.repeats, sort=args.sort)
+        baseline = results[0]['bytes']
+        print(f"{'profile':<12} {'MB':>9} {'ratio':>6} {'write s':>8} {'scan s':>8} {'lookup ms':>10}")
+        for result in results:
+            print(f"{result['profile']:<12} {result['bytes'] / 2**20:>9.2f} {result['bytes'] / baseline:>6.2f} "
+                  f"{result['write_seconds']:>8.3f} {result['scan_seconds']:>8.3f} {result['lookup_seconds'] * 1000:>10.2f}")
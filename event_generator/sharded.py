@@ -0,0 +1,124 @@
+import os
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+
+import config
+from stream_writer import BATCH_GENERATORS, with_event_ids, write_event_batches
+from utils.order_items import with_order_items
+from utils.vector_utils import DEFAULT_BATCH_SIZE
+
+def split_counts(total, num_shards):
+    """Split total into num_shards near-equal counts, larger shards first."""
+    base, extra = divmod(total, num_shards)
+    return [base + (1 if i < extra else 0) for i in range(num_shards)]
+
+def shard_seed(master_seed, event_index, shard_index):
+    """Derive the seed of one shard from the master seed and the shard's position.
+
+    Args:
+        master_seed: Seed of the whole run
+        event_index: Position of the event type in BATCH_GENERATORS
+        shard_index: Index of the shard within the event type
+
+    Returns:
+        A numpy SeedSequence independent of every other shard's
+    """
+    return np.random.SeedSequence(master_seed, spawn_key=(event_index, shard_index))
+
+def generate_shard(event_type, shard_index, num_events, seed, start_date, end_date, output_path, batch_size,
+                   typed, id_format, profile=None):
+    """Generate one shard of an event type and write it as its own Parquet part files.
+
+    Runs in a worker process. File names embed the event type and shard index
+    so shards never overwrite each other. Typed order shards also write their
+    items to the order_items directory next to output_path.
+
+    Returns:
+        Tuple of (event_type, shard_index, rows written)
+    """
+    batches = with_event_ids(BATCH_GENERATORS[event_type](
+        num_events, start_date, end_date, batch_size=batch_size, seed=seed, typed=typed, id_format=id_format
+    ))
+    if event_type == "order" and typed:
+        items_path = os.path.join(os.path.dirname(output_path), "order_items")
+        batches = with_order_items(batches, items_path, f"{event_type}-shard-{shard_index:05d}")
+    rows = write_event_batches(
+        batches,
+        output_path,
+        basename_template=f"{event_type}-shard-{shard_index:05d}-{{i}}.parquet",
+        replace_partitions=False,
+        profile=profile
+    )
+    return event_type, shard_index, rows
+
+def generate_all_events_sharded(seed, workers=None, start_date=None, end_date=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Generate all event types across a process pool with reproducible output.
+
+    Every EVENT_CONFIG count is split into one shard per worker, and each shard
+    is seeded from (seed, event type, shard index). For a given seed, worker
+    count and date range the written files are bit-identical between runs.
+
+    Args:
+        seed: Master seed for the run
+        workers: Number of worker processes and shards per event type (defaults to all cores)
+        start_date: Start date for event timestamps (defaults to config.date_range());
+            pin it together with end_date for reproducible datasets
+        end_date: End date for event timestamps (defaults to config.date_range())
+        batch_size: Number of events per RecordBatch within a shard
+    """
+    if config.ID_FORMAT == 'surrogate':
+        # Every shard would assign its own surrogate keys to new IDs
+        raise ValueError("Sharded generation does not support surrogate IDs, use the 'hex' or 'binary' ID format")
+
+    workers = workers or os.cpu_count()
+    default_start, default_end = config.date_range()
+    start_date = start_date or default_start
+    end_date = end_date or default_end
+
+    print(f"Starting sharded event generation with {workers} workers (seed {seed})...")
+    start_time = datetime.now()
+
+    # Shards only write their own files, so clear previous output up front
+    output_path = os.path.join(config.OUTPUT_DIR, "events")
+    if os.path.exists(output_path):
+        shutil.rmtree(output_path)
+    os.makedirs(output_path)
+    shutil.rmtree(os.path.join(config.OUTPUT_DIR, "order_items"), ignore_errors=True)
+
+    total_events = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for event_index, event_type in enumerate(BATCH_GENERATORS):
+            counts = split_counts(config.EVENT_CONFIG[event_type]['num_events'], workers)
+            for shard_index, num_events in enumerate(counts):
+                if num_events == 0:
+                    continue
+                futures.append(executor.submit(
+                    generate_shard, event_type, shard_index, num_events,
+                    shard_seed(seed, event_index, shard_index),
+                    start_date, end_date, output_path, batch_size,
+                    config.EVENT_VALUE_FORMAT == 'typed', config.ID_FORMAT, config.WRITER_PROFILE
+                ))
+
+        for future in futures:
+            event_type, shard_index, rows = future.result()
+            print(f"Finished {event_type} shard {shard_index}: {rows} events")
+            total_events += rows
+
+    end_time = datetime.now()
+    duration = (end_time - start_time).total_seconds()
+    print(f"Event generation completed in {duration:.2f} seconds.")
+    print(f"Total {total_events} events saved to {output_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate events across a process pool.")
+    parser.add_argument("--seed", type=int, default=0, help="Master seed for the run")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--start-date", type=datetime.fromisoformat, default=None, help="ISO start date")
+    parser.add_argument("--end-date", type=datetime.fromisoformat, default=None, help="ISO end date")
+    args = parser.parse_args()
+
+    generate_all_events_sharded(args.seed, args.workers, args.start_date, args.end_date)
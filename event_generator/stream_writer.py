@@ -0,0 +1,158 @@
+import os
+import shutil
+import itertools
+import numpy as np
+import pyarrow as pa
+from datetime import datetime
+import pyarrow.dataset as ds
+
+import config
+from event_types.product_events import generate_product_view_event_batches
+from event_types.order_events import generate_order_event_batches
+from event_types.account_events import generate_account_event_batches
+from parquet_profiles import writer_profile, parquet_file_options
+from utils.vector_utils import DEFAULT_BATCH_SIZE
+from utils.hash_utils import IdDictionary, content_event_ids
+from utils.metrics import Metrics, timed_batches
+from utils.order_items import with_order_items
+
+# Row group size for streamed Parquet files
+ROWS_PER_GROUP = 1000000
+
+# Streaming generator per EVENT_CONFIG key
+BATCH_GENERATORS = {
+    "product_view": generate_product_view_event_batches,
+    "order": generate_order_event_batches,
+    "account": generate_account_event_batches
+}
+
+def with_event_ids(batches):
+    """Append the content-derived event_id column (see utils.hash_utils.content_event_ids) to each batch."""
+    for batch in batches:
+        yield batch.append_column('event_id', content_event_ids(batch))
+
+def write_event_batches(batches, output_path, partition_by=None, basename_template=None, replace_partitions=True,
+                        file_visitor=None, profile=None):
+    """Write a stream of Arrow RecordBatches as hive-partitioned Parquet.
+
+    Batches are pulled one at a time by the dataset writer, so memory stays
+    bounded by the batch size instead of the total number of events.
+
+    Args:
+        batches: Iterable of RecordBatches sharing one schema
+        output_path: Root directory of the dataset
+        partition_by: Columns to partition by (defaults to config.PARTITION_BY)
+        basename_template: Optional file name template, must contain '{i}'
+        replace_partitions: Delete existing files in the partitions being written;
+            when False, files with other names are left in place
+        file_visitor: Optional callback receiving each written file (path, size)
+        profile: Parquet writer profile (see parquet_profiles.WRITER_PROFILES),
+            None for the pyarrow defaults
+
+    Returns:
+        Number of rows written
+    """
+    batches = iter(batches)
+    first = next(batches, None)
+    if first is None:
+        return 0
+
+    partition_by = partition_by or config.PARTITION_BY
+    settings = writer_profile(profile)
+    rows_per_group = settings['row_group_rows'] if settings else ROWS_PER_GROUP
+    data_schema = pa.schema([field for field in first.schema if field.name not in partition_by])
+
+    rows_written = 0
+
+    def counted(stream):
+        nonlocal rows_written
+        for batch in stream:
+            rows_written += batch.num_rows
+            yield batch
+
+    ds.write_dataset(
+        counted(itertools.chain([first], batches)),
+        output_path,
+        schema=first.schema,
+        format="parquet",
+        partitioning=partition_by,
+        partitioning_flavor="hive",
+        basename_template=basename_template,
+        existing_data_behavior="delete_matching" if replace_partitions else "overwrite_or_ignore",
+        file_options=parquet_file_options(profile, data_schema),
+        min_rows_per_group=min(rows_per_group, first.num_rows),
+        max_rows_per_group=rows_per_group,
+        file_visitor=file_visitor
+    )
+    return rows_written
+
+def generate_all_events_streaming(batch_size=DEFAULT_BATCH_SIZE, seed=None, profile=None):
+    """Generate all event types with the vectorized generators and stream them to Parquet.
+
+    Peak memory is bounded by batch_size regardless of the configured volumes.
+    With typed payloads the items of order events are also written to the
+    order_items table next to the events (see utils.order_items).
+
+    Args:
+        batch_size: Number of events per RecordBatch
+        seed: Optional seed for the numpy random generators
+        profile: Parquet writer profile (defaults to config.WRITER_PROFILE)
+    """
+    profile = profile or config.WRITER_PROFILE
+    print("Starting streaming event generation...")
+    start_time = datetime.now()
+    start_date, end_date = config.date_range()
+
+    output_path = os.path.join(config.OUTPUT_DIR, "events")
+    os.makedirs(output_path, exist_ok=True)
+    typed = config.EVENT_VALUE_FORMAT == 'typed'
+    # Rewritten with the order partition, so items of earlier runs are cleared
+    items_path = os.path.join(config.OUTPUT_DIR, "order_items")
+    shutil.rmtree(items_path, ignore_errors=True)
+
+    # Surrogate IDs of every event type share one dictionary, saved next to the events
+    id_dictionary = None
+    if config.ID_FORMAT == 'surrogate':
+        id_dictionary = IdDictionary(os.path.join(config.OUTPUT_DIR, config.ID_DICTIONARY_FILE))
+
+    metrics = Metrics(config.METRICS_OUTPUT, config.METRICS_PROFILE_DIR)
+
+    # Independent random streams per event type derived from the one seed
+    seeds = np.random.SeedSequence(seed).spawn(len(BATCH_GENERATORS))
+
+    total_events = 0
+    for (event_type, generator_func), event_seed in zip(BATCH_GENERATORS.items(), seeds):
+        num_events = config.EVENT_CONFIG[event_type]['num_events']
+        print(f"Streaming {num_events} {event_type} events in batches of {batch_size}")
+
+        batches = generator_func(
+            num_events, start_date, end_date,
+            batch_size=batch_size, seed=event_seed, typed=typed,
+            id_format=config.ID_FORMAT, id_dictionary=id_dictionary
+        )
+        if event_type == "order" and typed:
+            batches = with_order_items(batches, items_path, "part")
+        # The stream stage covers generation and write, the generate stages each batch
+        with metrics.stage("stream", event_type=event_type) as stage:
+            rows = write_event_batches(
+                with_event_ids(timed_batches(batches, metrics, event_type=event_type)),
+                output_path,
+                profile=profile,
+                file_visitor=(lambda written: stage.add(files_written=1, bytes_written=written.size))
+                if metrics.enabled else None
+            )
+            stage.add(rows=rows)
+        total_events += rows
+
+    if id_dictionary is not None:
+        id_dictionary.save()
+        print(f"Saved {len(id_dictionary)} surrogate IDs to {id_dictionary.path}")
+    metrics.close()
+
+    end_time = datetime.now()
+    duration = (end_time - start_time).total_seconds()
+    print(f"Event generation completed in {duration:.2f} seconds.")
+    print(f"Total {total_events} events saved to {output_path}")
+
+if __name__ == "__main__":
+    generate_all_events_streaming()
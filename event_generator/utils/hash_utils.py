@@ -1,12 +1,44 @@
+import os
 import hashlib
 import uuid
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Storage formats for entity, product and order IDs:
+# 'hex' - 32-char MD5 hex / 36-char UUID strings (the original format)
+# 'binary' - 16-byte fixed-size binary (MD5 digest / UUID bytes)
+# 'surrogate' - dense int32 keys into a persisted IdDictionary
+ID_FORMATS = ['hex', 'binary', 'surrogate']
+
+# Fresh IDs (order IDs, new account IDs) available in the 'surrogate' format.
+# They are drawn from a pool of this many deterministic IDs, so the persisted
+# IdDictionary stops growing once every pooled ID has its key
+SURROGATE_FRESH_ID_POOL_SIZE = 100000
+
+# Columns event IDs are derived from (see content_event_ids). event_category is
+# left out: it is a partition column, missing from the data files IDs may be
+# recomputed from
+EVENT_ID_COLUMNS = ['event_name', 'event_timestamp', 'entity_id', 'event_value']
+
+# The two 64-bit lanes of content_event_ids: their start values, and the shifts
+# and multipliers of the splitmix64 and murmur3 finalizers mixing values in
+_SEEDS = np.array([[0x243F6A8885A308D3], [0x13198A2E03707344]], dtype=np.uint64)
+_LANES = [
+    [np.uint64(value) for value in (30, 27, 31, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB)],
+    [np.uint64(value) for value in (33, 33, 33, 0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53)]
+]
+
+# ASCII hex digits, indexed by nibble
+_HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
 
 def generate_entity_id(seed=None):
     """Generate a hash-based entity ID.
-    
+
     Args:
         seed: Optional seed value to create deterministic hashes
-        
+
     Returns:
         A string hash value
     """
@@ -15,4 +47,271 @@ def generate_entity_id(seed=None):
         return hashlib.md5(str(seed).encode()).hexdigest()
     else:
         # Create random UUID
-        return str(uuid.uuid4())
\ No newline at end of file
+        return str(uuid.uuid4())
+
+def generate_entity_id_bytes(seed=None):
+    """Generate the 16-byte form of generate_entity_id.
+
+    Args:
+        seed: Optional seed value to create deterministic hashes
+
+    Returns:
+        The raw MD5 digest of the seed, or the bytes of a random UUID
+    """
+    if seed:
+        return hashlib.md5(str(seed).encode()).digest()
+    else:
+        return uuid.uuid4().bytes
+
+def _mix(state, values):
+    """Fold one 64-bit value per row into both lanes of the hash state, in place."""
+    state ^= values
+    for lane, (shift1, shift2, shift3, multiplier1, multiplier2) in zip(state, _LANES):
+        lane ^= lane >> shift1
+        lane *= multiplier1
+        lane ^= lane >> shift2
+        lane *= multiplier2
+        lane ^= lane >> shift3
+    return state
+
+def _update(state, rows, values):
+    """Mix values into the state of some rows, or of all rows when rows is None."""
+    if rows is None:
+        _mix(state, values)
+    else:
+        state[:, rows] = _mix(state[:, rows], values)
+
+def _name_value(name):
+    return np.uint64(int.from_bytes(hashlib.md5(name.encode()).digest()[:8], 'little'))
+
+def _initial_state(count):
+    return np.repeat(_SEEDS, count, axis=1)
+
+def _fold_runs(state, starts, lengths, step, value_at):
+    """Fold a variable number of values per row, step positions apart from each row's start.
+
+    value_at(positions, left) gives the values at positions, with left
+    positions remaining in each row. Rows are sorted longest first, so the
+    rows still holding values at each step are a contiguous prefix that is
+    updated in place.
+    """
+    runs = (lengths + step - 1) // step
+    order = np.argsort(-runs, kind='stable')
+    counts = np.searchsorted(-runs[order], -np.arange(runs.max(initial=0)), side='left')
+    sorted_state, sorted_starts, sorted_lengths = state[:, order], starts[order], lengths[order]
+    for k, count in enumerate(counts):
+        _mix(sorted_state[:, :count], value_at(sorted_starts[:count] + step * k, sorted_lengths[:count] - step * k))
+    state[:, order] = sorted_state
+    return state
+
+def _fold_bytes(state, rows, array, tag):
+    """Fold binary-like values: their length, then 8-byte words read straight from the Arrow buffers."""
+    array = pc.fill_null(array.cast(pa.large_binary()), b'')
+    offsets = np.frombuffer(array.buffers()[1], dtype=np.int64)[array.offset:array.offset + len(array) + 1]
+    data = array.buffers()[2]
+    data = np.frombuffer(data, dtype=np.uint8) if data is not None else np.zeros(0, dtype=np.uint8)
+    # Aligned little-endian words of the data, zero padded so a word after every byte can be read
+    padded = np.zeros((len(data) + 23) // 8 * 8, dtype=np.uint8)
+    padded[:len(data)] = data
+    aligned = padded.view('<u8')
+    starts = offsets[:-1]
+    lengths = offsets[1:] - starts
+    _update(state, rows, tag ^ (lengths if rows is None else lengths[rows]).astype(np.uint64))
+
+    def word_at(positions, left):
+        # The 8 bytes from an unaligned position span two aligned words; bytes
+        # past the end of the value are masked out of its last word
+        index = positions >> 3
+        shift = (positions & 7).astype(np.uint64) * np.uint64(8)
+        words = (aligned[index] >> shift) | ((aligned[index + 1] << np.uint64(1)) << (np.uint64(63) - shift))
+        partial = left < 8
+        if partial.any():
+            words[partial] &= np.uint64(0xFFFFFFFFFFFFFFFF) >> (np.uint64(8) * (np.uint64(8) - left[partial].astype(np.uint64)))
+        return words
+
+    return _fold_runs(state, starts, lengths, 8, word_at)
+
+def _fold_array(state, array, tag):
+    """Fold a column into the hash state: a canonical form of its values, whatever their Arrow type.
+
+    Integers, timestamps and dates (as microseconds) and floats are folded
+    as 64-bit values, strings and binary as their bytes, structs field by
+    field in name order and lists element by element, so a value hashes the
+    same from every writer (e.g. int32 or int64 quantities, tz-aware or
+    naive timestamps, nested struct field order). Each value is mixed in
+    together with tag, the hash of its column or field name; null values
+    leave the state unchanged.
+    """
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks() if array.num_chunks else pa.array([], type=array.type)
+    if pa.types.is_dictionary(array.type):
+        array = array.dictionary_decode()
+    kind = array.type
+    if array.null_count == len(array):
+        return state
+    rows = np.flatnonzero(pc.is_valid(array).to_numpy(zero_copy_only=False)) if array.null_count else None
+
+    if pa.types.is_struct(kind):
+        children = dict(zip([field.name for field in kind], array.flatten()))
+        for name in sorted(children):
+            state = _fold_array(state, children[name], tag ^ _name_value(name))
+        return state
+    if pa.types.is_list(kind) or pa.types.is_large_list(kind) or pa.types.is_fixed_size_list(kind):
+        lengths = pc.fill_null(pc.list_value_length(array), 0).to_numpy().astype(np.int64)
+        _update(state, rows, tag ^ (lengths if rows is None else lengths[rows]).astype(np.uint64))
+        elements = _fold_array(_initial_state(int(lengths.sum())), pc.list_flatten(array), tag)
+        starts = np.cumsum(lengths) - lengths
+        return _fold_runs(state, starts, lengths, 1, lambda positions, left: elements[:, positions])
+    if pa.types.is_timestamp(kind) or pa.types.is_date(kind):
+        array = pc.cast(array, pa.timestamp('us', getattr(kind, 'tz', None)), safe=False)
+    elif pa.types.is_floating(kind):
+        array = array.cast(pa.float64())
+    elif not (pa.types.is_integer(kind) or pa.types.is_boolean(kind) or pa.types.is_temporal(kind)):
+        if not (pa.types.is_string(kind) or pa.types.is_large_string(kind) or pa.types.is_binary(kind)
+                or pa.types.is_large_binary(kind) or pa.types.is_fixed_size_binary(kind)):
+            array = array.cast(pa.large_string())
+        return _fold_bytes(state, rows, array, tag)
+    if not pa.types.is_floating(array.type):
+        array = array.cast(pa.int64())
+    values = pc.fill_null(array, 0).to_numpy().view(np.uint64)
+    _update(state, rows, tag ^ (values if rows is None else values[rows]))
+    return state
+
+def content_event_ids(events):
+    """Event IDs derived from the content of the events.
+
+    The single definition of event IDs: every writer (streaming, sharded,
+    Spark, CSV ingest and event_store.dedup for rows without IDs) uses it,
+    so an event gets the same ID whichever path writes it. Two events get
+    the same ID exactly when their EVENT_ID_COLUMNS are equal, independent
+    of row position and batch size.
+
+    The ID is a 128-bit hash in 32 hex characters, computed with numpy over
+    whole columns (see _fold_array) rather than row by row.
+
+    Args:
+        events: pyarrow Table or RecordBatch of events
+
+    Returns:
+        An Arrow string array of one ID per row
+    """
+    state = _initial_state(events.num_rows)
+    for name in EVENT_ID_COLUMNS:
+        if name in events.schema.names:
+            state = _fold_array(state, events.column(name), _name_value(name))
+
+    digests = np.ascontiguousarray(state.T).astype('<u8').view(np.uint8).reshape(-1, 16)
+    text = np.empty((events.num_rows, 32), dtype=np.uint8)
+    text[:, 0::2] = _HEX_DIGITS[digests >> 4]
+    text[:, 1::2] = _HEX_DIGITS[digests & 15]
+    offsets = np.arange(0, 32 * (events.num_rows + 1), 32, dtype=np.int32)
+    return pa.Array.from_buffers(pa.string(), events.num_rows, [None, pa.py_buffer(offsets), pa.py_buffer(text)])
+
+def id_type(id_format, fixed_size=True):
+    """Arrow type used to store IDs in the given format.
+
+    Args:
+        id_format: One of ID_FORMATS
+        fixed_size: Use fixed_size_binary(16) for binary IDs; engines without
+            fixed-size binary (Spark) get variable-length binary instead
+    """
+    if id_format == 'hex':
+        return pa.string()
+    if id_format == 'binary':
+        return pa.binary(16) if fixed_size else pa.binary()
+    if id_format == 'surrogate':
+        return pa.int32()
+    raise ValueError(f"Unknown ID format '{id_format}', expected one of {ID_FORMATS}")
+
+class IdDictionary:
+    """Persisted mapping from 16-byte IDs to dense int32 surrogate keys.
+
+    Surrogate keys are positions in the dictionary, so they stay stable as
+    long as the dictionary file is kept alongside the data it encodes.
+    """
+
+    def __init__(self, path=None):
+        """Load the dictionary from path if it exists, otherwise start empty.
+
+        Args:
+            path: Parquet file backing the dictionary (None keeps it in memory only)
+        """
+        self.path = path
+        self._chunks = []
+        self._ids = pa.array([], type=pa.binary(16))
+        if path and os.path.exists(path):
+            self._ids = pq.read_table(path, columns=['entity_id'])['entity_id'].combine_chunks()
+
+    def __len__(self):
+        return len(self._ids) + sum(len(chunk) for chunk in self._chunks)
+
+    def _all_ids(self):
+        if self._chunks:
+            self._ids = pa.concat_arrays([self._ids] + self._chunks)
+            self._chunks = []
+        return self._ids
+
+    def lookup(self, ids):
+        """Return the surrogate keys of ids, adding keys for unseen IDs.
+
+        Args:
+            ids: Arrow binary(16) array
+
+        Returns:
+            An Arrow int32 array of surrogate keys
+        """
+        positions = pc.index_in(ids, value_set=self._all_ids())
+        missing = pc.is_null(positions)
+        if pc.any(missing).as_py():
+            self._chunks.append(pc.unique(ids.filter(missing)))
+            positions = pc.index_in(ids, value_set=self._all_ids())
+        return positions.cast(pa.int32())
+
+    def assign(self, ids):
+        """Append IDs known to be new (e.g. random UUIDs) without a lookup.
+
+        Args:
+            ids: Arrow binary(16) array of distinct, previously unseen IDs
+
+        Returns:
+            An Arrow int32 array of the newly assigned surrogate keys
+        """
+        start = len(self)
+        self._chunks.append(ids)
+        return pa.array(np.arange(start, start + len(ids), dtype=np.int32))
+
+    def decode(self, surrogates):
+        """Map surrogate keys back to their 16-byte IDs."""
+        return self._all_ids().take(surrogates)
+
+    def save(self):
+        """Write the dictionary to its Parquet file."""
+        ids = self._all_ids()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        pq.write_table(pa.table({
+            'surrogate_id': pa.array(np.arange(len(ids), dtype=np.int32)),
+            'entity_id': ids
+        }), self.path)
+
+def entity_id_pool(prefix, count, id_format='hex', id_dictionary=None):
+    """Precompute the IDs of f"{prefix}_1" .. f"{prefix}_{count}" once per run.
+
+    Args:
+        prefix: Seed prefix, e.g. 'user' or 'product'
+        count: Number of IDs in the pool
+        id_format: One of ID_FORMATS
+        id_dictionary: IdDictionary to encode with when id_format is 'surrogate'
+
+    Returns:
+        An Arrow array of IDs in the requested format
+    """
+    seeds = [f"{prefix}_{i}" for i in range(1, count + 1)]
+    if id_format == 'hex':
+        return pa.array([generate_entity_id(seed) for seed in seeds])
+
+    ids = pa.array([generate_entity_id_bytes(seed) for seed in seeds], type=pa.binary(16))
+    if id_format == 'binary':
+        return ids
+    if id_format == 'surrogate':
+        return id_dictionary.lookup(ids)
+    raise ValueError(f"Unknown ID format '{id_format}', expected one of {ID_FORMATS}")
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import cProfile
+from collections import defaultdict
+from urllib.request import urlopen
+
+# Spark stage metrics summed per job group, with their Prometheus-friendly names
+SPARK_STAGE_METRICS = {
+    'executorRunTime': 'spark_executor_run_ms',
+    'executorCpuTime': 'spark_executor_cpu_ns',
+    'jvmGcTime': 'spark_jvm_gc_ms',
+    'inputBytes': 'spark_input_bytes',
+    'outputBytes': 'spark_output_bytes',
+    'outputRecords': 'spark_output_records',
+    'shuffleReadBytes': 'spark_shuffle_read_bytes',
+    'shuffleWriteBytes': 'spark_shuffle_write_bytes',
+    'memoryBytesSpilled': 'spark_memory_spilled_bytes',
+    'diskBytesSpilled': 'spark_disk_spilled_bytes'
+}
+
+# Labels left out of Prometheus series to keep their number bounded
+_UNAGGREGATED_LABELS = {'batch'}
+
+class _DisabledStage:
+    """Stand-in returned while metrics are off: entering, exiting and adding do nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def add(self, **counters):
+        pass
+
+_DISABLED_STAGE = _DisabledStage()
+
+class Stage:
+    """Timer and counters of one pipeline stage or batch, used as a context manager."""
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.counters = {}
+        self._start = None
+        self._profiler = None
+
+    def add(self, **counters):
+        """Add to the stage's counters, e.g. rows=..., bytes_written=..., files_written=..."""
+        for key, value in counters.items():
+            if value is not None:
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def __enter__(self):
+        if self.metrics.profile_dir:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.metrics.save_profile(self, self._profiler)
+        self.metrics.observe(self.name, seconds, self.counters, **self.labels)
+        return False
+
+class Metrics:
+    """Per-stage timers and counters written as JSON lines or a Prometheus text file.
+
+    When neither an output nor a profile directory is set, stage() hands out a
+    shared no-op object, so instrumented code costs one method call per stage.
+    """
+
+    def __init__(self, output=None, profile_dir=None, prefix='event_generator'):
+        """Set up metric collection.
+
+        Args:
+            output: None to disable, a '.prom' file for the Prometheus text
+                format (written on close), or any other path for JSON lines
+                (one record per stage, appended as it completes)
+            profile_dir: Directory to write cProfile stats of every stage to
+            prefix: Prefix of the Prometheus metric names
+        """
+        self.output = output
+        self.profile_dir = profile_dir
+        self.prefix = prefix
+        self.enabled = bool(output or profile_dir)
+        self._prometheus = bool(output) and output.endswith('.prom')
+        self._lines = None
+        self._totals = defaultdict(lambda: defaultdict(float))
+        if output and not self._prometheus:
+            os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+            self._lines = open(output, 'a')
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def stage(self, name, **labels):
+        """Time a stage and collect its counters.
+
+        Args:
+            name: Stage name, e.g. 'generate' or 'write'
+            **labels: Labels of the stage, e.g. event_type='order', batch=3
+
+        Returns:
+            A context manager yielding an object with an add(**counters) method
+        """
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return Stage(self, name, labels)
+
+    def observe(self, name, seconds, counters=None, **labels):
+        """Emit the record of a finished stage and add it to the totals.
+
+        Stages record themselves on exit; call this directly for work that
+        cannot be wrapped in a with block, such as pulling from a generator.
+        """
+        if not self.enabled:
+            return
+        counters = counters or {}
+        record = {'timestamp': time.time(), 'stage': name, **labels, 'seconds': seconds, **counters}
+        if counters.get('rows') and seconds > 0:
+            record['rows_per_second'] = counters['rows'] / seconds
+        if self._lines is not None:
+            self._lines.write(json.dumps(record, default=str) + '\n')
+            self._lines.flush()
+
+        key = (name,) + tuple(sorted(
+            (label, str(value)) for label, value in labels.items() if label not in _UNAGGREGATED_LABELS
+        ))
+        totals = self._totals[key]
+        totals['runs'] += 1
+        totals['seconds'] += seconds
+        for counter, value in counters.items():
+            totals[counter] += value
+
+    def save_profile(self, stage, profiler):
+        """Dump the cProfile stats of a stage, named after its stage and labels."""
+        suffix = '-'.join(f"{label}_{value}" for label, value in stage.labels.items())
+        profiler.dump_stats(os.path.join(self.profile_dir, f"{stage.name}{'-' + suffix if suffix else ''}.prof"))
+
+    def prometheus_text(self):
+        """Render the totals of every stage in the Prometheus text exposition format."""
+        series = defaultdict(list)
+        for (stage, *labels), totals in sorted(self._totals.items()):
+            label_text = ','.join([f'stage="{stage}"'] + [f'{label}="{value}"' for label, value in labels])
+            for counter, value in totals.items():
+                series[counter].append(f"{self.prefix}_{counter}_total{{{label_text}}} {value:g}")
+
+        lines = []
+        for counter, samples in series.items():
+            lines.append(f"# TYPE {self.prefix}_{counter}_total counter")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        """Flush the outputs; the Prometheus file is replaced atomically."""
+        if self._lines is not None:
+            self._lines.close()
+            self._lines = None
+        if self._prometheus:
+            os.makedirs(os.path.dirname(self.output) or '.', exist_ok=True)
+            with open(self.output + '.tmp', 'w') as f:
+                f.write(self.prometheus_text())
+            os.replace(self.output + '.tmp', self.output)
+
+def timed_batches(batches, metrics, **labels):
+    """Record how long each batch of a generator took to produce as a 'generate' stage.
+
+    Returns batches untouched when metrics are off.
+    """
+    if not metrics.enabled:
+        return batches
+    return _timed_batches(iter(batches), metrics, labels)
+
+def _timed_batches(batches, metrics, labels):
+    batch_num = 0
+    while True:
+        start = time.perf_counter()
+        batch = next(batches, None)
+        if batch is None:
+            return
+        batch_num += 1
+        metrics.observe("generate", time.perf_counter() - start, {'rows': batch.num_rows, 'arrow_bytes': batch.nbytes},
+                        batch=batch_num, **labels)
+        yield batch
+
+def directory_stats(path):
+    """Count the Parquet files under path and their total size in bytes."""
+    files, size = 0, 0
+    for directory, _, names in os.walk(path):
+        for name in names:
+            if name.endswith('.parquet'):
+                files += 1
+                size += os.path.getsize(os.path.join(directory, name))
+    return files, size
+
+def spark_stage_metrics(spark, job_group, timeout=5.0):
+    """Sum the stage metrics of every Spark job in a job group.
+
+    Reads the Spark UI REST API, so it acts as a listener without a JVM-side
+    plugin. Returns an empty dict when the UI is disabled or unreachable.
+
+    Args:
+        spark: Active SparkSession
+        job_group: Job group set with SparkContext.setJobGroup before the jobs ran
+        timeout: Seconds to wait for the jobs' completion events to be processed
+    """
+    url = spark.sparkContext.uiWebUrl
+    if not url:
+        return {}
+    api = f"{url}/api/v1/applications/{spark.sparkContext.applicationId}"
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            with urlopen(f"{api}/jobs") as response:
+                jobs = [job for job in json.load(response) if job.get('jobGroup') == job_group]
+            if all(job['status'] != 'RUNNING' for job in jobs) or time.monotonic() > deadline:
+                break
+            time.sleep(0.1)
+
+        metrics = {name: 0 for name in SPARK_STAGE_METRICS.values()}
+        metrics['spark_jobs'] = len(jobs)
+        for stage_id in {stage_id for job in jobs for stage_id in job['stageIds']}:
+            with urlopen(f"{api}/stages/{stage_id}") as response:
+                for attempt in json.load(response):
+                    for field, name in SPARK_STAGE_METRICS.items():
+                        metrics[name] += attempt.get(field, 0)
+        return metrics
+    except OSError:
+        return {}
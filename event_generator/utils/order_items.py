@@ -0,0 +1,88 @@
+import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Row group size of order_items files. Files are sorted by product_id, so the
+# rows of one product sit in a few row groups that statistics can single out
+ROWS_PER_GROUP = 64 * 1024
+
+# Columns of the order_items table: one row per item of an order event, typed
+# and flat, so product-level queries never parse or explode payloads. Defined
+# here so the generator scripts run stand-alone; event_store.order_items reads them
+ORDER_ITEM_COLUMNS = ['product_id', 'order_id', 'price', 'quantity', 'item_total', 'event_timestamp']
+
+# Order payload fields read from JSON (or Python repr) event_value strings
+ORDER_ITEMS_JSON_SCHEMA = "order_id string, items array<struct<product_id:string,price:double,quantity:bigint,item_total:double>>"
+
+def order_items_frame(events):
+    """Explode the items of the order events in a Spark DataFrame into order_items rows.
+
+    Typed event_value structs are read directly; string payloads are parsed
+    with ORDER_ITEMS_JSON_SCHEMA (Spark accepts the single-quoted repr
+    strings of the pandas generators as JSON).
+
+    Args:
+        events: Spark DataFrame of events with event_category, event_timestamp and event_value
+
+    Returns:
+        Spark DataFrame with ORDER_ITEM_COLUMNS
+    """
+    from pyspark.sql.functions import col, explode, from_json
+    from pyspark.sql.types import StructType
+
+    orders = events.where(col("event_category") == "order")
+    typed = isinstance(orders.schema["event_value"].dataType, StructType)
+    payload = col("event_value") if typed else from_json(col("event_value"), ORDER_ITEMS_JSON_SCHEMA)
+    items = orders.select(payload.getField("order_id").alias("order_id"),
+                          explode(payload.getField("items")).alias("item"), "event_timestamp")
+    return items.select(*[
+        name if name in ('order_id', 'event_timestamp') else col(f"item.{name}").alias(name)
+        for name in ORDER_ITEM_COLUMNS
+    ])
+
+def order_item_table(events):
+    """Flatten the items of typed order events into order_items rows.
+
+    Args:
+        events: Table or RecordBatch of events with a typed event_value
+            struct; rows of other categories are ignored
+
+    Returns:
+        A pyarrow Table with ORDER_ITEM_COLUMNS, sorted by product_id
+    """
+    if not pa.types.is_struct(events.schema.field('event_value').type):
+        raise ValueError("order_items need typed event_value payloads (EVENT_VALUE_FORMAT = 'typed')")
+    orders = events.filter(pc.equal(events.column('event_category'), 'order'))
+    items = pc.struct_field(orders.column('event_value'), 'items')
+    parents = pc.list_parent_indices(items)
+    flat = pc.list_flatten(items)
+    order_columns = {
+        'order_id': pc.struct_field(orders.column('event_value'), 'order_id'),
+        'event_timestamp': orders.column('event_timestamp')
+    }
+    return pa.table({
+        name: order_columns[name].take(parents) if name in order_columns else pc.struct_field(flat, name)
+        for name in ORDER_ITEM_COLUMNS
+    }).sort_by([('product_id', 'ascending'), ('event_timestamp', 'ascending')])
+
+def with_order_items(batches, items_path, basename):
+    """Pass event batches through, writing the order_items rows of each on the way.
+
+    Every batch's items go to their own file, sorted by product_id, so
+    memory stays bounded by the batch size like the events themselves.
+
+    Args:
+        batches: Iterable of typed event RecordBatches
+        items_path: Directory of the order_items table
+        basename: File name prefix, unique per writer (files are <basename>-<n>.parquet)
+
+    Yields:
+        The input batches, unchanged
+    """
+    os.makedirs(items_path, exist_ok=True)
+    for index, batch in enumerate(batches):
+        items = order_item_table(batch)
+        if items.num_rows:
+            pq.write_table(items, os.path.join(items_path, f"{basename}-{index}.parquet"), row_group_size=ROWS_PER_GROUP)
+        yield batch
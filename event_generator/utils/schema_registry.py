@@ -0,0 +1,124 @@
+import pyarrow as pa
+from utils.hash_utils import id_type
+
+# Payload fields holding entity, product or order IDs; their registered string
+# type is replaced by the storage type of the configured ID format
+ID_FIELDS = {'product_id', 'order_id'}
+
+# Element type of the order 'items' list
+ORDER_ITEM_TYPE = pa.struct([
+    pa.field('product_id', pa.string()),
+    pa.field('price', pa.float64()),
+    pa.field('quantity', pa.int64()),
+    pa.field('item_total', pa.float64())
+])
+
+_ORDER_FIELDS = [
+    pa.field('order_id', pa.string()),
+    pa.field('items', pa.list_(ORDER_ITEM_TYPE)),
+    pa.field('total_amount', pa.float64()),
+    pa.field('payment_method', pa.string()),
+    pa.field('shipping_address', pa.string())
+]
+
+_LOGIN_FIELDS = [
+    pa.field('device_type', pa.string()),
+    pa.field('browser', pa.string()),
+    pa.field('ip_address', pa.string()),
+    pa.field('location', pa.string())
+]
+
+# Payload fields of every event, keyed by event_category and then event_name
+PAYLOAD_SCHEMAS = {
+    'product': {
+        'product_view': [
+            pa.field('product_id', pa.string()),
+            pa.field('category', pa.string()),
+            pa.field('view_duration_seconds', pa.float64()),
+            pa.field('source_page', pa.string())
+        ]
+    },
+    'order': {
+        'order_placed': _ORDER_FIELDS,
+        'order_confirmed': _ORDER_FIELDS,
+        'order_shipped': _ORDER_FIELDS,
+        'order_delivered': _ORDER_FIELDS
+    },
+    'account': {
+        'account_created': [
+            pa.field('email', pa.string()),
+            pa.field('name', pa.string()),
+            pa.field('registration_source', pa.string()),
+            pa.field('marketing_opt_in', pa.bool_())
+        ],
+        'account_updated': [
+            pa.field('field_updated', pa.string()),
+            pa.field('previous_value', pa.string()),
+            pa.field('new_value', pa.string())
+        ],
+        'password_changed': [
+            pa.field('source', pa.string()),
+            pa.field('password_strength', pa.string())
+        ],
+        'login_success': _LOGIN_FIELDS,
+        'login_failed': _LOGIN_FIELDS + [pa.field('reason', pa.string())],
+        'logout': [
+            pa.field('session_duration_minutes', pa.int64()),
+            pa.field('logout_type', pa.string())
+        ]
+    }
+}
+
+def payload_fields(event_category=None, event_name=None):
+    """Look up the registered payload fields.
+
+    Args:
+        event_category: Restrict to one category (all categories when None)
+        event_name: Restrict to one event name within the category
+
+    Returns:
+        List of pyarrow fields, de-duplicated by name in registration order
+    """
+    categories = [event_category] if event_category else list(PAYLOAD_SCHEMAS)
+    fields = {}
+    for category in categories:
+        events = PAYLOAD_SCHEMAS[category]
+        for name in ([event_name] if event_name else events):
+            for field in events[name]:
+                existing = fields.setdefault(field.name, field)
+                if existing.type != field.type:
+                    raise ValueError(f"Payload field '{field.name}' registered with conflicting types")
+    return list(fields.values())
+
+def _with_id_type(field, storage_type):
+    """Swap the type of ID fields, recursing into structs and lists."""
+    if field.name in ID_FIELDS:
+        return field.with_type(storage_type)
+    if pa.types.is_struct(field.type):
+        return field.with_type(pa.struct([_with_id_type(child, storage_type) for child in field.type]))
+    if pa.types.is_list(field.type):
+        return field.with_type(pa.list_(_with_id_type(field.type.value_field, storage_type)))
+    return field
+
+def event_value_type(id_format='hex', fixed_size=True):
+    """Struct type of the typed event_value column.
+
+    It is the union of every registered payload field, all nullable, so each
+    row only populates the fields of its own event name.
+
+    Args:
+        id_format: ID storage format (see utils.hash_utils.ID_FORMATS)
+        fixed_size: Store binary IDs as fixed_size_binary(16) rather than binary
+    """
+    storage_type = id_type(id_format, fixed_size)
+    return pa.struct([_with_id_type(field, storage_type) for field in payload_fields()])
+
+def typed_event_schema(timestamp_type=pa.timestamp('us'), id_format='hex'):
+    """Schema of events written with a typed event_value column."""
+    return pa.schema([
+        pa.field('event_name', pa.string()),
+        pa.field('event_timestamp', timestamp_type),
+        pa.field('event_category', pa.string()),
+        pa.field('event_value', event_value_type(id_format)),
+        pa.field('entity_id', id_type(id_format))
+    ])
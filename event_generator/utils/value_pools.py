@@ -0,0 +1,93 @@
+import os
+import uuid
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import config
+
+# Faker providers with a value pool, by name (the name is part of the cache key)
+FAKER_PROVIDERS = {
+    'email': lambda fake: fake.email(),
+    'name': lambda fake: fake.name(),
+    'word': lambda fake: fake.word(),
+    'ipv4': lambda fake: fake.ipv4(),
+    'location': lambda fake: fake.city() + ', ' + fake.country(),
+    'address': lambda fake: fake.address().replace('\n', ', ')
+}
+
+# Draws per requested value before a provider counts as exhausted
+# (some providers, like 'word', have fewer distinct values than the pool size)
+MAX_DRAWS_PER_VALUE = 20
+
+# Pools already built or loaded by this process
+_POOLS = {}
+
+# Default of value_pool's cache_dir, so an explicit None can keep pools in memory
+_CONFIG_DIR = object()
+
+def _build_pool(provider, size, locale, seed):
+    """Draw up to size distinct values from a seeded Faker instance."""
+    # Imported here: loading Faker is slow and cached pools do not need it
+    from faker import Faker
+
+    fake = Faker(locale)
+    fake.seed_instance(seed)
+    draw = FAKER_PROVIDERS[provider]
+    values = {}
+    for _ in range(size * MAX_DRAWS_PER_VALUE):
+        values.setdefault(draw(fake), None)
+        if len(values) == size:
+            break
+    return pa.array(list(values), type=pa.string())
+
+def pool_path(cache_dir, provider, size, locale, seed):
+    """Location of a persisted pool: one directory per locale and seed."""
+    return os.path.join(cache_dir, f"{locale}-{seed}", f"{provider}-{size}.parquet")
+
+def value_pool(provider, size=None, locale=None, seed=None, cache_dir=_CONFIG_DIR):
+    """Return a pool of distinct realistic values for a Faker provider.
+
+    Each pool is generated once per process, or loaded from cache_dir when it
+    was persisted by an earlier run. Generators then sample it with index
+    arrays (utils.vector_utils.choice) or random.choice instead of calling
+    Faker per event. Processes building the same pool at once each write
+    their own temporary file, and whichever replaces the pool last wins
+    with identical contents.
+
+    Args:
+        provider: Key of FAKER_PROVIDERS
+        size: Number of distinct values (defaults to config.VALUE_POOL_SIZE)
+        locale: Faker locale (defaults to config.FAKER_LOCALE)
+        seed: Faker seed (defaults to config.FAKER_SEED)
+        cache_dir: Directory to persist pools in, or None to keep them in
+            memory only (defaults to config.value_pool_dir())
+
+    Returns:
+        An Arrow string array of at most size distinct values
+    """
+    size = size or config.VALUE_POOL_SIZE
+    locale = locale or config.FAKER_LOCALE
+    seed = config.FAKER_SEED if seed is None else seed
+    cache_dir = config.value_pool_dir() if cache_dir is _CONFIG_DIR else cache_dir
+
+    key = (provider, size, locale, seed)
+    if key in _POOLS:
+        return _POOLS[key]
+
+    path = pool_path(cache_dir, *key) if cache_dir else None
+    if path and os.path.exists(path):
+        pool = pq.read_table(path)['value'].combine_chunks()
+    else:
+        pool = _build_pool(*key)
+        if path and not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            staging_path = f"{path}.{os.getpid()}-{uuid.uuid4().hex}.tmp"
+            pq.write_table(pa.table({'value': pool}), staging_path)
+            os.replace(staging_path, path)
+
+    _POOLS[key] = pool
+    return pool
+
+def value_pools(providers, **kwargs):
+    """Look up several pools at once, as a dict of provider name to pool."""
+    return {provider: value_pool(provider, **kwargs) for provider in providers}
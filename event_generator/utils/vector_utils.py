@@ -0,0 +1,288 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from datetime import datetime, timezone
+from utils.schema_registry import event_value_type
+
+# Column order shared by every event type generator
+EVENT_COLUMNS = ['event_name', 'event_timestamp', 'event_category', 'event_value', 'entity_id']
+
+# Number of events per RecordBatch when streaming generators
+DEFAULT_BATCH_SIZE = 100000
+
+# ASCII codes of the lowercase hex digits, indexed by nibble value
+_HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+# repr() of the fractional part of a 2-decimal float, indexed by cents (0 -> '0', 50 -> '5')
+_CENT_FRACTIONS = pa.array([repr(cents / 100)[2:] for cents in range(100)])
+
+def resolve_date(value):
+    """Convert an ISO-8601 string to a datetime, leaving datetimes untouched.
+
+    Args:
+        value: A datetime or an ISO-8601 formatted string
+
+    Returns:
+        A datetime object
+    """
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value
+
+def batch_sizes(num_events, batch_size):
+    """Split num_events into consecutive batch sizes of at most batch_size."""
+    for offset in range(0, num_events, batch_size):
+        yield min(batch_size, num_events - offset)
+
+def random_timestamps(rng, num_events, start_date, end_date):
+    """Draw uniformly distributed timestamps as int64 microsecond offsets.
+
+    Args:
+        rng: numpy Generator used for sampling
+        num_events: Number of timestamps to draw
+        start_date: Start of the time range
+        end_date: End of the time range
+
+    Returns:
+        An Arrow timestamp array with microsecond precision
+    """
+    start_date = resolve_date(start_date)
+    end_date = resolve_date(end_date)
+    range_us = int((end_date - start_date).total_seconds() * 1_000_000)
+    offsets = rng.integers(0, max(range_us, 1), size=num_events, dtype=np.int64)
+
+    # Aware datetimes are stored in UTC, naive ones keep their wall-clock time
+    tz = None
+    if start_date.tzinfo is not None:
+        start_date = start_date.astimezone(timezone.utc).replace(tzinfo=None)
+        tz = 'UTC'
+    values = np.datetime64(start_date, 'us').astype(np.int64) + offsets
+    return pa.array(values, type=pa.timestamp('us', tz=tz))
+
+def choice(rng, values, size):
+    """Sample from a small pool of values using an index array.
+
+    The result is dictionary-encoded (indices into the pool), so formatting
+    or hashing the values only has to touch the pool, not every row.
+
+    Args:
+        rng: numpy Generator used for sampling
+        values: Sequence (or Arrow array) of candidate values
+        size: Number of samples
+
+    Returns:
+        An Arrow DictionaryArray holding the sampled values
+    """
+    pool = values if isinstance(values, pa.Array) else pa.array(values)
+    indices = pa.array(rng.integers(0, len(pool), size=size, dtype=np.int32))
+    return pa.DictionaryArray.from_arrays(indices, pool)
+
+def event_table(columns):
+    """Assemble the event columns into a table, decoding dictionary-encoded columns."""
+    return pa.Table.from_arrays(
+        [column.dictionary_decode() if pa.types.is_dictionary(column.type) else column for column in columns],
+        names=EVENT_COLUMNS
+    )
+
+def quoted(values):
+    """Render Python string values the way repr() does, for use in payloads."""
+    return pa.array([repr(value) for value in values], type=pa.string())
+
+def quoted_array(values):
+    """Wrap an Arrow string array of quote-free values (IDs, hashes) in single quotes."""
+    return pc.binary_join_element_wise("'", values, "'", '')
+
+def format_floats(values):
+    """Format a float array with repr()-compatible output (e.g. '5.0', '12.34')."""
+    values = np.asarray(values, dtype=np.float64)
+    if np.array_equal(np.rint(values * 100) / 100, values):
+        return format_cents(values)
+    values = pa.array(values, type=pa.float64())
+    text = pc.cast(values, pa.string())
+    integral = pc.equal(pc.floor(values), values)
+    return pc.if_else(integral, pc.binary_join_element_wise(text, '.0', ''), text)
+
+def format_cents(values):
+    """Format floats already rounded to 2 decimals exactly as repr() would.
+
+    Splits each value into integer cents and joins the whole part with a
+    lookup of the 100 possible fraction strings, which avoids the much
+    slower generic float-to-string cast.
+    """
+    cents = np.rint(np.asarray(values) * 100).astype(np.int64)
+    whole = format_ints(cents // 100)
+    fraction = _CENT_FRACTIONS.take(cents % 100)
+    return pc.binary_join_element_wise(whole, fraction, '.')
+
+
+def format_ints(values):
+    """Format an integer array as strings."""
+    return pc.cast(pa.array(values, type=pa.int64()), pa.string())
+
+def dict_repr(fields):
+    """Build the str(dict) representation of a payload column by column.
+
+    Args:
+        fields: List of (key, values) tuples, where values is an Arrow string
+            array that already holds the repr() of each value
+
+    Returns:
+        An Arrow string array, one "{'key': value, ...}" entry per row
+    """
+    parts = []
+    for i, (key, values) in enumerate(fields):
+        parts.append(('{' if i == 0 else ', ') + repr(key) + ': ')
+        parts.append(values)
+    parts.append('}')
+    return pc.binary_join_element_wise(*parts, '')
+
+def repr_array(values):
+    """Render every element of a typed Arrow array the way repr() would.
+
+    Strings are single-quoted, with the rare values containing quotes,
+    backslashes or non-printable characters passed through repr() itself.
+    Structs become dicts and lists become lists, recursively.
+
+    Args:
+        values: Arrow array of strings, numbers, booleans, structs or lists
+
+    Returns:
+        An Arrow string array
+    """
+    values_type = values.type
+    if pa.types.is_dictionary(values_type):
+        return repr_array(values.dictionary).take(values.indices)
+    if pa.types.is_fixed_size_binary(values_type):
+        return quoted_array(hex_ids(values))
+    if pa.types.is_string(values_type):
+        text = quoted_array(values)
+        needs_repr = pc.match_substring_regex(values, r"['\\]|[^ -~]").to_numpy(zero_copy_only=False)
+        if needs_repr.any():
+            rows = np.flatnonzero(needs_repr)
+            others = np.flatnonzero(~needs_repr)
+            text = scatter([(others, text.take(others)), (rows, quoted(values.take(rows).to_pylist()))], len(values))
+        return text
+    if pa.types.is_floating(values_type):
+        return format_floats(values.to_numpy(zero_copy_only=False))
+    if pa.types.is_integer(values_type):
+        return format_ints(values)
+    if pa.types.is_boolean(values_type):
+        return pc.if_else(values, 'True', 'False')
+    if pa.types.is_struct(values_type):
+        return dict_repr([(field.name, repr_array(values.field(i))) for i, field in enumerate(values_type)])
+    if pa.types.is_list(values_type):
+        return list_repr(values.offsets, repr_array(values.values))
+    raise TypeError(f"Unsupported payload type: {values_type}")
+
+def encode_event_value(fields, typed=False, id_format='hex'):
+    """Encode payload arrays as the event_value column.
+
+    Args:
+        fields: List of (key, values) tuples of typed Arrow arrays, in payload order
+        typed: Build a struct of the registered event_value type (missing fields
+            are null) instead of the str(dict) string representation
+        id_format: ID storage format of the ID fields in the struct
+
+    Returns:
+        An Arrow struct or string array
+    """
+    if not typed:
+        return dict_repr([(key, repr_array(values)) for key, values in fields])
+
+    size = len(fields[0][1])
+    arrays = dict(fields)
+    value_type = event_value_type(id_format)
+    return pa.StructArray.from_arrays(
+        [arrays.get(field.name, pa.nulls(size, field.type)).cast(field.type) for field in value_type],
+        fields=list(value_type)
+    )
+
+def list_repr(offsets, values):
+    """Join flat repr() strings into "[a, b, ...]" entries delimited by offsets."""
+    lists = pa.ListArray.from_arrays(pa.array(np.asarray(offsets), type=pa.int32()), values)
+    return pc.binary_join_element_wise('[', pc.binary_join(lists, ', '), ']', '')
+
+def scatter(branches, size):
+    """Reassemble per-branch arrays into a single column in row order.
+
+    Args:
+        branches: List of (row_indices, values) tuples covering every row once
+        size: Total number of rows
+
+    Returns:
+        An Arrow array with each branch's values placed at its row indices
+    """
+    order = np.concatenate([indices for indices, _ in branches])
+    values = pa.concat_arrays([values for _, values in branches])
+    positions = np.empty(size, dtype=np.int64)
+    positions[order] = np.arange(size, dtype=np.int64)
+    return values.take(positions)
+
+def random_uuid_bytes(rng, size):
+    """Generate random version 4 UUIDs as a (size, 16) uint8 matrix."""
+    raw = rng.integers(0, 256, size=(size, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    return raw
+
+def hex_chars(raw):
+    """Expand a (size, n) uint8 matrix into its (size, 2n) lowercase hex digits."""
+    chars = np.empty((raw.shape[0], raw.shape[1] * 2), dtype=np.uint8)
+    chars[:, 0::2] = _HEX_DIGITS[raw >> 4]
+    chars[:, 1::2] = _HEX_DIGITS[raw & 0x0F]
+    return chars
+
+def fixed_width_strings(chars):
+    """Wrap a (size, width) uint8 matrix of ASCII characters as an Arrow string array."""
+    size, width = chars.shape
+    offsets = np.arange(0, width * (size + 1), width, dtype=np.int32)
+    return pa.StringArray.from_buffers(size, pa.py_buffer(offsets), pa.py_buffer(np.ascontiguousarray(chars)))
+
+def random_uuids(rng, size):
+    """Generate random version 4 UUID strings without a per-row Python loop.
+
+    Args:
+        rng: numpy Generator used for sampling
+        size: Number of UUIDs
+
+    Returns:
+        An Arrow string array of 36-character UUIDs
+    """
+    digits = hex_chars(random_uuid_bytes(rng, size))
+
+    text = np.full((size, 36), ord('-'), dtype=np.uint8)
+    for src, dst, width in [(0, 0, 8), (8, 9, 4), (12, 14, 4), (16, 19, 4), (20, 24, 12)]:
+        text[:, dst:dst + width] = digits[:, src:src + width]
+    return fixed_width_strings(text)
+
+def random_ids(rng, size, id_format='hex', surrogate_pool=None):
+    """Generate fresh random IDs (order IDs, new account IDs) in the given format.
+
+    Only pooled entities get surrogate keys: a new key per random ID would
+    grow the persisted IdDictionary by every event of every run. In the
+    'surrogate' format the IDs are sampled from surrogate_pool instead, so
+    they repeat across events.
+
+    Args:
+        rng: numpy Generator used for sampling
+        size: Number of IDs
+        id_format: 'hex' for UUID strings, 'binary' for 16-byte values or
+            'surrogate' for keys sampled from surrogate_pool
+        surrogate_pool: Surrogate keys of a bounded entity_id_pool
+            (SURROGATE_FRESH_ID_POOL_SIZE IDs), used in the surrogate format
+
+    Returns:
+        An Arrow array of IDs
+    """
+    if id_format == 'hex':
+        return random_uuids(rng, size)
+    if id_format == 'surrogate':
+        return choice(rng, surrogate_pool, size)
+
+    raw = random_uuid_bytes(rng, size)
+    return pa.FixedSizeBinaryArray.from_buffers(pa.binary(16), size, [None, pa.py_buffer(raw)])
+
+def hex_ids(values):
+    """Render 16-byte IDs as 32-character hex strings."""
+    raw = np.frombuffer(values.buffers()[1], dtype=np.uint8, count=16 * (len(values) + values.offset))
+    return fixed_width_strings(hex_chars(raw.reshape(-1, 16)[values.offset:]))
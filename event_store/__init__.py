@@ -0,0 +1,3 @@
+from event_store.reader import read_events, events_dataset, DEFAULT_EVENTS_PATH
+
+__all__ = ['read_events', 'events_dataset', 'DEFAULT_EVENTS_PATH']
@@ -0,0 +1,189 @@
+import os
+import sys
+import argparse
+from datetime import datetime
+
+# Repository root and directory of the event generator scripts. The scripts
+# import each other as top-level modules (import config, from utils...) and
+# share definitions with event_store, so both go on sys.path and, for Spark's
+# Python workers, on PYTHONPATH
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENT_GENERATOR_DIR = os.path.join(REPO_ROOT, 'event_generator')
+
+# Generation engines: 'pandas' streams the vectorized generators to Parquet with
+# pyarrow (over a process pool with --workers), 'spark' runs generator.py
+GENERATE_ENGINES = ['pandas', 'spark']
+
+# Query backends of event_store.read_events
+QUERY_BACKENDS = ['arrow', 'spark', 'iceberg']
+
+def _volume(text):
+    """Parse an EVENT_CONFIG override such as 'order=50000'."""
+    event_type, _, num_events = text.partition('=')
+    if not num_events.isdigit():
+        raise argparse.ArgumentTypeError(f"expected EVENT_TYPE=COUNT, got '{text}'")
+    return event_type, int(num_events)
+
+def _load_config(args):
+    """Import the generator config and apply the command line overrides to it.
+
+    Generation functions read config when they are called, so the
+    overrides, and the date range resolved from them, apply to this run.
+    """
+    if EVENT_GENERATOR_DIR not in sys.path:
+        sys.path[:0] = [EVENT_GENERATOR_DIR, REPO_ROOT]
+        os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [EVENT_GENERATOR_DIR, REPO_ROOT,
+                                                                 os.environ.get('PYTHONPATH')]))
+    import config
+
+    for event_type, num_events in args.events or []:
+        if event_type not in config.EVENT_CONFIG:
+            raise ValueError(f"Unknown event type '{event_type}', expected one of {list(config.EVENT_CONFIG)}")
+        config.EVENT_CONFIG[event_type] = {**config.EVENT_CONFIG[event_type], 'num_events': num_events}
+    overrides = {'START_DATE': args.start, 'END_DATE': args.end, 'DAYS': args.days, 'OUTPUT_DIR': args.output_dir,
+                 'WRITER_PROFILE': args.profile, 'GENERATION_MODE': args.mode, 'WRITE_PLAN': args.plan,
+                 'SEED': args.seed, 'APPEND': args.append or None}
+    for name, value in overrides.items():
+        if value is not None:
+            setattr(config, name, value)
+    return config
+
+def generate(args):
+    """Generate events with the selected engine."""
+    _load_config(args)
+    if args.engine == 'spark':
+        from generator import generate_all_events
+        generate_all_events()
+    elif args.workers:
+        from sharded import generate_all_events_sharded
+        generate_all_events_sharded(args.seed or 0, args.workers)
+    else:
+        from stream_writer import generate_all_events_streaming
+        from utils.vector_utils import DEFAULT_BATCH_SIZE
+        generate_all_events_streaming(args.batch_size or DEFAULT_BATCH_SIZE, args.seed)
+
+def transform(args):
+    """Incrementally repartition events by year/month/day with Spark."""
+    from event_store.reader import DEFAULT_EVENTS_PATH
+    from event_store.order_items import DEFAULT_ORDER_ITEMS_BY_DAY_PATH
+    from event_store.transformer.transform import DEFAULT_TRANSFORMED_PATH, transform_events
+
+    result = transform_events(args.input_path or DEFAULT_EVENTS_PATH, args.output_path or DEFAULT_TRANSFORMED_PATH,
+                              order_items_path=args.order_items_path or DEFAULT_ORDER_ITEMS_BY_DAY_PATH)
+    print(f"{len(result['new_files'])} new, {len(result['changed_files'])} changed and "
+          f"{len(result['removed_files'])} removed input files; rewrote {len(result['days'])} days")
+
+def append(args):
+    """Append a Parquet dataset of events, skipping events already stored."""
+    from event_store.reader import DEFAULT_EVENTS_PATH, events_dataset
+    from event_store.dedup import append_batches
+
+    report = append_batches(events_dataset(args.source).to_batches(), args.path or DEFAULT_EVENTS_PATH)
+    print(f"Appended {report['written']} of {report['rows']} events "
+          f"({report['duplicates']} duplicates skipped, {report['checked']} checked exactly)")
+
+def ingest(args):
+    """Stream CSV files out of a zip archive into events, skipping events already stored."""
+    from event_store.ingest import ingest_csv
+
+    result = ingest_csv(args.source, args.mapping, args.output_path)
+    print(f"Ingested {result['written']} of {result['rows']} events from {', '.join(result['members']) or 'no CSV members'}"
+          f" ({result['duplicates']} duplicates and {result['invalid_rows']} invalid rows skipped)")
+
+def compact(args):
+    """Compact small Parquet files within each partition with pyarrow."""
+    from event_store.reader import DEFAULT_EVENTS_PATH
+    from event_store.compaction import DEFAULT_TARGET_FILE_SIZE, DEFAULT_RETENTION_SECONDS, compact_events, \
+        format_report
+
+    target_file_size = args.target_mb * 2**20 if args.target_mb else DEFAULT_TARGET_FILE_SIZE
+    retention_seconds = args.retention_minutes * 60 if args.retention_minutes is not None else DEFAULT_RETENTION_SECONDS
+    print(format_report(compact_events(args.path or DEFAULT_EVENTS_PATH, target_file_size=target_file_size,
+                                       dry_run=args.dry_run, retention_seconds=retention_seconds)))
+
+def query(args):
+    """Read events with partition pruning and print the first rows."""
+    from event_store.reader import read_events
+
+    events = read_events(args.path, category=args.category, names=args.names,
+                         start=args.start, end=args.end, entity_ids=args.entity_ids, columns=args.columns,
+                         backend=args.backend)
+    if args.backend == 'spark':
+        events.show(args.limit, truncate=False)
+        return
+    print(events.slice(0, args.limit).to_pandas().to_string(index=False))
+    print(f"({events.num_rows} events)")
+
+def build_parser():
+    """Argument parser of the event store command line."""
+    parser = argparse.ArgumentParser(prog="python -m event_store.cli", description="Generate, ingest, append, transform, compact and query events")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", help="Generate events into OUTPUT_DIR/events")
+    generate_parser.add_argument("--engine", choices=GENERATE_ENGINES, default="pandas", help="Generation engine")
+    generate_parser.add_argument("--events", type=_volume, nargs="+", metavar="TYPE=COUNT",
+                                 help="Events per type, e.g. product_view=100000 order=0")
+    generate_parser.add_argument("--start", type=datetime.fromisoformat, help="ISO start of event timestamps")
+    generate_parser.add_argument("--end", type=datetime.fromisoformat, help="ISO end of event timestamps")
+    generate_parser.add_argument("--days", type=int, help="Days before --end (or now) when --start is not given")
+    generate_parser.add_argument("--output-dir", help="Output directory (config.OUTPUT_DIR)")
+    generate_parser.add_argument("--profile", help="Parquet writer profile: archive or interactive")
+    generate_parser.add_argument("--seed", type=int, help="Seed of the generators")
+    generate_parser.add_argument("--batch-size", type=int, help="Events per RecordBatch (pandas engine)")
+    generate_parser.add_argument("--workers", type=int, help="Generate over this many processes (pandas engine)")
+    generate_parser.add_argument("--mode", help="Spark generation mode: native or udf")
+    generate_parser.add_argument("--plan", help="Spark write plan: single or batched")
+    generate_parser.add_argument("--append", action="store_true",
+                                 help="Append to the events already stored, skipping duplicates (spark engine)")
+    generate_parser.set_defaults(handler=generate)
+
+    transform_parser = commands.add_parser("transform", help="Repartition new events by year/month/day (Spark)")
+    transform_parser.add_argument("input_path", nargs="?", help="Events dataset directory")
+    transform_parser.add_argument("output_path", nargs="?", help="Output directory")
+    transform_parser.add_argument("--order-items-path", help="Output directory of the day-partitioned order_items")
+    transform_parser.set_defaults(handler=transform)
+
+    append_parser = commands.add_parser("append", help="Append a Parquet dataset of events, skipping duplicates")
+    append_parser.add_argument("source", help="Parquet file or hive-partitioned directory of events")
+    append_parser.add_argument("path", nargs="?", help="Events dataset directory")
+    append_parser.set_defaults(handler=append)
+
+    ingest_parser = commands.add_parser("ingest", help="Ingest CSV files from a zip archive, skipping duplicates")
+    ingest_parser.add_argument("source", help="Zip archive or CSV file")
+    ingest_parser.add_argument("output_path", nargs="?", help="Output dataset directory")
+    ingest_parser.add_argument("--mapping", default="sales", help="Column mapping name or JSON file")
+    ingest_parser.set_defaults(handler=ingest)
+
+    compact_parser = commands.add_parser("compact", help="Compact small files in each partition (pyarrow)")
+    compact_parser.add_argument("path", nargs="?", help="Events dataset directory")
+    compact_parser.add_argument("--target-mb", type=int, help="Target file size in MB")
+    compact_parser.add_argument("--dry-run", action="store_true", help="Only report what would be compacted")
+    compact_parser.add_argument("--retention-minutes", type=int, help="Minutes replaced files are kept for running readers")
+    compact_parser.set_defaults(handler=compact)
+
+    query_parser = commands.add_parser("query", help="Print events matching some filters")
+    query_parser.add_argument("--path", help="Events dataset directory (warehouse for the iceberg backend)")
+    query_parser.add_argument("--backend", choices=QUERY_BACKENDS, default="arrow", help="Query engine")
+    query_parser.add_argument("--category", nargs="+", help="Event categories")
+    query_parser.add_argument("--names", nargs="+", help="Event names")
+    query_parser.add_argument("--start", help="Earliest event_timestamp (ISO-8601, inclusive)")
+    query_parser.add_argument("--end", help="Latest event_timestamp (ISO-8601, exclusive)")
+    query_parser.add_argument("--entity-ids", nargs="+", help="Entity IDs")
+    query_parser.add_argument("--columns", nargs="+", help="Columns to return")
+    query_parser.add_argument("--limit", type=int, default=20, help="Rows printed")
+    query_parser.set_defaults(handler=query)
+    return parser
+
+def main(argv=None):
+    """Entry point of the command line: python -m event_store.cli from the repository root.
+
+    The repository is not installed as a package, so there is no console
+    script; the generator scripts are found next to event_store. Engines are imported by the command that uses them, so each command
+    only pays for its own: generating with pandas never loads pyspark, and
+    --help or a query loads neither the generators nor Faker.
+    """
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import os
+import time
+import uuid
+import errno
+import ctypes
+import shutil
+import argparse
+import pyarrow.dataset as ds
+
+from event_store.reader import DEFAULT_EVENTS_PATH, events_dataset
+from event_store.layout import ENTITY_INDEX_FILE, DEFAULT_ROWS_PER_GROUP, partition_files, build_entity_index
+from event_store.dedup import BLOOM_FILE, sync_partition
+
+# Size compacted files are packed up to, measured on the input files
+DEFAULT_TARGET_FILE_SIZE = 256 * 1024 * 1024
+
+# Seconds replaced partition files are kept after compaction, so readers
+# that listed them before the exchange can still open them
+DEFAULT_RETENTION_SECONDS = 3600
+
+# Prefix of the hidden sibling directories holding replaced partition files
+REPLACED_PREFIX = '.replaced-'
+
+# renameat2() arguments for an atomic exchange of two paths (Linux)
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 2
+
+def _exchange_directories(first, second):
+    """Swap two directories, atomically where the platform supports it.
+
+    renameat2(RENAME_EXCHANGE) swaps both paths in one step, so readers see
+    either the old or the new partition. Where it is unavailable (no such
+    libc function, ENOSYS, or EINVAL from filesystems without exchange
+    support) the swap falls back to three renames through a hidden name,
+    and the partition is briefly absent. Any other error is raised.
+
+    Returns:
+        True if the directories were exchanged atomically
+    """
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except AttributeError:
+        renameat2 = None
+    if renameat2 is not None:
+        if renameat2(_AT_FDCWD, os.fsencode(first), _AT_FDCWD, os.fsencode(second), _RENAME_EXCHANGE) == 0:
+            return True
+        error = ctypes.get_errno()
+        if error not in (errno.ENOSYS, errno.EINVAL):
+            raise OSError(error, os.strerror(error), second)
+    # Hidden, so partition discovery never picks up the parked old partition
+    parked = os.path.join(os.path.dirname(second), f".exchange-{uuid.uuid4().hex}")
+    os.rename(second, parked)
+    os.rename(first, second)
+    os.rename(parked, first)
+    return False
+
+def _link_sidecars(directory, staging, bloom):
+    """Hard-link a partition's '_' files and directories into its staging directory.
+
+    Compaction keeps the partition's event IDs, so the exact ID index stays
+    valid as it is; the Bloom filter is saved again with the compacted file
+    names, so dedup does not index the new files a second time.
+    """
+    for name in os.listdir(directory):
+        if not name.startswith('_') or name == BLOOM_FILE:
+            continue
+        source = os.path.join(directory, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(staging, name), copy_function=os.link)
+        else:
+            os.link(source, os.path.join(staging, name))
+    if bloom is not None:
+        bloom.files = {name for name in os.listdir(staging)
+                       if name.endswith('.parquet') and not name.startswith(('_', '.'))}
+        bloom.save(os.path.join(staging, BLOOM_FILE))
+
+def expire_replaced(directories, retention_seconds=DEFAULT_RETENTION_SECONDS):
+    """Delete replaced partition files older than retention_seconds.
+
+    Args:
+        directories: Directories holding partitions, searched for replaced ones
+        retention_seconds: Age in seconds before replaced files are deleted
+
+    Returns:
+        Number of replaced partition directories deleted
+    """
+    removed = 0
+    for parent in directories:
+        if not os.path.isdir(parent):
+            continue
+        for name in os.listdir(parent):
+            if not name.startswith(REPLACED_PREFIX):
+                continue
+            replaced_at = int(name[len(REPLACED_PREFIX):].split('-')[0])
+            if time.time() - replaced_at >= retention_seconds:
+                shutil.rmtree(os.path.join(parent, name))
+                removed += 1
+    return removed
+
+def plan_bins(files, target_file_size):
+    """Group consecutive files into bins of at most target_file_size bytes.
+
+    Files already at or above the target size are left alone.
+
+    Args:
+        files: List of file paths of one partition
+        target_file_size: Size in bytes to pack compacted files up to
+
+    Returns:
+        Tuple of (bins to rewrite, files to keep as they are)
+    """
+    bins, kept = [], []
+    current, current_size = [], 0
+    for path in sorted(files):
+        size = os.path.getsize(path)
+        if size >= target_file_size:
+            kept.append(path)
+            continue
+        if current and current_size + size > target_file_size:
+            bins.append(current)
+            current, current_size = [], 0
+        current.append(path)
+        current_size += size
+    if current:
+        bins.append(current)
+    return bins, kept
+
+def _compact_partition(directory, files, target_file_size, rows_per_group):
+    """Rewrite one partition into a staging directory and swap it in.
+
+    The replaced files are moved to a hidden sibling directory rather than
+    deleted, see expire_replaced.
+
+    Returns:
+        Tuple of (files of the compacted partition, whether the swap was atomic)
+    """
+    bins, kept = plan_bins(files, target_file_size)
+    # Files not yet in the dedup index are indexed first, as the index is carried over as is
+    bloom = sync_partition(directory) if os.path.exists(os.path.join(directory, BLOOM_FILE)) else None
+    staging = os.path.join(os.path.dirname(directory), f".compact-{uuid.uuid4().hex}")
+    os.makedirs(staging)
+
+    # Large files are hard-linked, so the new directory is complete without copying them
+    for path in kept:
+        os.link(path, os.path.join(staging, os.path.basename(path)))
+    for i, bin_files in enumerate(bins):
+        ds.write_dataset(
+            ds.dataset(bin_files, format='parquet'),
+            staging,
+            format='parquet',
+            basename_template=f"part-compacted-{i:05d}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+            min_rows_per_group=rows_per_group,
+            max_rows_per_group=rows_per_group,
+            preserve_order=True
+        )
+
+    _link_sidecars(directory, staging, bloom)
+
+    atomic = _exchange_directories(staging, directory)
+    replaced = f"{REPLACED_PREFIX}{int(time.time())}-{uuid.uuid4().hex}"
+    os.rename(staging, os.path.join(os.path.dirname(directory), replaced))
+    files = [os.path.join(directory, name) for name in os.listdir(directory) if not name.startswith(('.', '_'))]
+    return files, atomic
+
+def compact_events(path=DEFAULT_EVENTS_PATH, target_file_size=DEFAULT_TARGET_FILE_SIZE,
+                   rows_per_group=DEFAULT_ROWS_PER_GROUP, dry_run=False,
+                   retention_seconds=DEFAULT_RETENTION_SECONDS):
+    """Rewrite every partition's small files into files of about target_file_size.
+
+    Each partition is rebuilt in a hidden sibling directory, together with
+    its dedup sidecars, and exchanged with the live one in a single rename,
+    so concurrent readers never see missing or duplicated rows. Where the
+    filesystem cannot exchange atomically the partition is briefly absent;
+    such partitions are reported with atomic False. The replaced files are
+    kept for retention_seconds, so a reader that listed them before the
+    exchange can still read them, and deleted by a later compaction.
+    Writers must not append during compaction.
+
+    Args:
+        path: Root directory of the events dataset
+        target_file_size: Size in bytes to pack compacted files up to
+        rows_per_group: Rows per Parquet row group in the compacted files
+        dry_run: Only report what would be rewritten
+        retention_seconds: Age in seconds before replaced files are deleted
+
+    Returns:
+        List of per-partition dicts with the file counts, bytes before and
+        after, and whether the partition was swapped in atomically
+    """
+    partitions = partition_files(events_dataset(path))
+    if not dry_run:
+        expire_replaced({os.path.dirname(directory) for directory in partitions}, retention_seconds)
+
+    report = []
+    for directory, files in sorted(partitions.items()):
+        bins, _ = plan_bins(files, target_file_size)
+        entry = {
+            'partition': os.path.relpath(directory, path),
+            'files_before': len(files),
+            'bytes_before': sum(os.path.getsize(file) for file in files),
+            'atomic': True
+        }
+        if not dry_run and any(len(bin_files) > 1 for bin_files in bins):
+            files, entry['atomic'] = _compact_partition(directory, files, target_file_size, rows_per_group)
+        entry['files_after'] = len(files) if not dry_run else len(bins) + len(files) - sum(map(len, bins))
+        entry['bytes_after'] = sum(os.path.getsize(file) for file in files)
+        report.append(entry)
+
+    # An existing entity index refers to the replaced files, rebuild it
+    if not dry_run and os.path.exists(os.path.join(path, ENTITY_INDEX_FILE)):
+        build_entity_index(path)
+    return report
+
+def format_report(report):
+    """Render a compaction report as a text table."""
+    lines = [f"{'partition':<40} {'files before':>12} {'files after':>12} {'MB before':>10} {'MB after':>10}"]
+    for entry in report:
+        lines.append(
+            f"{entry['partition']:<40} {entry['files_before']:>12} {entry['files_after']:>12} "
+            f"{entry['bytes_before'] / 2**20:>10.1f} {entry['bytes_after'] / 2**20:>10.1f}"
+        )
+    lines.append(
+        f"{'total':<40} {sum(e['files_before'] for e in report):>12} {sum(e['files_after'] for e in report):>12} "
+        f"{sum(e['bytes_before'] for e in report) / 2**20:>10.1f} {sum(e['bytes_after'] for e in report) / 2**20:>10.1f}"
+    )
+    swapped = [entry['partition'] for entry in report if not entry['atomic']]
+    if swapped:
+        lines.append(f"Not exchanged atomically (briefly absent to readers): {', '.join(swapped)}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact small Parquet files within each partition")
+    parser.add_argument("path", nargs="?", default=DEFAULT_EVENTS_PATH, help="Events dataset directory")
+    parser.add_argument("--target-mb", type=int, default=DEFAULT_TARGET_FILE_SIZE // 2**20,
+                        help="Target file size in MB")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be compacted")
+    parser.add_argument("--retention-minutes", type=int, default=DEFAULT_RETENTION_SECONDS // 60,
+                        help="Minutes replaced files are kept for running readers")
+    args = parser.parse_args()
+    print(format_report(compact_events(args.path, target_file_size=args.target_mb * 2**20, dry_run=args.dry_run,
+                                       retention_seconds=args.retention_minutes * 60)))
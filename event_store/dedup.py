@@ -0,0 +1,321 @@
+import os
+import io
+import json
+import math
+import uuid
+import hashlib
+import argparse
+import itertools
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from event_generator.utils.hash_utils import content_event_ids
+from event_store.reader import DEFAULT_EVENTS_PATH, events_dataset
+
+# Column holding the event ID
+EVENT_ID_COLUMN = 'event_id'
+
+# Per-partition Bloom filter and exact ID index, ignored by dataset discovery
+BLOOM_FILE = '_event_ids.bloom'
+ID_INDEX_DIR = '_event_ids'
+
+# Target false positive rate of the Bloom filters
+DEFAULT_FALSE_POSITIVE_RATE = 0.01
+
+# Smallest number of IDs a Bloom filter is sized for
+MIN_BLOOM_CAPACITY = 1024 * 1024
+
+# Rows per row group of the sorted ID index files, so exact checks read few row groups
+INDEX_ROWS_PER_GROUP = 64 * 1024
+
+# ID index files per partition before they are merged into one
+MAX_INDEX_FILES = 16
+
+# Rows per append_events call of append_batches: each call holds its rows in
+# memory and writes one file per partition
+ROWS_PER_APPEND = 1000000
+
+# Value of each ASCII character as a hex digit, 16 for any other character
+_NIBBLES = np.full(256, 16, dtype=np.uint8)
+_NIBBLES[np.frombuffer(b'0123456789', dtype=np.uint8)] = np.arange(10)
+_NIBBLES[np.frombuffer(b'abcdef', dtype=np.uint8)] = np.arange(10, 16)
+_NIBBLES[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = np.arange(10, 16)
+
+def _digests(ids):
+    """Two 64-bit hashes per ID: the halves of the ID when it is a 32-char hex string, of its MD5 otherwise.
+
+    Hex IDs (content_event_ids) are decoded with numpy over the whole array.
+    """
+    ids = pc.fill_null(ids.cast(pa.large_string()), '')
+    if len(ids) and pc.all(pc.equal(pc.binary_length(ids), 32)).as_py():
+        offsets = np.frombuffer(ids.buffers()[1], dtype=np.int64)[ids.offset:ids.offset + len(ids) + 1]
+        text = np.frombuffer(ids.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]].reshape(-1, 32)
+        nibbles = _NIBBLES[text]
+        if (nibbles < 16).all():
+            raw = np.ascontiguousarray(nibbles[:, 0::2] << 4 | nibbles[:, 1::2])
+            halves = raw.view('<u8')
+            return halves[:, 0], halves[:, 1] | np.uint64(1)
+    raw = b''.join(hashlib.md5(str(value).encode()).digest() for value in ids.to_pylist())
+    halves = np.frombuffer(raw, dtype='<u8').reshape(-1, 2)
+    return halves[:, 0], halves[:, 1] | np.uint64(1)
+
+class BloomFilter:
+    """Bit array answering 'maybe seen' or 'definitely not seen' for event IDs.
+
+    Uses double hashing over the two halves of each ID's 128-bit digest,
+    so adding and testing a batch are a few numpy operations.
+    """
+
+    def __init__(self, capacity, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE, bits=None, num_hashes=None,
+                 count=0, files=None):
+        """Create an empty filter sized for capacity IDs, or restore a saved one.
+
+        Args:
+            capacity: Number of IDs the false positive rate holds for
+            false_positive_rate: Target rate of 'maybe seen' answers for new IDs
+            bits, num_hashes, count: State of a saved filter
+            files: Data files whose IDs have been added
+        """
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        num_bits = max(64, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.num_hashes = num_hashes or max(1, round(num_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else np.zeros((num_bits + 63) // 64, dtype=np.uint64)
+        self.count = count
+        self.files = set(files or [])
+
+    def _positions(self, ids):
+        h1, h2 = _digests(ids)
+        num_bits = np.uint64(len(self.bits) * 64)
+        with np.errstate(over='ignore'):
+            return [(h1 + np.uint64(i) * h2) % num_bits for i in range(self.num_hashes)]
+
+    def add(self, ids):
+        for positions in self._positions(ids):
+            np.bitwise_or.at(self.bits, positions >> np.uint64(6), np.uint64(1) << (positions & np.uint64(63)))
+        self.count += len(ids)
+
+    def might_contain(self, ids):
+        """Boolean numpy mask of the IDs that may have been added."""
+        if len(ids) == 0:
+            return np.zeros(0, dtype=bool)
+        mask = np.ones(len(ids), dtype=bool)
+        for positions in self._positions(ids):
+            mask &= (self.bits[positions >> np.uint64(6)] >> (positions & np.uint64(63))) & np.uint64(1) == 1
+        return mask
+
+    def save(self, path):
+        """Write the filter atomically."""
+        buffer = io.BytesIO()
+        np.savez(buffer, bits=self.bits, header=np.array(json.dumps({
+            'capacity': self.capacity, 'false_positive_rate': self.false_positive_rate,
+            'num_hashes': self.num_hashes, 'count': self.count, 'files': sorted(self.files)
+        })))
+        with open(path + '.tmp', 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            header = json.loads(str(data['header']))
+            return cls(header['capacity'], header['false_positive_rate'], data['bits'], header['num_hashes'],
+                       header['count'], header['files'])
+
+def _data_files(directory):
+    """Names of the Parquet data files directly in a partition directory."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory)
+                  if name.endswith('.parquet') and not name.startswith(('_', '.')))
+
+def _file_ids(directory, files):
+    """Event IDs stored in some data files of a partition, or derived from their content."""
+    table = ds.dataset([os.path.join(directory, name) for name in files], format='parquet').to_table()
+    if EVENT_ID_COLUMN in table.column_names:
+        return table[EVENT_ID_COLUMN].combine_chunks()
+    return content_event_ids(table)
+
+def _index_files(directory):
+    index_dir = os.path.join(directory, ID_INDEX_DIR)
+    if not os.path.isdir(index_dir):
+        return []
+    return sorted(os.path.join(index_dir, name) for name in os.listdir(index_dir) if name.endswith('.parquet'))
+
+def _write_index_file(directory, ids):
+    """Add a sorted ID index file; sorted row groups let an exact check skip most of them."""
+    os.makedirs(os.path.join(directory, ID_INDEX_DIR), exist_ok=True)
+    table = pa.table({EVENT_ID_COLUMN: ids}).sort_by(EVENT_ID_COLUMN)
+    name = f"{uuid.uuid4().hex}.parquet"
+    staging = os.path.join(directory, ID_INDEX_DIR, '.' + name)
+    pq.write_table(table, staging, row_group_size=INDEX_ROWS_PER_GROUP)
+    os.replace(staging, os.path.join(directory, ID_INDEX_DIR, name))
+
+def _merge_index(directory):
+    """Merge the ID index files of a partition into one once there are more than MAX_INDEX_FILES."""
+    files = _index_files(directory)
+    if len(files) <= MAX_INDEX_FILES:
+        return
+    ids = pc.unique(ds.dataset(files, format='parquet').to_table()[EVENT_ID_COLUMN])
+    _write_index_file(directory, ids)
+    for file in files:
+        os.remove(file)
+
+def _existing_ids(directory, candidates):
+    """Exact check of candidate IDs against the partition's ID index."""
+    files = _index_files(directory)
+    if len(candidates) == 0 or not files:
+        return pa.array([], type=pa.string())
+    index = ds.dataset(files, format='parquet')
+    return pc.unique(index.to_table(filter=ds.field(EVENT_ID_COLUMN).isin(candidates))[EVENT_ID_COLUMN])
+
+def sync_partition(directory, incoming=0, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+    """Bring a partition's ID index and Bloom filter up to date with its data files.
+
+    Data files the filter has not seen (written by Spark, by an older run,
+    or by compaction) have their IDs added to the index and the filter.
+    The filter is rebuilt from the index, twice as large, when it would
+    exceed its capacity after incoming more IDs.
+
+    Returns:
+        The partition's BloomFilter (not yet saved)
+    """
+    bloom_path = os.path.join(directory, BLOOM_FILE)
+    bloom = BloomFilter.load(bloom_path) if os.path.exists(bloom_path) else None
+    files = _data_files(directory)
+    unindexed = [name for name in files if bloom is None or name not in bloom.files]
+    new_ids = _file_ids(directory, unindexed) if unindexed else pa.array([], type=pa.string())
+    if len(new_ids):
+        _write_index_file(directory, new_ids)
+
+    if bloom is None or bloom.count + len(new_ids) + incoming > bloom.capacity:
+        index_files = _index_files(directory)
+        ids = ds.dataset(index_files, format='parquet').to_table()[EVENT_ID_COLUMN].combine_chunks() \
+            if index_files else pa.array([], type=pa.string())
+        bloom = BloomFilter(max(MIN_BLOOM_CAPACITY, 2 * (len(ids) + incoming)), false_positive_rate)
+        bloom.add(ids)
+    else:
+        bloom.add(new_ids)
+    bloom.files = set(files)
+    return bloom
+
+def build_event_index(path=DEFAULT_EVENTS_PATH, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+    """Create or update the ID index and Bloom filter of every partition of a dataset.
+
+    Returns:
+        Number of partitions indexed
+    """
+    directories = sorted({os.path.dirname(fragment.path) for fragment in events_dataset(path).get_fragments()})
+    for directory in directories:
+        bloom = sync_partition(directory, false_positive_rate=false_positive_rate)
+        bloom.save(os.path.join(directory, BLOOM_FILE))
+        _merge_index(directory)
+    return len(directories)
+
+def append_events(events, path=DEFAULT_EVENTS_PATH, partition_by=('event_category',),
+                  false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+    """Append events to a partitioned dataset, skipping any whose event ID is already stored.
+
+    Incoming IDs are tested against each partition's Bloom filter; only
+    the few that may have been seen are checked exactly against the sorted
+    ID index, so the cost follows the size of the batch rather than the
+    table. Rows repeated within the batch are written once. Events without
+    an event_id column get content-derived IDs (content_event_ids).
+
+    New rows are written as one file per partition, then their IDs are
+    added to the index and the filter. A crash in between can at worst let
+    the same rows be appended again, never lose them.
+
+    Args:
+        events: pyarrow Table or iterable of RecordBatches in the events schema
+        path: Root directory of the partitioned dataset
+        partition_by: Hive partition columns of the dataset
+        false_positive_rate: Target false positive rate of new Bloom filters
+
+    Returns:
+        Dict with the rows received, written, duplicates dropped and exact checks made
+    """
+    table = events if isinstance(events, pa.Table) else pa.Table.from_batches(list(events))
+    if EVENT_ID_COLUMN not in table.column_names:
+        table = table.append_column(EVENT_ID_COLUMN, content_event_ids(table))
+
+    # Keep the first row of every ID repeated within the batch
+    rows = table.select([EVENT_ID_COLUMN]).append_column('row', pa.array(np.arange(table.num_rows)))
+    first_rows = rows.group_by(EVENT_ID_COLUMN, use_threads=False).aggregate([('row', 'min')])['row_min']
+    unique = table.take(pc.take(first_rows, pc.sort_indices(first_rows)))
+
+    report = {'rows': table.num_rows, 'written': 0, 'duplicates': table.num_rows - unique.num_rows, 'checked': 0}
+    partition_by = list(partition_by)
+    partitions = unique.select(partition_by).group_by(partition_by).aggregate([]).to_pylist() \
+        if partition_by else [{}]
+    for values in partitions:
+        part = unique
+        for column, value in values.items():
+            part = part.filter(pc.equal(part[column], value))
+        directory = os.path.join(path, *[f"{column}={value}" for column, value in values.items()])
+
+        ids = part[EVENT_ID_COLUMN].combine_chunks()
+        bloom = sync_partition(directory, part.num_rows, false_positive_rate)
+        candidates = ids.filter(pa.array(bloom.might_contain(ids)))
+        duplicates = _existing_ids(directory, candidates)
+        if len(duplicates):
+            part = part.filter(pc.invert(pc.is_in(ids, duplicates)))
+            ids = part[EVENT_ID_COLUMN].combine_chunks()
+        report['checked'] += len(candidates)
+        report['duplicates'] += len(duplicates)
+        if part.num_rows == 0:
+            continue
+
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        # Written under a hidden name first, so readers never see a partial file
+        pq.write_table(part.drop_columns(partition_by), os.path.join(directory, '.' + name))
+        os.replace(os.path.join(directory, '.' + name), os.path.join(directory, name))
+        _write_index_file(directory, ids)
+        bloom.add(ids)
+        bloom.files.add(name)
+        bloom.save(os.path.join(directory, BLOOM_FILE))
+        _merge_index(directory)
+        report['written'] += part.num_rows
+    return report
+
+def append_batches(batches, path=DEFAULT_EVENTS_PATH, partition_by=('event_category',),
+                   rows_per_append=ROWS_PER_APPEND, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+    """Append a stream of RecordBatches with append_events, rows_per_append rows at a time.
+
+    Memory stays bounded by rows_per_append however long the stream, so a
+    whole dataset or CSV archive can be appended idempotently.
+
+    Returns:
+        Dict with the rows received, written, duplicates dropped and exact checks made, summed over the calls
+    """
+    report = {'rows': 0, 'written': 0, 'duplicates': 0, 'checked': 0}
+    chunk, rows = [], 0
+    for batch in itertools.chain(batches, [None]):
+        if batch is not None and batch.num_rows:
+            chunk.append(batch)
+            rows += batch.num_rows
+        if chunk and (rows >= rows_per_append or batch is None):
+            for key, value in append_events(chunk, path, partition_by, false_positive_rate).items():
+                report[key] += value
+            chunk, rows = [], 0
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event ID index and idempotent appends")
+    parser.add_argument("--path", default=DEFAULT_EVENTS_PATH, help="Events dataset directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("index", help="Build or update the ID index and Bloom filter of every partition")
+    append_parser = commands.add_parser("append", help="Append a Parquet dataset, skipping events already stored")
+    append_parser.add_argument("source", help="Parquet file or hive-partitioned directory of events to append")
+    args = parser.parse_args()
+
+    if args.command == "index":
+        print(f"Indexed {build_event_index(args.path)} partitions")
+    else:
+        report = append_batches(events_dataset(args.source).to_batches(), args.path)
+        print(f"Appended {report['written']} of {report['rows']} events "
+              f"({report['duplicates']} duplicates skipped, {report['checked']} checked exactly)")
@@ -0,0 +1,329 @@
+import os
+import json
+import argparse
+import itertools
+from functools import reduce
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from event_store.reader import DEFAULT_EVENTS_PATH, DATE_PARTITIONS, events_dataset, _as_list, _as_datetime, _entity_values
+
+# Warehouse holding the SQLite catalog and the table data and metadata files
+DEFAULT_WAREHOUSE = os.path.join('.', 'output', 'warehouse')
+
+# Catalog name and namespace.table identifier of the events table
+CATALOG_NAME = 'event_store'
+DEFAULT_TABLE = 'event_store.events'
+
+# Rows buffered per append; every append writes its own data files
+APPEND_ROWS = 1000000
+
+# Snapshot summary property listing the Parquet files an import commit copied
+SOURCE_FILES_PROPERTY = 'event-store.source-files'
+
+def load_catalog(warehouse=DEFAULT_WAREHOUSE, create=True):
+    """Open the local SQL catalog of a warehouse directory.
+
+    Args:
+        warehouse: Warehouse directory of the catalog
+        create: Create the catalog on first use. Readers pass False, so
+            pointing them at the wrong directory fails instead of leaving
+            an empty catalog behind
+
+    Raises:
+        FileNotFoundError: The warehouse has no catalog and create is False
+        ValueError: The directory holds a Parquet events dataset, which a
+            catalog database would break for the other backends
+    """
+    from pyiceberg.catalog.sql import SqlCatalog
+
+    warehouse = os.path.abspath(warehouse)
+    catalog_path = os.path.join(warehouse, 'catalog.db')
+    if not os.path.exists(catalog_path):
+        if not create:
+            raise FileNotFoundError(f"No Iceberg catalog in {warehouse}, import events into it first")
+        if os.path.isdir(warehouse) and any('=' in name or name.endswith('.parquet') for name in os.listdir(warehouse)):
+            raise ValueError(f"{warehouse} holds a Parquet dataset, not an Iceberg warehouse")
+    os.makedirs(warehouse, exist_ok=True)
+    return SqlCatalog(
+        CATALOG_NAME,
+        uri=f"sqlite:///{catalog_path}",
+        warehouse=f"file://{warehouse}"
+    )
+
+def events_table(catalog, identifier=DEFAULT_TABLE, schema=None):
+    """Load the events table, creating it from an Arrow schema if it does not exist.
+
+    The table is partitioned by days(event_timestamp) and event_category.
+    Both are hidden partitions derived from the columns, so readers filter
+    on event_timestamp and writers need no year/month/day columns.
+
+    Args:
+        catalog: Catalog from load_catalog
+        identifier: namespace.table name
+        schema: Arrow schema of the events, required to create the table
+
+    Returns:
+        A pyiceberg Table
+    """
+    from pyiceberg.exceptions import NoSuchTableError
+    from pyiceberg.transforms import DayTransform
+
+    try:
+        return catalog.load_table(identifier)
+    except NoSuchTableError:
+        if schema is None:
+            raise
+
+    catalog.create_namespace_if_not_exists(identifier.rsplit('.', 1)[0])
+    with catalog.create_table_transaction(identifier, schema) as transaction:
+        with transaction.update_spec() as spec:
+            spec.add_field('event_timestamp', DayTransform(), 'event_day')
+            spec.add_identity('event_category')
+    return catalog.load_table(identifier)
+
+def _chunks(batches, rows):
+    """Group record batches into tables of about rows rows."""
+    pending, pending_rows = [], 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= rows:
+            yield pa.Table.from_batches(pending)
+            pending, pending_rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending)
+
+def append_events(batches, warehouse=DEFAULT_WAREHOUSE, identifier=DEFAULT_TABLE, snapshot_properties=None):
+    """Append a stream of event RecordBatches to the events table in one atomic commit.
+
+    Data files are written APPEND_ROWS rows at a time, so memory stays
+    bounded, but the catalog only moves to the new snapshots once every
+    batch is written: readers see none or all of the appended events.
+
+    Args:
+        batches: Iterable of RecordBatches in the events schema
+        warehouse: Warehouse directory of the catalog
+        identifier: namespace.table name
+        snapshot_properties: Optional properties to record in the snapshot summary
+
+    Returns:
+        Number of rows appended
+    """
+    batches = iter(batches)
+    first = next(batches, None)
+    if first is None:
+        return 0
+
+    table = events_table(load_catalog(warehouse), identifier, first.schema)
+    rows = 0
+    with table.transaction() as transaction:
+        for chunk in _chunks(itertools.chain([first], batches), APPEND_ROWS):
+            transaction.append(chunk, snapshot_properties=snapshot_properties or {})
+            rows += chunk.num_rows
+    return rows
+
+def imported_files(table):
+    """Source Parquet files already copied into the table by import_events, with their size in bytes."""
+    files = {}
+    for snapshot in table.snapshots():
+        if snapshot.summary is not None and SOURCE_FILES_PROPERTY in snapshot.summary.additional_properties:
+            files.update(json.loads(snapshot.summary.additional_properties[SOURCE_FILES_PROPERTY]))
+    return files
+
+def import_events(path=DEFAULT_EVENTS_PATH, warehouse=DEFAULT_WAREHOUSE, identifier=DEFAULT_TABLE):
+    """Copy the Parquet files of an events directory into the Iceberg table.
+
+    Only files not imported before are appended, and the list of imported
+    files is committed with the data, so rerunning after a failure or on a
+    grown directory never duplicates events. Files are matched by relative
+    path: import a compacted or re-laid-out directory into a new table.
+    The event_category partition is restored from the file paths and the
+    year/month/day columns of the transformer layout are dropped, since
+    the table derives its partitions from event_timestamp.
+
+    Args:
+        path: Events directory written by the generator or transformer
+        warehouse: Warehouse directory of the catalog
+        identifier: namespace.table name
+
+    Returns:
+        Tuple of (files imported, rows imported)
+    """
+    from pyiceberg.exceptions import NoSuchTableError
+
+    dataset = events_dataset(path)
+    schema = pa.schema([field for field in dataset.schema if field.name not in DATE_PARTITIONS])
+    try:
+        done = imported_files(load_catalog(warehouse).load_table(identifier))
+    except NoSuchTableError:
+        done = {}
+
+    pending, fragments = {}, []
+    for fragment in dataset.get_fragments():
+        relative_path = os.path.relpath(fragment.path, path)
+        if relative_path not in done:
+            pending[relative_path] = os.path.getsize(fragment.path)
+            fragments.append(fragment)
+    if not pending:
+        return 0, 0
+
+    # Hive-discovered fragments carry their partition values, so event_category is restored
+    pending_dataset = ds.FileSystemDataset(fragments, dataset.schema, dataset.format, dataset.filesystem)
+    rows = append_events(pending_dataset.to_batches(columns=schema.names), warehouse, identifier,
+                         {SOURCE_FILES_PROPERTY: json.dumps(pending, sort_keys=True)})
+    return len(pending), rows
+
+def _row_filter(table, category, names, start, end, entity_ids):
+    """Translate the read_events filters to an Iceberg row filter.
+
+    The filter drives manifest pruning (partition summaries and the
+    days(event_timestamp) transform), data file pruning on column stats
+    and row filtering while reading.
+    """
+    from pyiceberg.expressions import AlwaysTrue, And, In, GreaterThanOrEqual, LessThan
+    from pyiceberg.types import BinaryType, FixedType
+
+    conditions = []
+    categories = _as_list(category)
+    if categories:
+        conditions.append(In('event_category', categories))
+    names = _as_list(names)
+    if names:
+        conditions.append(In('event_name', names))
+    start, end = _as_datetime(start), _as_datetime(end)
+    if start is not None:
+        conditions.append(GreaterThanOrEqual('event_timestamp', start.isoformat()))
+    if end is not None:
+        conditions.append(LessThan('event_timestamp', end.isoformat()))
+    if entity_ids is not None:
+        entity_type = table.schema().find_field('entity_id').field_type
+        conditions.append(In('entity_id', _entity_values(
+            _as_list(entity_ids), isinstance(entity_type, (BinaryType, FixedType))
+        )))
+    return reduce(And, conditions) if conditions else AlwaysTrue()
+
+def _appended_files(table, from_snapshot_id, to_snapshot_id):
+    """Data files added by the append snapshots after from_snapshot_id up to to_snapshot_id."""
+    from pyiceberg.manifest import ManifestEntryStatus
+    from pyiceberg.table.snapshots import Operation
+
+    files = set()
+    snapshot = table.snapshot_by_id(to_snapshot_id)
+    while snapshot is not None and snapshot.snapshot_id != from_snapshot_id:
+        if snapshot.summary is not None and snapshot.summary.operation == Operation.APPEND:
+            for manifest in snapshot.manifests(table.io):
+                if manifest.added_snapshot_id != snapshot.snapshot_id:
+                    continue
+                for entry in manifest.fetch_manifest_entry(table.io, discard_deleted=True):
+                    if entry.status == ManifestEntryStatus.ADDED:
+                        files.add(entry.data_file.file_path)
+        snapshot = table.snapshot_by_id(snapshot.parent_snapshot_id) if snapshot.parent_snapshot_id else None
+    if from_snapshot_id is not None and snapshot is None:
+        raise ValueError(f"Snapshot {from_snapshot_id} is not an ancestor of snapshot {to_snapshot_id}")
+    return files
+
+def scan_events(warehouse=DEFAULT_WAREHOUSE, identifier=DEFAULT_TABLE, category=None, names=None, start=None,
+                end=None, entity_ids=None, columns=None, snapshot_id=None, after_snapshot_id=None):
+    """Read events from the Iceberg table, planning the scan from its manifests.
+
+    Filters have the same meaning as in read_events. No directory is
+    listed: the data files to read come from the manifests of the snapshot,
+    pruned by partition (day and category) and by column statistics.
+
+    Args:
+        warehouse: Warehouse directory of the catalog
+        identifier: namespace.table name
+        category: Event category or list of categories
+        names: Event name or list of event names
+        start: Earliest event_timestamp (inclusive)
+        end: Latest event_timestamp (exclusive)
+        entity_ids: Entity ID or list of IDs (hex strings are accepted for binary IDs)
+        columns: Columns to return (all columns when None)
+        snapshot_id: Snapshot to read (the current one when None), for time travel
+        after_snapshot_id: Only return events appended after this snapshot,
+            for incremental processing; pass the snapshot_id read last time
+
+    Returns:
+        A pyarrow Table
+    """
+    from pyiceberg.io.pyarrow import ArrowScan
+
+    table = events_table(load_catalog(warehouse, create=False), identifier)
+    if snapshot_id is None:
+        current = table.current_snapshot()
+        if current is None:
+            return table.schema().as_arrow().empty_table() if columns is None else \
+                pa.schema([table.schema().as_arrow().field(name) for name in columns]).empty_table()
+        snapshot_id = current.snapshot_id
+
+    scan = table.scan(
+        row_filter=_row_filter(table, category, names, start, end, entity_ids),
+        selected_fields=tuple(columns) if columns else ('*',),
+        snapshot_id=snapshot_id
+    )
+    tasks = list(scan.plan_files())
+    if after_snapshot_id is not None:
+        appended = _appended_files(table, after_snapshot_id, snapshot_id)
+        tasks = [task for task in tasks if task.file.file_path in appended]
+    events = ArrowScan(table.metadata, table.io, scan.projection(), scan.row_filter).to_table(tasks)
+    return events.select(columns) if columns else events
+
+def plan_summary(warehouse=DEFAULT_WAREHOUSE, identifier=DEFAULT_TABLE, category=None, names=None, start=None,
+                 end=None, entity_ids=None):
+    """Number of data files a filtered scan would read out of the files in the current snapshot.
+
+    Filters have the same meaning as in scan_events; any left out do not restrict the scan.
+
+    Returns:
+        Tuple of (data files planned, data files in the snapshot)
+    """
+    table = events_table(load_catalog(warehouse, create=False), identifier)
+    total = sum(1 for _ in table.scan().plan_files())
+    row_filter = _row_filter(table, category, names, start, end, entity_ids)
+    planned = sum(1 for _ in table.scan(row_filter=row_filter).plan_files())
+    return planned, total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Iceberg table backend of the event store")
+    parser.add_argument("--warehouse", default=DEFAULT_WAREHOUSE, help="Warehouse directory of the catalog")
+    parser.add_argument("--table", default=DEFAULT_TABLE, help="namespace.table identifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Append new Parquet files of an events directory")
+    import_parser.add_argument("path", nargs="?", default=DEFAULT_EVENTS_PATH, help="Events dataset directory")
+
+    commands.add_parser("snapshots", help="List the snapshots of the table")
+
+    for name, help_text in [("scan", "Read events and print a summary"),
+                            ("plan", "Show how many data files a filtered scan reads")]:
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--category", help="Event category")
+        command.add_argument("--names", nargs="+", help="Event names")
+        command.add_argument("--start", help="Earliest event_timestamp (inclusive, ISO-8601)")
+        command.add_argument("--end", help="Latest event_timestamp (exclusive, ISO-8601)")
+        command.add_argument("--entity-ids", nargs="+", help="Entity IDs")
+        if name == "scan":
+            command.add_argument("--snapshot-id", type=int, help="Snapshot to read (time travel)")
+            command.add_argument("--after-snapshot-id", type=int, help="Only events appended after this snapshot")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        files, rows = import_events(args.path, args.warehouse, args.table)
+        print(f"Imported {rows} events from {files} new files into {args.table}")
+    elif args.command == "snapshots":
+        for snapshot in events_table(load_catalog(args.warehouse, create=False), args.table).snapshots():
+            summary = snapshot.summary
+            print(f"{snapshot.snapshot_id}  parent {snapshot.parent_snapshot_id}  {summary.operation.value}  "
+                  f"+{summary.get('added-records', 0)} records  +{summary.get('added-data-files', 0)} files")
+    else:
+        filters = dict(category=args.category, names=args.names, start=args.start, end=args.end,
+                       entity_ids=args.entity_ids)
+        if args.command == "plan":
+            planned, total = plan_summary(args.warehouse, args.table, **filters)
+            print(f"Scan reads {planned} of {total} data files")
+        else:
+            events = scan_events(args.warehouse, args.table, snapshot_id=args.snapshot_id,
+                                 after_snapshot_id=args.after_snapshot_id, **filters)
+            print(f"{events.num_rows} events")
+            print(events.slice(0, 5).to_pandas())
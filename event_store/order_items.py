@@ -0,0 +1,74 @@
+import os
+import operator
+import argparse
+from functools import reduce
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from event_generator.utils.order_items import ORDER_ITEM_COLUMNS, ORDER_ITEMS_JSON_SCHEMA, order_items_frame
+from event_store.reader import _as_list, _conditions, _entity_values
+
+# order_items table written by the event generator next to the events
+DEFAULT_ORDER_ITEMS_PATH = os.path.join('.', 'output', 'order_items')
+
+# year/month/day partitioned order_items maintained by the transformer
+DEFAULT_ORDER_ITEMS_BY_DAY_PATH = os.path.join('.', 'output', 'order_items_by_day')
+
+def read_order_items(path=DEFAULT_ORDER_ITEMS_PATH, product_ids=None, start=None, end=None, columns=None):
+    """Read order items, skipping the files, days and row groups that cannot match.
+
+    Works on both the generator's table and the transformer's year/month/day
+    partitioned one. Files are sorted by product_id, so a product filter is
+    answered from the row groups whose statistics bracket the product.
+
+    Args:
+        path: Directory of the order_items table
+        product_ids: Product ID or list of IDs (hex strings are accepted for binary IDs)
+        start: Earliest event_timestamp (inclusive), as a datetime, date or ISO-8601 string
+        end: Latest event_timestamp (exclusive), as a datetime, date or ISO-8601 string
+        columns: Columns to return (all columns when None)
+
+    Returns:
+        A pyarrow Table
+    """
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    schema = dataset.schema
+
+    def timestamp(value):
+        return pa.scalar(value, type=schema.field('event_timestamp').type)
+
+    conditions = _conditions(ds.field, timestamp, schema.names, None, None, start, end, None)
+    if product_ids is not None:
+        product_type = schema.field('product_id').type
+        binary = pa.types.is_binary(product_type) or pa.types.is_fixed_size_binary(product_type)
+        product_ids = pa.array(_entity_values(_as_list(product_ids), binary), type=product_type)
+        conditions.append(ds.field('product_id').isin(product_ids))
+    return dataset.to_table(columns=columns, filter=reduce(operator.and_, conditions) if conditions else None)
+
+def product_sales(path=DEFAULT_ORDER_ITEMS_PATH, product_ids=None, start=None, end=None, by_day=False):
+    """Quantity sold and revenue per product (and day) from the order_items table.
+
+    Returns:
+        A pyarrow Table with product_id[, day], quantity, revenue and items
+    """
+    items = read_order_items(path, product_ids, start, end, ['product_id', 'quantity', 'item_total', 'event_timestamp'])
+    keys = ['product_id']
+    if by_day:
+        items = items.append_column('day', pc.cast(items['event_timestamp'], pa.date32()))
+        keys.append('day')
+    sales = items.group_by(keys).aggregate([('quantity', 'sum'), ('item_total', 'sum'), ('quantity', 'count')])
+    sales = sales.rename_columns(
+        {'quantity_sum': 'quantity', 'item_total_sum': 'revenue', 'quantity_count': 'items'}
+    ).select(keys + ['quantity', 'revenue', 'items'])
+    return sales.sort_by([(key, 'ascending') for key in keys])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Product sales from the order_items table")
+    parser.add_argument("--path", default=DEFAULT_ORDER_ITEMS_PATH, help="order_items table directory")
+    parser.add_argument("--product-ids", nargs="+", default=None, help="Products to report")
+    parser.add_argument("--start", default=None, help="Earliest event_timestamp (ISO-8601, inclusive)")
+    parser.add_argument("--end", default=None, help="Latest event_timestamp (ISO-8601, exclusive)")
+    parser.add_argument("--by-day", action="store_true", help="One row per product and day")
+    args = parser.parse_args()
+    print(product_sales(args.path, args.product_ids, args.start, args.end, args.by_day).to_pandas().to_string(index=False))
@@ -0,0 +1,265 @@
+import os
+import json
+import argparse
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from event_store.reader import DEFAULT_EVENTS_PATH, events_dataset, file_changes, _as_list, _entity_values
+
+# Root of the projection snapshots, one directory per projection
+DEFAULT_PROJECTION_PATH = os.path.join('.', 'output', 'projections')
+
+# Checkpoint of a projection: its current snapshot version and the event files folded into it
+CHECKPOINT_FILE = '_projection_checkpoint.json'
+
+# Snapshot versions kept per projection (older ones are deleted)
+SNAPSHOTS_KEPT = 3
+
+# Rows per row group of a snapshot; snapshots are sorted by entity_id, so a
+# point lookup reads only the row groups whose min/max bracket the entity
+SNAPSHOT_ROWS_PER_GROUP = 16 * 1024
+
+def _payload(events, field):
+    return pc.struct_field(events['event_value'], field)
+
+def _only(events, event_name, values):
+    """Keep values of events named event_name, null elsewhere."""
+    return pc.if_else(pc.equal(events['event_name'], event_name), values, pa.nulls(len(events), values.type))
+
+def _account_changes(events):
+    """Profile fields set by each account event; null where an event leaves a field unchanged."""
+    updated_field = _only(events, 'account_updated', _payload(events, 'field_updated'))
+    new_value = _payload(events, 'new_value')
+
+    def updated(field):
+        return pc.if_else(pc.equal(updated_field, field), new_value, pa.nulls(len(events), pa.string()))
+
+    return {
+        'email': pc.coalesce(_only(events, 'account_created', _payload(events, 'email')), updated('email')),
+        'name': pc.coalesce(_only(events, 'account_created', _payload(events, 'name')), updated('name')),
+        'address': updated('address'),
+        'phone': updated('phone'),
+        'registration_source': _only(events, 'account_created', _payload(events, 'registration_source')),
+        'marketing_opt_in': _only(events, 'account_created', _payload(events, 'marketing_opt_in')),
+        'created_at': _only(events, 'account_created', events['event_timestamp'])
+    }
+
+def _order_changes(events):
+    """Latest order of the entity: every order event sets the order and its status."""
+    return {
+        'order_id': _payload(events, 'order_id'),
+        'status': pc.replace_substring(events['event_name'], 'order_', ''),
+        'total_amount': _payload(events, 'total_amount'),
+        'payment_method': _payload(events, 'payment_method'),
+        'shipping_address': _payload(events, 'shipping_address')
+    }
+
+# Projections: (event category, event names folded, function building the changed
+# fields, aggregate folding each field). 'last' keeps the non-null value of the
+# latest event, by the <field>_updated_at column kept next to the field
+PROJECTIONS = {
+    'account_profile': (
+        'account', ['account_created', 'account_updated'], _account_changes,
+        {'email': 'last', 'name': 'last', 'address': 'last', 'phone': 'last', 'registration_source': 'last',
+         'marketing_opt_in': 'last', 'created_at': 'min'}
+    ),
+    'order_status': (
+        'order', ['order_placed', 'order_confirmed', 'order_shipped', 'order_delivered'], _order_changes,
+        {'order_id': 'last', 'status': 'last', 'total_amount': 'last', 'payment_method': 'last',
+         'shipping_address': 'last'}
+    )
+}
+
+# State columns every projection keeps next to its own fields
+_COMMON_AGGREGATES = {'updated_at': 'max', 'event_count': 'sum'}
+
+def _field_timestamp(field):
+    """State column holding the timestamp of the event that set a 'last' field."""
+    return f"{field}_updated_at"
+
+def _last_fields(name):
+    return [field for field, aggregate in PROJECTIONS[name][3].items() if aggregate == 'last']
+
+def _changes(name, events):
+    """Turn events into change rows in the state schema, in event_timestamp order."""
+    _, _, changes, _ = PROJECTIONS[name]
+    events = events.sort_by('event_timestamp')
+    fields = changes(events)
+    timestamps = {
+        _field_timestamp(field): pc.if_else(pc.is_valid(fields[field]), events['event_timestamp'],
+                                            pa.nulls(len(events), events['event_timestamp'].type))
+        for field in _last_fields(name)
+    }
+    return pa.table({
+        'entity_id': events['entity_id'],
+        **fields,
+        'updated_at': events['event_timestamp'],
+        'event_count': pa.repeat(1, len(events)),
+        **timestamps
+    })
+
+def _aggregate(table, aggregates):
+    """Group a table by entity_id, naming each result after its input column."""
+    grouped = table.group_by('entity_id', use_threads=False).aggregate(
+        [(column, aggregate) for column, aggregate in aggregates.items()]
+    )
+    return grouped.rename_columns([column.rsplit('_', 1)[0] if column != 'entity_id' else column
+                                   for column in grouped.column_names])
+
+def _fold(name, state, changes):
+    """Apply change rows on top of a state table, entity by entity.
+
+    Each 'last' field takes the value with the latest <field>_updated_at,
+    whether it comes from the state or from the changes, so events older
+    than the snapshot (late files, backfills) never overwrite newer state
+    and folding incrementally gives the same result as a full rebuild.
+    """
+    aggregates = {**PROJECTIONS[name][3], **_COMMON_AGGREGATES}
+    table = changes if state is None else pa.concat_tables([state, changes.cast(state.schema)])
+    folded = _aggregate(table, {column: aggregate for column, aggregate in aggregates.items() if aggregate != 'last'})
+    for field in _last_fields(name):
+        timestamp = _field_timestamp(field)
+        # Stable sort: on equal timestamps the changes, after the state, win
+        latest = table.select(['entity_id', field, timestamp]).sort_by(timestamp)
+        folded = folded.join(_aggregate(latest, {field: 'last', timestamp: 'max'}), 'entity_id')
+    columns = ['entity_id'] + list(aggregates) + [_field_timestamp(field) for field in _last_fields(name)]
+    return folded.select(columns).sort_by('entity_id')
+
+def _read_changes(name, dataset, fragments, entity_ids=None):
+    """Read the events a projection folds from some fragments of the events dataset."""
+    category, event_names, _, _ = PROJECTIONS[name]
+    if not pa.types.is_struct(dataset.schema.field('event_value').type):
+        raise ValueError("Projections need typed event_value payloads (EVENT_VALUE_FORMAT = 'typed')")
+    condition = (ds.field('event_category') == category) & ds.field('event_name').isin(event_names)
+    if entity_ids is not None:
+        condition = condition & ds.field('entity_id').isin(entity_ids)
+    subset = ds.FileSystemDataset(list(fragments), dataset.schema, dataset.format, dataset.filesystem)
+    return _changes(name, subset.to_table(
+        columns=['event_name', 'event_timestamp', 'event_value', 'entity_id'], filter=condition
+    ))
+
+def load_checkpoint(name, projection_path=DEFAULT_PROJECTION_PATH):
+    """Read the checkpoint of a projection, or an empty one before its first snapshot."""
+    checkpoint_path = os.path.join(projection_path, name, CHECKPOINT_FILE)
+    if not os.path.exists(checkpoint_path):
+        return {'version': None, 'files': {}}
+    with open(checkpoint_path) as f:
+        return json.load(f)
+
+def _save_checkpoint(name, projection_path, checkpoint):
+    checkpoint_path = os.path.join(projection_path, name, CHECKPOINT_FILE)
+    with open(checkpoint_path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+def _snapshot_file(projection_path, name, version):
+    return os.path.join(projection_path, name, f"v{version:06d}.parquet")
+
+def _current(name, path, projection_path, entity_ids=None):
+    """Fold the latest snapshot and the events of files it does not cover.
+
+    Returns:
+        Tuple of (state table, checkpoint, file stats, files folded, rebuilt flag)
+    """
+    if name not in PROJECTIONS:
+        raise ValueError(f"Unknown projection '{name}', expected one of {list(PROJECTIONS)}")
+    dataset = events_dataset(path)
+    checkpoint = load_checkpoint(name, projection_path)
+    fragments, stats, new_files, rebuild = file_changes(dataset, path, checkpoint['files'])
+    rebuild = rebuild or checkpoint['version'] is None
+
+    if entity_ids is not None:
+        entity_type = dataset.schema.field('entity_id').type
+        binary = pa.types.is_binary(entity_type) or pa.types.is_fixed_size_binary(entity_type)
+        entity_ids = pa.array(_entity_values(_as_list(entity_ids), binary), type=entity_type)
+
+    state = None
+    if rebuild:
+        new_files = list(fragments)
+    else:
+        lookup = [('entity_id', 'in', entity_ids.to_pylist())] if entity_ids is not None else None
+        state = pq.read_table(_snapshot_file(projection_path, name, checkpoint['version']), filters=lookup)
+    changes = _read_changes(name, dataset, [fragments[file] for file in new_files], entity_ids)
+    return _fold(name, state, changes), checkpoint, stats, new_files, rebuild
+
+def project(name, path=DEFAULT_EVENTS_PATH, projection_path=DEFAULT_PROJECTION_PATH, entity_ids=None):
+    """Current state of every entity (or of the given ones) in a projection.
+
+    State is the latest snapshot with the events of event files added
+    since then folded on top, so the cost grows with the events since the
+    snapshot rather than with the whole history. Every field holds the
+    value of the latest event that set it, whatever order the files were
+    folded in, with its timestamp in <field>_updated_at. A rewritten or
+    removed covered file (compaction, a replaced partition) makes the
+    snapshot unusable and state is replayed from all events.
+
+    Args:
+        name: Key of PROJECTIONS
+        path: Events directory written by the generator
+        projection_path: Root directory of the projection snapshots
+        entity_ids: Entity ID or list of IDs for a point lookup (hex strings
+            are accepted for binary IDs); the snapshot is read with a filter
+            on its sorted entity_id column and only matching events are folded
+
+    Returns:
+        A pyarrow Table with one row per entity
+    """
+    return _current(name, path, projection_path, entity_ids)[0]
+
+def write_snapshot(name, path=DEFAULT_EVENTS_PATH, projection_path=DEFAULT_PROJECTION_PATH):
+    """Fold new events into the projection and store the result as a new snapshot version.
+
+    Run it periodically (e.g. after each generator or transformer run) to
+    keep the number of events folded at read time small. The checkpoint is
+    replaced after the snapshot is written, so a failed run leaves the
+    previous version in use.
+
+    Returns:
+        Dict with the new version, entities, files folded and whether state was rebuilt
+    """
+    state, checkpoint, stats, new_files, rebuilt = _current(name, path, projection_path)
+    if not new_files and not rebuilt:
+        return {'version': checkpoint['version'], 'entities': None, 'files_read': 0, 'rebuilt': False}
+
+    version = (checkpoint['version'] or 0) + 1
+    os.makedirs(os.path.join(projection_path, name), exist_ok=True)
+    snapshot = _snapshot_file(projection_path, name, version)
+    pq.write_table(state, snapshot + '.tmp', row_group_size=SNAPSHOT_ROWS_PER_GROUP)
+    os.replace(snapshot + '.tmp', snapshot)
+
+    snapshots = checkpoint.get('snapshots', []) + [version]
+    for old_version in snapshots[:-SNAPSHOTS_KEPT]:
+        old_snapshot = _snapshot_file(projection_path, name, old_version)
+        if os.path.exists(old_snapshot):
+            os.remove(old_snapshot)
+    _save_checkpoint(name, projection_path, {
+        'version': version, 'files': stats, 'snapshots': snapshots[-SNAPSHOTS_KEPT:],
+        'created_at': datetime.now().isoformat()
+    })
+    return {'version': version, 'entities': state.num_rows, 'files_read': len(new_files), 'rebuilt': rebuilt}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entity state projections with versioned snapshots")
+    parser.add_argument("--path", default=DEFAULT_EVENTS_PATH, help="Events dataset directory")
+    parser.add_argument("--projection-path", default=DEFAULT_PROJECTION_PATH, help="Snapshot directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot_parser = commands.add_parser("snapshot", help="Fold new events and write a new snapshot version")
+    snapshot_parser.add_argument("projections", nargs="*", default=list(PROJECTIONS), help="Projections to snapshot")
+    lookup_parser = commands.add_parser("lookup", help="Print the current state of some entities")
+    lookup_parser.add_argument("projection", choices=list(PROJECTIONS), help="Projection to read")
+    lookup_parser.add_argument("entity_ids", nargs="+", help="Entity IDs")
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        for name in args.projections:
+            result = write_snapshot(name, args.path, args.projection_path)
+            if result['entities'] is None:
+                print(f"{name}: no new events since snapshot v{result['version']}")
+            else:
+                print(f"{name}: snapshot v{result['version']} of {result['entities']} entities "
+                      f"({'rebuilt from all' if result['rebuilt'] else 'folded'} {result['files_read']} event files)")
+    else:
+        print(project(args.projection, args.path, args.projection_path, args.entity_ids).to_pandas().to_string(index=False))
@@ -0,0 +1,229 @@
+import os
+import operator
+from functools import reduce
+from datetime import datetime, time, timedelta, timezone
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Root of the events dataset written by the event generator
+DEFAULT_EVENTS_PATH = os.path.join('.', 'output', 'events')
+
+# Hive partition columns of the date-partitioned layout, coarsest first
+DATE_PARTITIONS = ['year', 'month', 'day']
+
+# Query engines read_events can run on
+BACKENDS = ['arrow', 'spark', 'iceberg']
+
+def _as_list(values):
+    """Accept a single value or an iterable of values."""
+    if values is None:
+        return None
+    if isinstance(values, (str, bytes, int)):
+        return [values]
+    return list(values)
+
+def _as_datetime(value):
+    """Convert ISO-8601 strings and dates to datetimes, keeping aware values in UTC."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    elif not isinstance(value, datetime):
+        value = datetime.combine(value, time())
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _entity_values(entity_ids, binary):
+    """Convert hex entity IDs to bytes when the entity_id column is stored as binary."""
+    if not binary:
+        return entity_ids
+    return [bytes.fromhex(value.replace('-', '')) if isinstance(value, str) else value for value in entity_ids]
+
+def _date_partition_filter(field, first_day, last_day):
+    """Keep year/month/day partitions between first_day and last_day, both inclusive.
+
+    The comparison is lexicographic over (year, month, day), so it selects
+    whole directories whatever the length of the range.
+    """
+    year, month, day = (field(name) for name in DATE_PARTITIONS)
+
+    def on_or_after(d):
+        return (year > d.year) | ((year == d.year) & ((month > d.month) | ((month == d.month) & (day >= d.day))))
+
+    def on_or_before(d):
+        return (year < d.year) | ((year == d.year) & ((month < d.month) | ((month == d.month) & (day <= d.day))))
+
+    conditions = []
+    if first_day is not None:
+        conditions.append(on_or_after(first_day))
+    if last_day is not None:
+        conditions.append(on_or_before(last_day))
+    return conditions
+
+def _conditions(field, timestamp, columns, category, names, start, end, entity_ids):
+    """Build the filter conditions shared by both backends.
+
+    Args:
+        field: Column reference factory of the backend (ds.field or pyspark col)
+        timestamp: Converts a datetime to a literal comparable with event_timestamp
+        columns: Column names of the dataset, including partition columns
+
+    Returns:
+        List of backend expressions to AND together
+    """
+    conditions = []
+    categories = _as_list(category)
+    if categories:
+        conditions.append(field('event_category').isin(categories))
+    names = _as_list(names)
+    if names:
+        conditions.append(field('event_name').isin(names))
+
+    start, end = _as_datetime(start), _as_datetime(end)
+    if start is not None:
+        conditions.append(field('event_timestamp') >= timestamp(start))
+    if end is not None:
+        conditions.append(field('event_timestamp') < timestamp(end))
+    if all(name in columns for name in DATE_PARTITIONS) and (start is not None or end is not None):
+        last_day = (end - timedelta(microseconds=1)).date() if end is not None else None
+        conditions.extend(_date_partition_filter(field, start.date() if start is not None else None, last_day))
+
+    if entity_ids is not None:
+        conditions.append(field('entity_id').isin(entity_ids))
+    return conditions
+
+def events_dataset(path=DEFAULT_EVENTS_PATH):
+    """Open the events directory as a hive-partitioned pyarrow dataset.
+
+    Works for both the generator layout (event_category=...) and the
+    transformer layout (year=.../month=.../day=...).
+    """
+    return ds.dataset(path, format='parquet', partitioning='hive')
+
+def file_stats(dataset, path):
+    """Size and modification time of every data file of a dataset, by path relative to path.
+
+    Checkpoints store these pairs: a rewrite that keeps a file's size still
+    changes its modification time.
+    """
+    stats = {}
+    for fragment in dataset.get_fragments():
+        stat = os.stat(fragment.path)
+        stats[os.path.relpath(fragment.path, path)] = [stat.st_size, stat.st_mtime_ns]
+    return stats
+
+def file_changes(dataset, path, covered):
+    """Find the data files not covered by a checkpoint, and whether covered ones were rewritten or removed.
+
+    Args:
+        dataset: Dataset opened with events_dataset(path)
+        path: Root directory of the dataset
+        covered: Checkpointed file_stats of the files already processed
+
+    Returns:
+        Tuple of (fragments by relative path, file_stats by relative path,
+        relative paths of new files, rewritten flag)
+    """
+    fragments = {os.path.relpath(fragment.path, path): fragment for fragment in dataset.get_fragments()}
+    stats = file_stats(dataset, path)
+    rewritten = any(stats.get(file) != stat for file, stat in covered.items())
+    return fragments, stats, [file for file in stats if file not in covered], rewritten
+
+def _indexed_dataset(dataset, path, locations):
+    """Restrict a dataset to the row groups listed by the entity index."""
+    fragments = []
+    for fragment in dataset.get_fragments():
+        row_groups = locations.get(os.path.relpath(fragment.path, path))
+        if row_groups:
+            fragments.append(fragment.subset(row_group_ids=row_groups))
+    return ds.FileSystemDataset(fragments, dataset.schema, dataset.format, dataset.filesystem)
+
+def _read_arrow(path, columns, category, names, start, end, entity_ids):
+    from event_store.layout import lookup_entity_index
+
+    dataset = events_dataset(path)
+    schema = dataset.schema
+
+    def timestamp(value):
+        return pa.scalar(value, type=schema.field('event_timestamp').type)
+
+    if entity_ids is not None:
+        entity_type = schema.field('entity_id').type
+        binary = pa.types.is_binary(entity_type) or pa.types.is_fixed_size_binary(entity_type)
+        entity_ids = pa.array(_entity_values(_as_list(entity_ids), binary), type=entity_type)
+        # With an up-to-date entity index only the listed row groups are opened
+        locations = lookup_entity_index(path, entity_ids, dataset)
+        if locations is not None:
+            dataset = _indexed_dataset(dataset, path, locations)
+
+    conditions = _conditions(ds.field, timestamp, schema.names, category, names, start, end, entity_ids)
+    # Partition conditions prune directories, the rest is checked against
+    # row group statistics before any page is decoded
+    return dataset.to_table(
+        columns=columns,
+        filter=reduce(operator.and_, conditions) if conditions else None
+    )
+
+def _read_spark(spark, path, columns, category, names, start, end, entity_ids):
+    from pyspark.sql import SparkSession
+    from pyspark.sql.functions import col, lit
+    from pyspark.sql.types import BinaryType
+    from event_store.layout import lookup_entity_index
+
+    spark = spark or SparkSession.builder.getOrCreate()
+    df = spark.read.option("basePath", path).parquet(path)
+
+    if entity_ids is not None:
+        entity_type = df.schema['entity_id'].dataType
+        entity_ids = _entity_values(_as_list(entity_ids), isinstance(entity_type, BinaryType))
+        # Spark prunes row groups itself, the index narrows the scan to the files holding the entities
+        index_ids = pa.array(entity_ids, type=events_dataset(path).schema.field('entity_id').type)
+        locations = lookup_entity_index(path, index_ids)
+        if locations == {}:
+            df = df.where(lit(False))
+        elif locations is not None:
+            df = spark.read.option("basePath", path).parquet(*[os.path.join(path, file) for file in locations])
+        entity_ids = [bytearray(value) if isinstance(value, bytes) else value for value in entity_ids]
+
+    conditions = _conditions(col, lambda value: value, df.columns, category, names, start, end, entity_ids)
+    # Spark prunes partition directories and pushes the remaining
+    # conditions down to the Parquet reader on its own
+    if conditions:
+        df = df.where(reduce(operator.and_, conditions))
+    return df.select(*columns) if columns else df
+
+def read_events(path=None, category=None, names=None, start=None, end=None, entity_ids=None,
+                columns=None, backend='arrow', spark=None):
+    """Read events, scanning only the partitions and row groups that can match.
+
+    Category and date filters prune event_category=... and year/month/day
+    directories; timestamp and entity filters are pushed down to Parquet
+    row group statistics; only the requested columns are decoded.
+
+    Args:
+        path: Root directory of the events dataset (DEFAULT_EVENTS_PATH when
+            None), or for the iceberg backend the warehouse directory of the
+            events table (event_store.iceberg.DEFAULT_WAREHOUSE when None)
+        category: Event category or list of categories
+        names: Event name or list of event names
+        start: Earliest event_timestamp (inclusive), as a datetime, date or ISO-8601 string
+        end: Latest event_timestamp (exclusive), as a datetime, date or ISO-8601 string
+        entity_ids: Entity ID or list of IDs (hex strings are accepted for binary IDs)
+        columns: Columns to return (all columns when None)
+        backend: 'arrow' for a pyarrow Table, 'spark' for a Spark DataFrame or
+            'iceberg' for a pyarrow Table read from the table in event_store.iceberg
+        spark: SparkSession for the spark backend (defaults to the active session)
+
+    Returns:
+        A pyarrow Table or a Spark DataFrame
+    """
+    if backend == 'iceberg':
+        from event_store.iceberg import DEFAULT_WAREHOUSE, DEFAULT_TABLE, scan_events
+        return scan_events(path or DEFAULT_WAREHOUSE, DEFAULT_TABLE, category, names, start, end, entity_ids, columns)
+    path = path or DEFAULT_EVENTS_PATH
+    if backend == 'arrow':
+        return _read_arrow(path, columns, category, names, start, end, entity_ids)
+    if backend == 'spark':
+        return _read_spark(spark, path, columns, category, names, start, end, entity_ids)
+    raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
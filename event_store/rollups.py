@@ -0,0 +1,281 @@
+import os
+import json
+import shutil
+import argparse
+from datetime import datetime, time
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from event_store.reader import DEFAULT_EVENTS_PATH, events_dataset, file_changes, read_events, _as_list, _as_datetime
+
+# Root of the rollup tables, one versioned directory per update
+DEFAULT_ROLLUP_PATH = os.path.join('.', 'output', 'rollups')
+
+# Checkpoint naming the current version and the event files it covers;
+# replacing it is what publishes an update
+CHECKPOINT_FILE = '_rollup_checkpoint.json'
+
+# Additive measures: per-event values summed per group. Each is
+# (event names counted, or None for all events; payload field summed, or None to count)
+MEASURES = {
+    'event_count': (None, None),
+    'order_count': (['order_placed'], None),
+    'revenue': (['order_placed'], 'total_amount'),
+    'login_attempts': (['login_success', 'login_failed'], None),
+    'login_failures': (['login_failed'], None)
+}
+
+# Measures computed from additive ones after aggregation: (inputs, function of the aggregated table)
+DERIVED_MEASURES = {
+    'login_failure_rate': (['login_failures', 'login_attempts'],
+                           lambda table: pc.divide(pc.cast(table['login_failures'], pa.float64()),
+                                                   table['login_attempts']))
+}
+
+# Rollup tables: (group by columns, additive measures). 'day' is the date of event_timestamp
+ROLLUPS = {
+    'daily_event_counts': (['day', 'event_category', 'event_name'], ['event_count']),
+    'daily_order_revenue': (['day'], ['order_count', 'revenue']),
+    'daily_logins': (['day'], ['login_attempts', 'login_failures'])
+}
+
+# Extracts a numeric payload field from the string event_value format (str(dict) or JSON)
+_PAYLOAD_NUMBER = r"""['"]{field}['"]:\s*(?P<value>-?[0-9.]+(?:[eE][-+]?[0-9]+)?)"""
+
+def _projection(schema):
+    """Columns read to compute every measure: only the payload fields used, when the payload is typed."""
+    columns = {name: ds.field(name) for name in ['event_timestamp', 'event_category', 'event_name']}
+    fields = {field for _, field in MEASURES.values() if field is not None}
+    if pa.types.is_struct(schema.field('event_value').type):
+        columns.update({field: ds.field('event_value', field) for field in fields})
+    else:
+        columns['event_value'] = ds.field('event_value')
+    return columns
+
+def _payload_values(events, field):
+    if field in events.column_names:
+        return pc.cast(events[field], pa.float64())
+    extracted = pc.extract_regex(events['event_value'], _PAYLOAD_NUMBER.format(field=field))
+    return pc.cast(pc.struct_field(extracted, 'value'), pa.float64())
+
+def _aggregate(events, group_by, measures):
+    """Sum the per-event values of additive measures by group_by."""
+    columns = {'day': pc.cast(events['event_timestamp'], pa.date32())}
+    columns.update({name: events[name] for name in group_by if name != 'day'})
+    for measure in measures:
+        names, field = MEASURES[measure]
+        matches = pc.is_in(events['event_name'], pa.array(names)) if names else None
+        if field is None:
+            values = pc.cast(matches, pa.int64()) if matches is not None else pa.repeat(1, events.num_rows)
+        else:
+            values = _payload_values(events, field)
+            if matches is not None:
+                values = pc.if_else(matches, values, None)
+        columns[measure] = values
+    table = pa.table({name: columns[name] for name in list(group_by) + list(measures)})
+    return _sum_by(table, group_by, measures)
+
+def _sum_by(table, group_by, measures):
+    """Re-aggregate partial rollup rows; used both to build and to merge rollups."""
+    summed = table.group_by(list(group_by), use_threads=False).aggregate([(measure, 'sum') for measure in measures])
+    summed = summed.rename_columns([name.removesuffix('_sum') for name in summed.column_names])
+    summed = summed.select(list(group_by) + list(measures))
+    return summed.sort_by([(name, 'ascending') for name in group_by]) if group_by else summed
+
+def load_checkpoint(rollup_path=DEFAULT_ROLLUP_PATH):
+    """Read the rollup checkpoint, or an empty one before the first update."""
+    checkpoint_path = os.path.join(rollup_path, CHECKPOINT_FILE)
+    if not os.path.exists(checkpoint_path):
+        return {'version': None, 'files': {}}
+    with open(checkpoint_path) as f:
+        return json.load(f)
+
+def _save_checkpoint(rollup_path, checkpoint):
+    checkpoint_path = os.path.join(rollup_path, CHECKPOINT_FILE)
+    with open(checkpoint_path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+def _rollup_file(rollup_path, version, name):
+    return os.path.join(rollup_path, f"v{version}", f"{name}.parquet")
+
+def load_rollup(name, rollup_path=DEFAULT_ROLLUP_PATH):
+    """Read the current version of a rollup table, or None before the first update."""
+    version = load_checkpoint(rollup_path)['version']
+    if version is None:
+        return None
+    return pq.read_table(_rollup_file(rollup_path, version, name))
+
+def _read_fragments(dataset, fragments):
+    """Read the columns the measures need from some fragments of the events dataset."""
+    subset = ds.FileSystemDataset(list(fragments), dataset.schema, dataset.format, dataset.filesystem)
+    return subset.to_table(columns=_projection(dataset.schema))
+
+def update_rollups(path=DEFAULT_EVENTS_PATH, rollup_path=DEFAULT_ROLLUP_PATH):
+    """Bring the rollup tables up to date with the events directory.
+
+    Only event files that appeared since the last update are read; their
+    partial aggregates are summed into the current rollups. When a covered
+    file was rewritten or removed (compaction, re-layout, a replaced
+    partition) the rollups are rebuilt from all files, since additive
+    partials cannot be subtracted back out.
+
+    Each update writes a new version directory and then replaces the
+    checkpoint, so readers and failed runs always see a consistent set of
+    rollups and covered files.
+
+    Args:
+        path: Events directory written by the generator
+        rollup_path: Root directory of the rollup tables
+
+    Returns:
+        Dict with the number of new files read and whether the rollups were rebuilt
+    """
+    dataset = events_dataset(path)
+    checkpoint = load_checkpoint(rollup_path)
+    fragments, stats, new_files, rebuild = file_changes(dataset, path, checkpoint['files'])
+    rebuild = rebuild or checkpoint['version'] is None
+    if not new_files and not rebuild:
+        return {'files_read': 0, 'rebuilt': False}
+
+    if rebuild:
+        new_files = list(fragments)
+    events = _read_fragments(dataset, [fragments[file] for file in new_files])
+
+    version = (checkpoint['version'] or 0) + 1
+    os.makedirs(os.path.join(rollup_path, f"v{version}"), exist_ok=True)
+    for name, (group_by, measures) in ROLLUPS.items():
+        table = _aggregate(events, group_by, measures)
+        if not rebuild:
+            table = _sum_by(pa.concat_tables([load_rollup(name, rollup_path), table]), group_by, measures)
+        pq.write_table(table, _rollup_file(rollup_path, version, name))
+
+    _save_checkpoint(rollup_path, {'version': version, 'files': stats, 'updated_at': datetime.now().isoformat()})
+    if checkpoint['version'] is not None:
+        shutil.rmtree(os.path.join(rollup_path, f"v{checkpoint['version']}"), ignore_errors=True)
+    return {'files_read': len(new_files), 'rebuilt': rebuild}
+
+def _expand_measures(measures):
+    additive = []
+    for measure in measures:
+        for name in DERIVED_MEASURES[measure][0] if measure in DERIVED_MEASURES else [measure]:
+            if name not in MEASURES:
+                raise ValueError(f"Unknown measure '{name}', expected one of {list(MEASURES) + list(DERIVED_MEASURES)}")
+            if name not in additive:
+                additive.append(name)
+    return additive
+
+def _is_midnight(value):
+    return value is None or value.time() == time()
+
+def matching_rollup(group_by, measures, category=None, names=None, start=None, end=None):
+    """Name of the rollup that can answer an aggregate query, or None.
+
+    A rollup matches when it holds every measure and groups by every
+    column the query groups or filters on, with start and end on day
+    boundaries.
+    """
+    additive = _expand_measures(measures)
+    filter_columns = {'event_category'} if category else set()
+    filter_columns |= {'event_name'} if names else set()
+    if start is not None or end is not None:
+        if not (_is_midnight(_as_datetime(start)) and _is_midnight(_as_datetime(end))):
+            return None
+        filter_columns.add('day')
+    for name, (rollup_group_by, rollup_measures) in ROLLUPS.items():
+        if set(additive) <= set(rollup_measures) and set(group_by) | filter_columns <= set(rollup_group_by):
+            return name
+    return None
+
+def _filter_rollup(table, category, names, start, end):
+    mask = None
+
+    def add(condition):
+        nonlocal mask
+        mask = condition if mask is None else pc.and_(mask, condition)
+
+    if category:
+        add(pc.is_in(table['event_category'], pa.array(_as_list(category))))
+    if names:
+        add(pc.is_in(table['event_name'], pa.array(_as_list(names))))
+    if start is not None:
+        add(pc.greater_equal(table['day'], pa.scalar(_as_datetime(start).date())))
+    if end is not None:
+        add(pc.less(table['day'], pa.scalar(_as_datetime(end).date())))
+    return table if mask is None else table.filter(mask)
+
+def aggregate_events(group_by=('day',), measures=('event_count',), category=None, names=None, start=None, end=None,
+                     path=DEFAULT_EVENTS_PATH, rollup_path=DEFAULT_ROLLUP_PATH):
+    """Aggregate events, answering from a rollup whenever one matches the query.
+
+    Rollups are used when matching_rollup finds one and the events
+    directory has no rewritten or removed files since the last update;
+    files appended since then are aggregated on the fly and merged in, so
+    results are always current. Any other query scans the events with
+    read_events.
+
+    Args:
+        group_by: Columns to group by: 'day', 'event_category', 'event_name'
+        measures: Names from MEASURES or DERIVED_MEASURES
+        category: Event category or list of categories
+        names: Event name or list of event names
+        start: Earliest event_timestamp (inclusive)
+        end: Latest event_timestamp (exclusive)
+        path: Events directory written by the generator
+        rollup_path: Root directory of the rollup tables
+
+    Returns:
+        Tuple of (pyarrow Table, name of the rollup used or None)
+    """
+    group_by, measures = list(group_by), list(measures)
+    additive = _expand_measures(measures)
+
+    rollup = matching_rollup(group_by, measures, category, names, start, end)
+    table = None
+    if rollup is not None and load_checkpoint(rollup_path)['version'] is not None:
+        dataset = events_dataset(path)
+        fragments, _, new_files, rewritten = file_changes(dataset, path, load_checkpoint(rollup_path)['files'])
+        if not rewritten:
+            rollup_group_by, rollup_measures = ROLLUPS[rollup]
+            table = load_rollup(rollup, rollup_path)
+            if new_files:
+                delta = _read_fragments(dataset, [fragments[file] for file in new_files])
+                table = pa.concat_tables([table, _aggregate(delta, rollup_group_by, rollup_measures)])
+            table = _sum_by(_filter_rollup(table, category, names, start, end), group_by, additive)
+    if table is None:
+        rollup = None
+        events = read_events(path, category=category, names=names, start=start, end=end,
+                             columns=_projection(events_dataset(path).schema))
+        table = _aggregate(events, group_by, additive)
+
+    for measure in measures:
+        if measure in DERIVED_MEASURES:
+            table = table.append_column(measure, DERIVED_MEASURES[measure][1](table))
+    return table.select(group_by + measures), rollup
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain and query incrementally updated event rollups")
+    parser.add_argument("--path", default=DEFAULT_EVENTS_PATH, help="Events dataset directory")
+    parser.add_argument("--rollup-path", default=DEFAULT_ROLLUP_PATH, help="Rollup tables directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("update", help="Fold newly appended event files into the rollups")
+    query_parser = commands.add_parser("query", help="Aggregate events, from a rollup when one matches")
+    query_parser.add_argument("--group-by", nargs="*", default=["day"], help="Columns to group by")
+    query_parser.add_argument("--measures", nargs="+", default=["event_count"],
+                              help=f"Measures: {', '.join(list(MEASURES) + list(DERIVED_MEASURES))}")
+    query_parser.add_argument("--category", help="Event category")
+    query_parser.add_argument("--names", nargs="+", help="Event names")
+    query_parser.add_argument("--start", help="Earliest event_timestamp (inclusive, ISO-8601)")
+    query_parser.add_argument("--end", help="Latest event_timestamp (exclusive, ISO-8601)")
+    args = parser.parse_args()
+
+    if args.command == "update":
+        result = update_rollups(args.path, args.rollup_path)
+        print(f"{'Rebuilt' if result['rebuilt'] else 'Updated'} rollups from {result['files_read']} event files")
+    else:
+        table, rollup = aggregate_events(args.group_by, args.measures, args.category, args.names, args.start,
+                                         args.end, args.path, args.rollup_path)
+        print(f"Answered from {'rollup ' + rollup if rollup else 'a scan of the events'}")
+        print(table.to_pandas().to_string(index=False))
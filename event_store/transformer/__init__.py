@@ -0,0 +1,3 @@
+from event_store.transformer.transform import transform_events, load_checkpoint, DEFAULT_TRANSFORMED_PATH
+
+__all__ = ['transform_events', 'load_checkpoint', 'DEFAULT_TRANSFORMED_PATH']
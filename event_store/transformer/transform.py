@@ -0,0 +1,158 @@
+import os
+import json
+import shutil
+import argparse
+from datetime import date
+from urllib.parse import urlparse, unquote
+
+from event_store.reader import DEFAULT_EVENTS_PATH, events_dataset, file_stats
+from event_store.order_items import DEFAULT_ORDER_ITEMS_BY_DAY_PATH, order_items_frame
+
+# Root of the year/month/day partitioned copy of the events
+DEFAULT_TRANSFORMED_PATH = os.path.join('.', 'output', 'events_by_day')
+
+# Checkpoint kept next to the transformed data, ignored by dataset discovery
+CHECKPOINT_FILE = '_transform_checkpoint.json'
+
+def load_checkpoint(output_path=DEFAULT_TRANSFORMED_PATH):
+    """Read the transformer checkpoint, or an empty one before the first run.
+
+    The checkpoint maps each processed input file to its size, modification
+    time and the days its events fall on.
+    """
+    checkpoint_path = os.path.join(output_path, CHECKPOINT_FILE)
+    if not os.path.exists(checkpoint_path):
+        return {'files': {}}
+    with open(checkpoint_path) as f:
+        return json.load(f)
+
+def _save_checkpoint(output_path, checkpoint):
+    """Write the checkpoint atomically, so a failed run leaves the previous one intact."""
+    os.makedirs(output_path, exist_ok=True)
+    checkpoint_path = os.path.join(output_path, CHECKPOINT_FILE)
+    with open(checkpoint_path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+def _file_days(spark, input_path, files):
+    """Days covered by each of the given input files."""
+    from pyspark.sql.functions import col, to_date, input_file_name, collect_set
+
+    rows = (
+        spark.read.option("basePath", input_path).parquet(*[os.path.join(input_path, file) for file in files])
+        .groupBy(input_file_name().alias("file"))
+        .agg(collect_set(to_date(col("event_timestamp"))).alias("days"))
+        .collect()
+    )
+    root = os.path.abspath(input_path)
+    return {
+        os.path.relpath(unquote(urlparse(row.file).path), root): sorted(day.isoformat() for day in row.days)
+        for row in rows
+    }
+
+def _day_path(output_path, day):
+    return os.path.join(output_path, f"year={day:%Y}", f"month={day:%m}", f"day={day:%d}")
+
+def _write_days(frame, output_path, *sort_columns):
+    """Write rows into year/month/day partitions, replacing only the days present."""
+    from pyspark.sql.functions import col, to_date, date_format
+
+    frame = frame.withColumn("date", to_date(col("event_timestamp"))) \
+        .withColumn("year", date_format(col("date"), "yyyy")) \
+        .withColumn("month", date_format(col("date"), "MM")) \
+        .withColumn("day", date_format(col("date"), "dd")) \
+        .drop("date")
+    if sort_columns:
+        # One task per day, sorted by the partition columns first so the writer keeps the order
+        frame = frame.repartition("year", "month", "day").sortWithinPartitions("year", "month", "day", *sort_columns)
+    frame.write \
+        .mode("overwrite") \
+        .option("partitionOverwriteMode", "dynamic") \
+        .option("compression", "snappy") \
+        .partitionBy("year", "month", "day") \
+        .parquet(output_path)
+
+def transform_events(input_path=DEFAULT_EVENTS_PATH, output_path=DEFAULT_TRANSFORMED_PATH, spark=None,
+                     order_items_path=DEFAULT_ORDER_ITEMS_BY_DAY_PATH):
+    """Incrementally repartition events by year/month/day.
+
+    Only input files added, changed or removed since the last checkpoint are
+    inspected. Every day they touch is recomputed from all of its input
+    events, read from just the files the checkpoint lists for those days,
+    and written with dynamic partition overwrite, so other days are left
+    alone and re-running after a failure gives the same result. With no new
+    input nothing is read and no Spark job is started. The same days of
+    the order_items table are recomputed from the order events, one file per
+    day sorted by product_id.
+
+    Args:
+        input_path: Root of the events dataset written by the generator
+        output_path: Root of the day-partitioned output
+        spark: SparkSession to use (defaults to the active session)
+        order_items_path: Root of the day-partitioned order_items table
+            (None to leave it out)
+
+    Returns:
+        Dict with the new, changed and removed input files and the rewritten days
+    """
+    checkpoint = load_checkpoint(output_path)
+    processed = checkpoint['files']
+    current = file_stats(events_dataset(input_path), input_path)
+
+    new_files = sorted(file for file in current if file not in processed)
+    changed_files = sorted(file for file in current if file in processed and processed[file]['stat'] != current[file])
+    removed_files = sorted(file for file in processed if file not in current)
+    summary = {'new_files': new_files, 'changed_files': changed_files, 'removed_files': removed_files, 'days': []}
+    if not (new_files or changed_files or removed_files):
+        return summary
+
+    from pyspark.sql import SparkSession
+    from pyspark.sql.functions import col, to_date
+
+    spark = spark or SparkSession.builder.getOrCreate()
+
+    # Days touched by the old contents of changed and removed files, and by the new contents
+    touched = set()
+    for file in changed_files + removed_files:
+        touched.update(processed.pop(file)['days'])
+    if new_files or changed_files:
+        file_days = _file_days(spark, input_path, new_files + changed_files)
+        for file in new_files + changed_files:
+            processed[file] = {'stat': current[file], 'days': file_days.get(file, [])}
+            touched.update(processed[file]['days'])
+
+    days = sorted(date.fromisoformat(day) for day in touched)
+    # Input files holding events of the touched days: the only ones read
+    day_files = sorted(file for file, entry in processed.items() if touched.intersection(entry['days']))
+    if days:
+        # Dynamic overwrite only replaces days that still have events, and a
+        # touched day may have lost all its orders, so those are cleared first
+        remaining_days = {day for file in day_files for day in processed[file]['days']}
+        for day in days:
+            if day.isoformat() not in remaining_days and os.path.exists(_day_path(output_path, day)):
+                shutil.rmtree(_day_path(output_path, day))
+            if order_items_path and os.path.exists(_day_path(order_items_path, day)):
+                shutil.rmtree(_day_path(order_items_path, day))
+
+    if day_files:
+        events = spark.read.option("basePath", input_path) \
+            .parquet(*[os.path.join(input_path, file) for file in day_files]) \
+            .where(to_date(col("event_timestamp")).isin(days))
+        _write_days(events, output_path)
+        if order_items_path:
+            _write_days(order_items_frame(events), order_items_path, "product_id", "event_timestamp")
+
+    _save_checkpoint(output_path, {'files': processed})
+    summary['days'] = [day.isoformat() for day in days]
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally repartition events by year/month/day")
+    parser.add_argument("input_path", nargs="?", default=DEFAULT_EVENTS_PATH, help="Events dataset directory")
+    parser.add_argument("output_path", nargs="?", default=DEFAULT_TRANSFORMED_PATH, help="Output directory")
+    parser.add_argument("--order-items-path", default=DEFAULT_ORDER_ITEMS_BY_DAY_PATH,
+                        help="Output directory of the day-partitioned order_items table")
+    args = parser.parse_args()
+    result = transform_events(args.input_path, args.output_path, order_items_path=args.order_items_path)
+    print(f"{len(result['new_files'])} new, {len(result['changed_files'])} changed and "
+          f"{len(result['removed_files'])} removed input files; rewrote {len(result['days'])} days")
@@ -0,0 +1,71 @@
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from event_store import compaction
+from event_store.compaction import compact_events, format_report, REPLACED_PREFIX
+from event_store.dedup import append_events
+from event_store.reader import events_dataset
+
+def _events(rng, num_events):
+    """Events of two categories with distinct content, so every row has its own event ID."""
+    seconds = rng.integers(0, 30 * 86400, size=num_events)
+    return pa.table({
+        'event_name': pa.array(rng.choice(['created', 'updated'], size=num_events)),
+        'event_timestamp': pa.array(np.datetime64('2024-01-01') + seconds.astype('timedelta64[s]')).cast(pa.timestamp('us')),
+        'event_category': pa.array(rng.choice(['order', 'account'], size=num_events)),
+        'event_value': pa.array([f"value-{i}" for i in rng.integers(0, 10**9, size=num_events)]),
+        'entity_id': pa.array([f"entity-{i}" for i in rng.integers(0, 100, size=num_events)])
+    })
+
+def _appended(path, appends=10, rows=200):
+    """Append several small batches, one file per partition each, and return all events."""
+    rng = np.random.default_rng(0)
+    batches = [_events(rng, rows) for _ in range(appends)]
+    for batch in batches:
+        append_events(batch, path)
+    return pa.concat_tables(batches)
+
+def _event_ids(path):
+    return sorted(events_dataset(path).to_table(columns=['event_id'])['event_id'].to_pylist())
+
+def test_compaction_keeps_rows_and_dedup_index(tmp_path):
+    path = str(tmp_path / 'events')
+    events = _appended(path)
+    before = _event_ids(path)
+
+    report = compact_events(path, target_file_size=2**30)
+    assert [(entry['files_before'], entry['files_after'], entry['atomic']) for entry in report] == [(10, 1, True)] * 2
+    assert _event_ids(path) == before
+    # Replaced files stay readable in hidden siblings, invisible to the dataset
+    assert sum(name.startswith(REPLACED_PREFIX) for name in os.listdir(path)) == 2
+
+    # The carried over Bloom filter and ID index still reject every stored event
+    again = append_events(events, path)
+    assert again['written'] == 0 and again['duplicates'] == events.num_rows
+    assert _event_ids(path) == before
+
+def test_fallback_exchange_is_reported(tmp_path, monkeypatch):
+    path = str(tmp_path / 'events')
+    _appended(path)
+    before = _event_ids(path)
+
+    def missing_libc(*args, **kwargs):
+        raise AttributeError('renameat2')
+    monkeypatch.setattr(compaction.ctypes, 'CDLL', missing_libc)
+    report = compact_events(path, target_file_size=2**30)
+    assert not any(entry['atomic'] for entry in report)
+    assert 'Not exchanged atomically' in format_report(report)
+    assert _event_ids(path) == before
+    assert pc.count_distinct(events_dataset(path).to_table()['event_category']).as_py() == 2
+
+def test_replaced_files_expire(tmp_path):
+    path = str(tmp_path / 'events')
+    _appended(path)
+    compact_events(path, target_file_size=2**30, retention_seconds=3600)
+    compact_events(path, target_file_size=2**30, retention_seconds=3600)
+    assert sum(name.startswith(REPLACED_PREFIX) for name in os.listdir(path)) == 2
+
+    compact_events(path, target_file_size=2**30, retention_seconds=0)
+    assert not any(name.startswith(REPLACED_PREFIX) for name in os.listdir(path))
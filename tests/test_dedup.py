@@ -0,0 +1,86 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from event_generator.utils.hash_utils import content_event_ids
+from event_store.dedup import BloomFilter, append_events, append_batches, build_event_index
+from event_store.reader import events_dataset
+
+def _events(rng, num_events, offset=0):
+    """Typed events of two categories; row i of any call with the same offset has the same content."""
+    rows = np.arange(offset, offset + num_events)
+    return pa.table({
+        'event_name': pa.array(np.where(rows % 3 == 0, 'order_placed', 'order_shipped')),
+        'event_timestamp': pa.array(np.datetime64('2024-01-01') + (rows * 37).astype('timedelta64[s]')).cast(pa.timestamp('us')),
+        'event_category': pa.array(np.where(rows % 2 == 0, 'order', 'account')),
+        'event_value': pa.StructArray.from_arrays(
+            [pa.array(rows % 500 + 0.5), pa.array([[f"product-{i}"] for i in rows % 50])],
+            names=['total_amount', 'products']
+        ),
+        'entity_id': pa.array([f"entity-{i}" for i in rows % 100])
+    }).take(rng.permutation(num_events))
+
+def _hex_ids(num_ids, seed):
+    digits = np.random.default_rng(seed).bytes(16 * num_ids).hex()
+    return pa.array([digits[i:i + 32] for i in range(0, 32 * num_ids, 32)])
+
+def test_content_event_ids_follow_content_only():
+    rng = np.random.default_rng(0)
+    events = _events(rng, 1000)
+    ids = content_event_ids(events)
+    assert pc.count_distinct(ids).as_py() == 1000
+    # Independent of batching, row order and column order
+    batched = pa.Table.from_batches(events.to_batches(max_chunksize=128))
+    assert content_event_ids(batched).equals(ids)
+    order = rng.permutation(1000)
+    assert content_event_ids(events.take(order)).equals(ids.take(order))
+    assert content_event_ids(events.select(list(reversed(events.column_names)))).equals(ids)
+    # Any changed value changes the ID
+    changed = events.set_column(4, 'entity_id', pc.binary_join_element_wise(events['entity_id'], 'x', ''))
+    assert not pc.any(pc.equal(content_event_ids(changed), ids)).as_py()
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives():
+    added, others = _hex_ids(20000, seed=1), _hex_ids(20000, seed=2)
+    bloom = BloomFilter(20000, false_positive_rate=0.01)
+    bloom.add(added)
+    assert bloom.might_contain(added).all()
+    assert bloom.might_contain(others).mean() < 0.02
+
+def test_re_append_is_idempotent(tmp_path):
+    path = str(tmp_path / 'events')
+    rng = np.random.default_rng(0)
+    first = _events(rng, 3000)
+    # Rows repeated within a batch are written once
+    report = append_events(pa.concat_tables([first, first.slice(0, 500)]), path)
+    assert report['written'] == 3000 and report['duplicates'] == 500
+
+    again = append_batches(first.to_batches(max_chunksize=700), path, rows_per_append=1000)
+    assert again == {'rows': 3000, 'written': 0, 'duplicates': 3000, 'checked': 3000}
+
+    overlapping = _events(rng, 3000, offset=2000)
+    report = append_batches(overlapping.to_batches(max_chunksize=700), path, rows_per_append=1000)
+    assert report['written'] == 2000 and report['duplicates'] == 1000
+    stored = events_dataset(path).to_table()
+    assert stored.num_rows == 5000 and pc.count_distinct(stored['event_id']).as_py() == 5000
+
+def test_bloom_false_positives_are_checked_exactly(tmp_path, monkeypatch):
+    path = str(tmp_path / 'events')
+    rng = np.random.default_rng(0)
+    append_events(_events(rng, 2000), path)
+
+    # A filter answering 'maybe seen' for everything must still let new events through
+    monkeypatch.setattr(BloomFilter, 'might_contain', lambda self, ids: np.ones(len(ids), dtype=bool))
+    report = append_events(_events(rng, 2000, offset=1000), path)
+    assert report == {'rows': 2000, 'written': 1000, 'duplicates': 1000, 'checked': 2000}
+    assert events_dataset(path).count_rows() == 3000
+
+def test_index_covers_files_written_without_dedup(tmp_path):
+    path = str(tmp_path / 'events')
+    rng = np.random.default_rng(0)
+    events = _events(rng, 2000)
+    events = events.append_column('event_id', content_event_ids(events))
+    # Written directly, as Spark or an older run would, then indexed
+    ds.write_dataset(events, path, format='parquet', partitioning=['event_category'], partitioning_flavor='hive')
+    assert build_event_index(path) == 2
+    assert append_events(events.drop_columns(['event_id']), path)['written'] == 0
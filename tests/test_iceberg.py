@@ -0,0 +1,34 @@
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+pytest.importorskip('pyiceberg')
+
+from event_store.iceberg import import_events, plan_summary, scan_events
+
+def _write_file(path, category, name, rng, num_events=200):
+    seconds = rng.integers(0, 10 * 86400, size=num_events)
+    events = pa.table({
+        'event_name': pa.array(rng.choice(['created', 'updated'], size=num_events)),
+        'event_timestamp': pa.array(np.datetime64('2024-01-01') + seconds.astype('timedelta64[s]')).cast(pa.timestamp('us')),
+        'event_value': pa.array([f"value-{i}" for i in range(num_events)]),
+        'entity_id': pa.array([f"entity-{i}" for i in rng.integers(0, 100, size=num_events)])
+    })
+    os.makedirs(os.path.join(path, f"event_category={category}"), exist_ok=True)
+    pq.write_table(events, os.path.join(path, f"event_category={category}", f"{name}.parquet"))
+
+def test_plan_summary_with_and_without_filters(tmp_path):
+    rng = np.random.default_rng(0)
+    path, warehouse = str(tmp_path / 'events'), str(tmp_path / 'warehouse')
+    for category in ['order', 'account']:
+        for i in range(3):
+            _write_file(path, category, f"part-{i}", rng)
+    assert import_events(path, warehouse) == (6, 1200)
+
+    planned, total = plan_summary(warehouse)
+    assert planned == total
+    planned, _ = plan_summary(warehouse, category='order')
+    assert 0 < planned < total
+    assert scan_events(warehouse, category='order').num_rows == 600
@@ -0,0 +1,45 @@
+import zipfile
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from event_store.ingest import ingest_csv
+from event_store.reader import events_dataset
+
+HEADER = "Transaction ID,Date,Gender,Age,Product Category,Quantity,Price per Unit,Total Amount\n"
+
+def _rows(first, last):
+    """CSV lines in the sales.zip format for row IDs first to last."""
+    return "".join(
+        f"{i},2023-{i % 12 + 1:02d}-{i % 28 + 1:02d},{'Female' if i % 2 else 'Male'},{18 + i % 50},Beauty,"
+        f"{i % 4 + 1},{i % 7 * 25 + 25},{(i % 4 + 1) * (i % 7 * 25 + 25)}\n"
+        for i in range(first, last + 1)
+    )
+
+def test_ingest_is_idempotent_across_archives_and_files(tmp_path):
+    archive = tmp_path / 'sales.zip'
+    with zipfile.ZipFile(archive, 'w') as f:
+        f.writestr('sales/first.csv', HEADER + _rows(1, 600) + "601,2023-01-01,Male\n")
+        f.writestr('sales/second.csv', HEADER + _rows(601, 1000))
+        f.writestr('sales/README.txt', "not a CSV member")
+    output_path = str(tmp_path / 'ingested')
+
+    # A small block size parses each member in several chunks
+    stats = ingest_csv(str(archive), 'sales', output_path, block_size=4096)
+    assert stats == {'members': ['sales/first.csv', 'sales/second.csv'], 'rows': 1000, 'written': 1000,
+                     'duplicates': 0, 'invalid_rows': 1}
+
+    events = events_dataset(output_path).to_table()
+    assert events.num_rows == 1000
+    assert events.schema.field('event_timestamp').type == pa.timestamp('us')
+    assert pc.count_distinct(events['event_id']).as_py() == 1000
+    assert sorted(events['entity_id'].to_pylist()) == sorted(f"sale-{i}" for i in range(1, 1001))
+    assert pc.sum(pc.struct_field(events['event_value'], 'quantity')).as_py() == sum(i % 4 + 1 for i in range(1, 1001))
+
+    # Re-ingesting the archive, or a file overlapping it, writes only the rows not yet stored
+    again = ingest_csv(str(archive), 'sales', output_path, block_size=4096)
+    assert again['written'] == 0 and again['duplicates'] == 1000
+    overlapping = tmp_path / 'more.csv'
+    overlapping.write_text(HEADER + _rows(901, 1200))
+    more = ingest_csv(str(overlapping), 'sales', output_path)
+    assert more['written'] == 200 and more['duplicates'] == 100
+    assert events_dataset(output_path).count_rows() == 1200
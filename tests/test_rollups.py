@@ -0,0 +1,64 @@
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from event_store.compaction import compact_events
+from event_store.rollups import aggregate_events, update_rollups
+
+# Event names of each category written by the tests
+EVENT_NAMES = {
+    'order': ['order_placed', 'order_shipped'],
+    'account': ['login_success', 'login_failed']
+}
+
+# Queries answered by each rollup: (group by, measures)
+QUERIES = [
+    (['day', 'event_category', 'event_name'], ['event_count']),
+    (['day'], ['order_count', 'revenue']),
+    (['day'], ['login_failure_rate'])
+]
+
+def _write_file(path, category, name, rng, num_events=300):
+    """Write one events file of a category, with whole amounts so rollup and scan sums agree exactly."""
+    seconds = rng.integers(0, 10 * 86400, size=num_events)
+    amounts = rng.integers(1, 500, size=num_events)
+    events = pa.table({
+        'event_name': pa.array(rng.choice(EVENT_NAMES[category], size=num_events)),
+        'event_timestamp': pa.array(np.datetime64('2024-01-01') + seconds.astype('timedelta64[s]')).cast(pa.timestamp('us')),
+        'event_value': pa.array([f"{{'total_amount': {amount}.0}}" for amount in amounts]),
+        'entity_id': pa.array([f"entity-{i}" for i in rng.integers(0, 100, size=num_events)])
+    })
+    os.makedirs(os.path.join(path, f"event_category={category}"), exist_ok=True)
+    pq.write_table(events, os.path.join(path, f"event_category={category}", f"{name}.parquet"))
+
+def _assert_matches_scan(path, rollup_path, scan_path, expected_rollup):
+    """Every query gives the table a scan gives, answered from a rollup exactly when expected."""
+    for group_by, measures in QUERIES:
+        table, rollup = aggregate_events(group_by, measures, path=path, rollup_path=rollup_path)
+        scanned, _ = aggregate_events(group_by, measures, path=path, rollup_path=scan_path)
+        assert (rollup is not None) == expected_rollup
+        assert table.equals(scanned)
+
+def test_rollups_match_scans_through_appends_and_compaction(tmp_path):
+    rng = np.random.default_rng(0)
+    path, rollup_path, scan_path = str(tmp_path / 'events'), str(tmp_path / 'rollups'), str(tmp_path / 'none')
+    for category in EVENT_NAMES:
+        for i in range(4):
+            _write_file(path, category, f"part-{i}", rng)
+
+    assert update_rollups(path, rollup_path) == {'files_read': 8, 'rebuilt': True}
+    _assert_matches_scan(path, rollup_path, scan_path, expected_rollup=True)
+
+    # Files appended since the update are merged in on the fly, then folded in
+    _write_file(path, 'order', 'late', rng)
+    _assert_matches_scan(path, rollup_path, scan_path, expected_rollup=True)
+    assert update_rollups(path, rollup_path) == {'files_read': 1, 'rebuilt': False}
+    _assert_matches_scan(path, rollup_path, scan_path, expected_rollup=True)
+
+    # Compaction replaces covered files: queries scan until the rollups are rebuilt
+    compact_events(path, target_file_size=2**30)
+    _assert_matches_scan(path, rollup_path, scan_path, expected_rollup=False)
+    assert update_rollups(path, rollup_path) == {'files_read': 2, 'rebuilt': True}
+    _assert_matches_scan(path, rollup_path, scan_path, expected_rollup=True)
+    assert update_rollups(path, rollup_path) == {'files_read': 0, 'rebuilt': False}
@@ -0,0 +1,45 @@
+import os
+import sys
+from datetime import datetime
+
+from event_store.cli import EVENT_GENERATOR_DIR
+
+# The generator scripts import each other as top-level modules
+if EVENT_GENERATOR_DIR not in sys.path:
+    sys.path.insert(0, EVENT_GENERATOR_DIR)
+
+import config
+from sharded import generate_all_events_sharded
+
+START_DATE = datetime(2024, 1, 1)
+END_DATE = datetime(2024, 2, 1)
+
+def _generate(monkeypatch, output_dir, seed, workers):
+    """Run sharded generation of a few thousand typed events into output_dir."""
+    monkeypatch.setattr(config, 'OUTPUT_DIR', str(output_dir))
+    monkeypatch.setattr(config, 'EVENT_VALUE_FORMAT', 'typed')
+    monkeypatch.setattr(config, 'ID_FORMAT', 'hex')
+    monkeypatch.setattr(config, 'EVENT_CONFIG', {
+        event_type: {**settings, 'num_events': 3000} for event_type, settings in config.EVENT_CONFIG.items()
+    })
+    generate_all_events_sharded(seed, workers, START_DATE, END_DATE, batch_size=1000)
+
+def _files(directory):
+    """Contents of every Parquet file under a directory, by relative path."""
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.endswith('.parquet'):
+                with open(os.path.join(root, name), 'rb') as f:
+                    files[os.path.relpath(os.path.join(root, name), directory)] = f.read()
+    return files
+
+def test_same_seed_and_workers_write_identical_files(tmp_path, monkeypatch):
+    _generate(monkeypatch, tmp_path / 'first', seed=7, workers=2)
+    _generate(monkeypatch, tmp_path / 'second', seed=7, workers=2)
+    _generate(monkeypatch, tmp_path / 'other', seed=8, workers=2)
+
+    for table in ['events', 'order_items']:
+        first = _files(tmp_path / 'first' / table)
+        assert first and first == _files(tmp_path / 'second' / table)
+        assert first != _files(tmp_path / 'other' / table)
@@ -0,0 +1,87 @@
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from datetime import date
+
+from event_store.transformer import transform_events, load_checkpoint
+from event_store.transformer.transform import CHECKPOINT_FILE, _day_path
+
+@pytest.fixture(scope='module')
+def spark():
+    """Local SparkSession in UTC, skipping the tests where Spark or a JVM is unavailable."""
+    pytest.importorskip('pyspark')
+    from pyspark.sql import SparkSession
+
+    try:
+        session = SparkSession.builder.master('local[1]') \
+            .config('spark.sql.session.timeZone', 'UTC') \
+            .config('spark.sql.shuffle.partitions', '2') \
+            .config('spark.ui.enabled', 'false') \
+            .getOrCreate()
+    except Exception as error:
+        pytest.skip(f"Spark is unavailable: {error}")
+    yield session
+    session.stop()
+
+def _write_events(path, name, days, num_events=100, seed=0):
+    """Write one events file of the order category with events spread over the given days."""
+    rng = np.random.default_rng(seed)
+    starts = np.array([np.datetime64(day) for day in days])[rng.integers(0, len(days), size=num_events)]
+    timestamps = starts + rng.integers(0, 86400, size=num_events).astype('timedelta64[s]')
+    events = pa.table({
+        'event_name': pa.array(rng.choice(['order_created', 'order_shipped'], size=num_events)),
+        'event_timestamp': pa.array(timestamps).cast(pa.timestamp('us')),
+        'event_value': pa.array([f"value-{i}" for i in range(num_events)]),
+        'entity_id': pa.array([f"entity-{i}" for i in rng.integers(0, 50, size=num_events)])
+    })
+    os.makedirs(os.path.join(path, 'event_category=order'), exist_ok=True)
+    pq.write_table(events, os.path.join(path, 'event_category=order', f"{name}.parquet"))
+    return events
+
+def _day_files(output_path, day):
+    directory = _day_path(output_path, day)
+    return {name: os.stat(os.path.join(directory, name)).st_mtime_ns
+            for name in os.listdir(directory) if name.endswith('.parquet')}
+
+def _day_rows(output_path, day):
+    directory = _day_path(output_path, day)
+    return sum(pq.read_metadata(os.path.join(directory, name)).num_rows for name in _day_files(output_path, day))
+
+def test_transform_rewrites_only_touched_days(tmp_path, spark):
+    input_path, output_path = str(tmp_path / 'events'), str(tmp_path / 'events_by_day')
+    early = [date(2024, 1, day) for day in range(1, 6)]
+    _write_events(input_path, 'first', early)
+    _write_events(input_path, 'second', [date(2024, 1, 20), date(2024, 1, 21)], seed=1)
+
+    summary = transform_events(input_path, output_path, spark, order_items_path=None)
+    assert summary['new_files'] == ['event_category=order/first.parquet', 'event_category=order/second.parquet']
+    assert summary['days'] == [day.isoformat() for day in early] + ['2024-01-20', '2024-01-21']
+    assert sum(_day_rows(output_path, date.fromisoformat(day)) for day in summary['days']) == 200
+
+    # A second run with no new input is a no-op and leaves the checkpoint alone
+    checkpoint_mtime = os.stat(os.path.join(output_path, CHECKPOINT_FILE)).st_mtime_ns
+    untouched = {day: _day_files(output_path, day) for day in early}
+    assert transform_events(input_path, output_path, spark, order_items_path=None) == {
+        'new_files': [], 'changed_files': [], 'removed_files': [], 'days': []
+    }
+    assert os.stat(os.path.join(output_path, CHECKPOINT_FILE)).st_mtime_ns == checkpoint_mtime
+
+    # A late file rewrites just its day, from every input event of that day
+    rows_before = _day_rows(output_path, date(2024, 1, 20))
+    late = _write_events(input_path, 'late', [date(2024, 1, 20)], num_events=30, seed=2)
+    summary = transform_events(input_path, output_path, spark, order_items_path=None)
+    assert summary['new_files'] == ['event_category=order/late.parquet'] and summary['days'] == ['2024-01-20']
+    assert _day_rows(output_path, date(2024, 1, 20)) == rows_before + late.num_rows
+    assert {day: _day_files(output_path, day) for day in early} == untouched
+
+    # Removing an input file clears the days only it covered
+    os.remove(os.path.join(input_path, 'event_category=order', 'second.parquet'))
+    summary = transform_events(input_path, output_path, spark, order_items_path=None)
+    assert summary['removed_files'] == ['event_category=order/second.parquet']
+    assert summary['days'] == ['2024-01-20', '2024-01-21']
+    assert _day_rows(output_path, date(2024, 1, 20)) == late.num_rows
+    assert not os.path.exists(_day_path(output_path, date(2024, 1, 21)))
+    assert set(load_checkpoint(output_path)['files']) == {'event_category=order/first.parquet',
+                                                          'event_category=order/late.parquet'}